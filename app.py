@@ -1,9 +1,10 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, g, Response
 from werkzeug.security import generate_password_hash, check_password_hash
 import sqlite3
 import init_db
 import scraper
 from encryption import cipher
+import os
 import threading
 import time
 from schedule_generator import generate_optimal_schedules
@@ -11,9 +12,18 @@ import auth_manager
 from auth_manager import clear_auth_state
 import requests
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED
 import atexit
 from flask_socketio import SocketIO
 import notifications
+import seat_history
+import metrics
+from jobs import JOB_QUEUE
+from response_cache import REGBLOCKS_CACHE
+import browser_pool
+import session_refresher
+from session_refresher import SESSION_REFRESHER
+from catalog_pool import CATALOG_POOL
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -27,30 +37,102 @@ notifications.register_socket_events(socketio)
 # This ensures the scheduler runs in the same process/thread context
 scheduler = BackgroundScheduler()
 
+# Web and scheduler metrics
+ROUTE_SECONDS = metrics.histogram('fsu_http_request_seconds', 'Flask route latency',
+                                  ['endpoint', 'method', 'status'])
+JOBS_SKIPPED = metrics.counter('fsu_scheduler_jobs_skipped_total',
+                               'Scheduler runs skipped because the previous run was still going or was missed',
+                               ['job', 'reason'])
+
+def record_skipped_job(event):
+    """Count scheduler runs that never started"""
+    reason = 'max_instances' if event.code == EVENT_JOB_MAX_INSTANCES else 'missed'
+    JOBS_SKIPPED.inc(job=event.job_id, reason=reason)
+
+scheduler.add_listener(record_skipped_job, EVENT_JOB_MAX_INSTANCES | EVENT_JOB_MISSED)
+
+# Set FSU_EXTERNAL_MONITOR=1 when monitor_worker.py processes do the polling
+EXTERNAL_MONITOR = os.environ.get('FSU_EXTERNAL_MONITOR', '').lower() in ('1', 'true', 'yes')
+
 def init_scheduler_job():
-    """Add the monitoring job to the scheduler"""
+    """Add the monitoring, session renewal and browser pool jobs to the scheduler"""
+    if not scheduler.get_job('reap_stuck_browsers'):
+        scheduler.add_job(
+            id='reap_stuck_browsers',
+            func=lambda: browser_pool.BROWSER_POOL.reap(),
+            trigger='interval',
+            seconds=browser_pool.REAP_INTERVAL,
+            max_instances=1
+        )
+        
+    if not scheduler.get_job('refresh_sessions'):
+        scheduler.add_job(
+            id='refresh_sessions',
+            func=SESSION_REFRESHER.run_once,
+            # Monitor workers renew the sessions of users with monitored courses
+            kwargs={'include_monitored': not EXTERNAL_MONITOR},
+            trigger='interval',
+            seconds=session_refresher.REFRESH_INTERVAL,
+            max_instances=1
+        )
+        
+    if EXTERNAL_MONITOR:
+        # The workers queue their notifications, this process emits them
+        if not scheduler.get_job('deliver_queued_notifications'):
+            scheduler.add_job(
+                id='deliver_queued_notifications',
+                func=notifications.deliver_queued_notifications,
+                trigger='interval',
+                seconds=notifications.OUTBOX_POLL_SECONDS,
+                max_instances=1
+            )
+            print("Monitoring runs in monitor_worker.py processes, delivering their notifications")
+        return
+        
     if not scheduler.get_job('check_monitored_courses'):
         scheduler.add_job(
             id='check_monitored_courses',
             func=scraper.check_monitored_courses,
             trigger='interval',
-            seconds=60,
+            seconds=scraper.MONITOR_TICK_SECONDS,  # Each tick polls only the courses that are due
             max_instances=1,  # Prevent overlapping runs
             misfire_grace_time=10  # Allow job to be late by 10 seconds
         )
-        print("Added check_monitored_courses job to scheduler (runs every 30 seconds)")
+        print(f"Added check_monitored_courses job to scheduler (ticks every {scraper.MONITOR_TICK_SECONDS} seconds)")
 
 # Use before_first_request as a fallback for older Flask versions
 @app.before_first_request
 def init_scheduler():
     """Initialize scheduler after first request (for older Flask versions)"""
     if not scheduler.running:
+        browser_pool.BROWSER_POOL.warm()
+        if not EXTERNAL_MONITOR:
+            scraper.load_seat_state()
+            CATALOG_POOL.warm()
         init_scheduler_job()
         scheduler.start()
         print("Scheduler started from before_first_request handler")
 
 # Register a function to shut down the scheduler when the app exits
 atexit.register(lambda: scheduler.shutdown(wait=False))
+atexit.register(JOB_QUEUE.shutdown)
+atexit.register(lambda: browser_pool.BROWSER_POOL.shutdown())
+atexit.register(SESSION_REFRESHER.shutdown)
+atexit.register(CATALOG_POOL.shutdown)
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    """Record route latency by endpoint (never by raw path, to keep labels bounded)"""
+    if 'request_start' in g:
+        ROUTE_SECONDS.observe(time.perf_counter() - g.request_start,
+                              endpoint=request.endpoint or 'unknown',
+                              method=request.method,
+                              status=response.status_code)
+    return response
 
 def get_db_connection():
     """Create a database connection with row factory enabled"""
@@ -58,6 +140,35 @@ def get_db_connection():
     conn.row_factory = sqlite3.Row
     return conn
 
+def fetch_and_store_course(username, year, term, subject, course):
+    """
+    Fetch a course with a user's session and store it (runs as a background job).
+    
+    Returns:
+        Success message
+        
+    Raises:
+        ValueError if the user is unknown or the course could not be fetched
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT fsu_password FROM users WHERE username = ?", (username,))
+    user = cursor.fetchone()
+    conn.close()
+    
+    if not user:
+        raise ValueError('User not found')
+    
+    # Decrypt password, then fetch and process the course data; concurrent
+    # syncs of the same course by other users share a single fetch
+    decrypted_password = cipher.decrypt(user['fsu_password'])
+    data = scraper.sync_course_data(year, term, subject, course, username, decrypted_password)
+    
+    if not data:
+        raise ValueError('Failed to fetch course data')
+    
+    return f'{subject}{course} {term} {year} synced ({len(data.get("sections", []))} sections)'
+
 # Basic route handlers
 @app.route('/')
 def index():
@@ -159,32 +270,15 @@ def add_course():
         # It's now a no-op but keeping the call structure is cleaner than removing it
         clear_auth_state(username)
         
-        # Get user's FSU password
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT fsu_password FROM users WHERE username = ?", (username,))
-        user = cursor.fetchone()
-        conn.close()
-        
-        if not user:
-            flash('User not found!', 'danger')
-            return redirect(url_for('dashboard'))
-        
-        try:
-            # Decrypt password and fetch course data
-            decrypted_password = cipher.decrypt(user['fsu_password'])
-            data = scraper.fetch_course_data(year, term, subject, course, username, decrypted_password)
-            
-            if not data:
-                flash('Failed to fetch course data. Please try again.', 'danger')
-                return redirect(url_for('dashboard'))
-            
-            # Process the data
-            scraper.process_courses(data, year, term)
-            flash(f'Course data processed successfully for {subject}{course} {term} {year}!', 'success')
-            
-        except Exception as e:
-            flash(f'Error processing course: {str(e)}', 'danger')
+        # The fetch may wait on a Duo login, so it runs as a background job
+        job_id = JOB_QUEUE.submit(
+            'add_course', username, fetch_and_store_course,
+            username, year, term, subject, course,
+            description=f'Adding {subject}{course} {term} {year}',
+            key=('fetch', username, year, term, subject.upper(), course)
+        )
+        flash(f'Fetching {subject}{course} {term} {year} in the background, '
+              f'you will be notified when it is done (job {job_id[:8]}).', 'info')
             
         return redirect(url_for('dashboard'))
         
@@ -326,35 +420,19 @@ def sync_course():
         # Keep the clear_auth_state call for backward compatibility
         clear_auth_state(username)
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT fsu_password FROM users WHERE username = ?", (username,))
-        user = cursor.fetchone()
-        conn.close()
-        
-        if not user:
-            return jsonify({'success': False, 'error': 'User not found'})
-        
-        # Decrypt password and fetch course data
-        decrypted_password = cipher.decrypt(user['fsu_password'])
-        data = scraper.fetch_course_data(year, term, subject, course_num, username, decrypted_password)
-        
-        if not data:
-            return jsonify({'success': False, 'error': 'Failed to fetch course data'})
-        
-        # Process the data
-        scraper.process_courses(data, year, term)
-        
-        # Return appropriate response
-        if sync_all or not section:
-            return jsonify({
-                'success': True, 
-                'message': f'All sections of {course_code} synced successfully'
-            })
+        # All sections come back from one fetch, so a section sync is a course sync
+        description = f'Syncing {course_code}' if sync_all or not section else f'Syncing {course_code} section {section}'
+        job_id = JOB_QUEUE.submit(
+            'sync_course', username, fetch_and_store_course,
+            username, year, term, subject, course_num,
+            description=description,
+            key=('fetch', username, year, term, subject.upper(), course_num)
+        )
         
         return jsonify({
-            'success': True, 
-            'message': f'Course {course_code} section {section} synced successfully'
+            'success': True,
+            'job_id': job_id,
+            'message': f'{description} in the background'
         })
         
     except Exception as e:
@@ -392,6 +470,7 @@ def delete_course():
             cursor.executemany("DELETE FROM course_instructors WHERE course_id = ?", [(id,) for id in course_ids])
             cursor.execute("DELETE FROM monitored_courses WHERE courseCode = ?", (course_code,))
             cursor.execute("DELETE FROM schedule_courses WHERE courseCode = ?", (course_code,))
+            cursor.execute("DELETE FROM course_fingerprints WHERE courseCode = ?", (course_code,))
             
             # Delete the course
             cursor.execute("DELETE FROM courses WHERE courseCode = ?", (course_code,))
@@ -420,6 +499,7 @@ def delete_course():
             cursor.execute("DELETE FROM course_instructors WHERE course_id = ?", (course_id,))
             cursor.execute("DELETE FROM monitored_courses WHERE courseCode = ? AND section = ?", (course_code, section))
             cursor.execute("DELETE FROM schedule_courses WHERE courseCode = ? AND section = ?", (course_code, section))
+            cursor.execute("DELETE FROM course_fingerprints WHERE courseCode = ? AND section = ?", (course_code, section))
             
             # Delete the course
             cursor.execute("DELETE FROM courses WHERE id = ?", (course_id,))
@@ -433,6 +513,71 @@ def delete_course():
         print(f"Error deleting course: {str(e)}")
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/seat_history')
+def seat_history_view():
+    """Get recorded seat changes for a course section"""
+    if 'username' not in session:
+        return jsonify({'success': False, 'error': 'Please log in first'})
+    
+    try:
+        course_code = request.args.get('courseCode')
+        section = request.args.get('section')
+        year = request.args.get('year')
+        term = request.args.get('term')
+        limit = int(request.args.get('limit', 20))
+        at = request.args.get('at')
+        
+        if not course_code or not section or not year or not term:
+            return jsonify({'success': False, 'error': 'Course details are incomplete'})
+        
+        response = {
+            'success': True,
+            'changes': seat_history.recent_changes(course_code, section, year, term, limit)
+        }
+        
+        # Optionally include the state as of a given Unix time
+        if at:
+            response['state'] = seat_history.state_at(course_code, section, year, term, int(at))
+        
+        return jsonify(response)
+        
+    except Exception as e:
+        print(f"Error getting seat history: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Get the status of a background job started by the current user"""
+    if 'username' not in session:
+        return jsonify({'success': False, 'error': 'Please log in first'})
+    
+    job = JOB_QUEUE.get(job_id)
+    if not job or job['username'] != session['username']:
+        return jsonify({'success': False, 'error': 'Job not found'})
+    
+    return jsonify({'success': True, 'job': job})
+
+@app.route('/metrics')
+def metrics_view():
+    """Expose process metrics in the Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/cache_stats')
+def cache_stats():
+    """Get hit/miss counters for the shared regblocks response cache, coalesced fetches, login browsers, session renewal, catalog readers and login strategies"""
+    if 'username' not in session:
+        return jsonify({'success': False, 'error': 'Please log in first'})
+    
+    return jsonify({
+        'success': True,
+        'regblocks': REGBLOCKS_CACHE.stats(),
+        'course_flights': scraper.COURSE_FLIGHTS.stats(),
+        'browser_pool': browser_pool.BROWSER_POOL.stats(),
+        'session_refresher': SESSION_REFRESHER.stats(),
+        'catalog_pool': CATALOG_POOL.stats(),
+        'login_strategies': auth_manager.LOGIN_CHAIN.stats()
+    })
+
 # Schedule management routes
 @app.route('/schedule_generator')
 def schedule_generator():
@@ -738,10 +883,17 @@ if __name__ == '__main__':
     # Initialize database
     init_db.init_db()
     
+    # Start login browsers, and rebuild the last known seat state before the first monitor cycle
+    browser_pool.BROWSER_POOL.warm()
+    if not EXTERNAL_MONITOR:
+        scraper.load_seat_state()
+        CATALOG_POOL.warm()
+    
     # Add job and start scheduler
     init_scheduler_job()
     scheduler.start()
-    print("Scheduler started with check_monitored_courses task running every 30 seconds")
+    if not EXTERNAL_MONITOR:
+        print(f"Scheduler started with check_monitored_courses task ticking every {scraper.MONITOR_TICK_SECONDS} seconds")
     
     # Run with SocketIO instead of Flask's built-in server
     # Use allow_unsafe_werkzeug=True to avoid threading issues in development
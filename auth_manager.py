@@ -1,15 +1,22 @@
+import os
 import time
+import hashlib
 import threading
 import requests
 import json
+from collections import deque
 from datetime import datetime, timedelta
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.wait import WebDriverWait
 import logging
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 import notifications
+import http_client
+import metrics
+import cookie_store
+import browser_pool
+import login_strategies
+from singleflight import Flight
 
 # Set up logging
 logger = logging.getLogger('auth_manager')
@@ -18,18 +25,137 @@ logger = logging.getLogger('auth_manager')
 COOKIE_CACHE = {}
 CACHE_LOCK = threading.Lock()
 
-# Track ongoing refresh operations to prevent duplicates
+# Track ongoing refresh operations to prevent duplicates; each in-progress
+# refresh is a Flight whose result is shared with the threads waiting on it
 REFRESH_IN_PROGRESS = {}
 REFRESH_LOCKS = {}
+REFRESH_WAIT_TIMEOUT = 60  # Seconds a waiter waits for another thread's refresh
 
-# Cookie expiration time
+# Hash of each user's password FSU last rejected, so a saved password that is
+# wrong is not posted again (and the account locked) until it changes
+REJECTED_PASSWORDS = {}
+
+# Cookie expiration time, the longest a session is trusted
 COOKIE_EXPIRY = timedelta(minutes=120)
 
-# Global login lock to ensure only one chromedriver at a time
-GLOBAL_LOGIN_LOCK = threading.Lock()
+# (lasted, rejected) for recent sessions: how long until the server rejected
+# them, or for sessions that expired or were renewed first, how long they
+# were seen working, which they may have outlived. New sessions expire after
+# the median lifetime these give (see session_lifetime)
+SESSION_LIFETIMES = deque(maxlen=20)
+MIN_LIFETIME_SAMPLES = 5  # Sessions to see before trusting their median over COOKIE_EXPIRY
+MIN_SESSION_LIFETIME = timedelta(minutes=30)  # So a few early rejections cannot collapse every session
+LIFETIME_LOCK = threading.Lock()
+
+# How long a successful validation is trusted before cached cookies are checked again
+VALIDATION_TTL = timedelta(seconds=int(os.environ.get('FSU_COOKIE_VALIDATION_TTL', 300)))
+
+# Lazy mode trusts cached cookies until a real API call rejects them; callers
+# then clear the cache (see scraper.fetch_course_data and check_course)
+LAZY_VALIDATION = os.environ.get('FSU_LAZY_COOKIE_VALIDATION', '').lower() in ('1', 'true', 'yes')
+
+# Cookie cache and login metrics
+COOKIE_CACHE_LOOKUPS = metrics.counter('fsu_cookie_cache_lookups_total',
+                                       'Cookie requests by whether cached cookies were used', ['result'])
+LOGINS = metrics.counter('fsu_logins_total', 'Browser logins by outcome', ['result'])
+LOGIN_SECONDS = metrics.histogram('fsu_login_seconds', 'Browser login duration including Duo')
+SESSION_LIFETIME_SECONDS = metrics.gauge('fsu_session_lifetime_seconds',
+                                         'Expected session lifetime new logins are cached for')
+SESSION_LIFETIME_SECONDS.set(COOKIE_EXPIRY.total_seconds())
+
+def median_lifetime(samples):
+    """
+    Estimate the median session lifetime from (lasted, rejected) samples.
+    
+    Sessions that were not rejected only show a lower bound on how long
+    sessions last, so this is the Kaplan-Meier median: the time by which
+    half of the sessions are estimated to be rejected, counting each
+    survivor only until it was last seen working.
+    
+    Returns:
+        timedelta, or None if more than half outlived every rejection seen
+    """
+    at_risk = len(samples)
+    surviving = 1.0
+    # At equal times rejections come first, survivors were still at risk
+    for lasted, rejected in sorted(samples, key=lambda sample: (sample[0], not sample[1])):
+        if rejected:
+            surviving *= 1 - 1 / at_risk
+            if surviving <= 0.5:
+                return lasted
+        at_risk -= 1
+    return None
+
+def session_lifetime():
+    """
+    Get how long a new session should be trusted.
+    
+    Returns the median lifetime of recent sessions, so cookies are renewed
+    before the server drops them, between MIN_SESSION_LIFETIME and
+    COOKIE_EXPIRY. Sessions that outlive the estimate raise it again. Until
+    MIN_LIFETIME_SAMPLES sessions have ended this is just COOKIE_EXPIRY.
+    """
+    with LIFETIME_LOCK:
+        if len(SESSION_LIFETIMES) < MIN_LIFETIME_SAMPLES:
+            return COOKIE_EXPIRY
+        lifetime = median_lifetime(SESSION_LIFETIMES)
+    if lifetime is None:
+        return COOKIE_EXPIRY
+    return max(MIN_SESSION_LIFETIME, min(COOKIE_EXPIRY, lifetime))
+
+def record_lifetime(username, cache_entry, rejected):
+    """
+    Record how long a session lasted, once per session.
+    
+    Args:
+        username: The session's user
+        cache_entry: The session's cache entry
+        rejected: True if the server rejected the cookies; otherwise the
+            session reached its expiry or was renewed first, and lasted at
+            least until it was last validated or used
+    """
+    logged_in_at = cache_entry.get('logged_in_at')
+    with LIFETIME_LOCK:
+        if not logged_in_at or cache_entry.get('ended'):
+            return
+        cache_entry['ended'] = True
+        if rejected:
+            lasted = min(datetime.now(), cache_entry['expiry']) - logged_in_at
+        else:
+            last_seen = max(cache_entry.get('validated_at') or logged_in_at,
+                            cache_entry.get('last_used') or logged_in_at)
+            lasted = last_seen - logged_in_at
+        SESSION_LIFETIMES.append((lasted, rejected))
+    lifetime = session_lifetime()
+    SESSION_LIFETIME_SECONDS.set(lifetime.total_seconds())
+    logger.info(f"[{username}] Session {'was rejected after' if rejected else 'worked for at least'} {lasted}, "
+                f"new sessions now expire after {lifetime}")
+
+def end_session(username, cache_entry, rejected=True):
+    """
+    Drop a rejected or expired session and record how long it lasted.
+    
+    Only removes cache_entry if it is still the user's current session, so
+    a rejection seen late does not remove a newer login.
+    """
+    with CACHE_LOCK:
+        if COOKIE_CACHE.get(username) is cache_entry:
+            del COOKIE_CACHE[username]
+    record_lifetime(username, cache_entry, rejected)
+
+def cached_sessions():
+    """Get a snapshot of every cached session, keyed by username."""
+    with CACHE_LOCK:
+        return {username: dict(cache_entry) for username, cache_entry in COOKIE_CACHE.items()}
 
 def validate_cookies(cookies, username=None):
-    """Test if cookies are still valid"""
+    """
+    Test if cookies are still valid.
+    
+    Raises:
+        http_client.UpstreamUnavailable if the server is overloaded, since
+        that does not mean the cookies are bad
+    """
     if username:
         debug_prefix = f"[{username}]"
     else:
@@ -40,18 +166,12 @@ def validate_cookies(cookies, username=None):
             logger.info(f"{debug_prefix} No cookies provided for validation")
             return False
             
-        # Create a proper cookie header
-        headers = {
-            "Cookie": "; ".join(f"{cookie['name']}={cookie['value']}" for cookie in cookies),
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
-        
         # Most reliable endpoint first
-        endpoint = "https://fsu.collegescheduler.com/entry"
+        endpoint = f"{http_client.SCHEDULER_BASE}/entry"
         
         try:
             logger.info(f"{debug_prefix} Validating cookies against {endpoint}...")
-            response = requests.get(endpoint, headers=headers, timeout=5)
+            response = http_client.get(endpoint, cookies=cookies, username=username, timeout=5)
             
             if response.status_code == 200:
                 # Check for specific content that indicates a successful login
@@ -72,85 +192,141 @@ def validate_cookies(cookies, username=None):
             logger.info(f"{debug_prefix} Unexpected status code: {response.status_code}")
             return False
                 
+        except http_client.UpstreamUnavailable:
+            # Overload says nothing about the cookies, don't trigger a login over it
+            raise
         except requests.exceptions.RequestException as e:
             logger.info(f"{debug_prefix} Request failed: {e}")
             return False
             
+    except http_client.UpstreamUnavailable:
+        raise
     except Exception as e:
         logger.info(f"{debug_prefix} Cookie validation failed with error: {e}")
         return False
 
+def load_stored_session(username):
+    """Load a user's persisted session into the cookie cache, unless a newer one got there first."""
+    stored_entry = cookie_store.load_session(username)
+    if not stored_entry:
+        return None
+        
+    with CACHE_LOCK:
+        cache_entry = COOKIE_CACHE.get(username)
+        if cache_entry and cache_entry['expiry'] >= stored_entry['expiry']:
+            return cache_entry
+        COOKIE_CACHE[username] = stored_entry
+        return stored_entry
+
+def get_cached_cookies(username, stage):
+    """
+    Get a user's cached cookies if they are unexpired and known to be valid.
+    
+    Cookies validated within VALIDATION_TTL (or any cookies, in lazy mode)
+    are returned without another request. Validation itself runs outside
+    CACHE_LOCK so a slow upstream does not block other users.
+    
+    Args:
+        username: The user whose cookies to look up
+        stage: Where in get_valid_cookies this check happens, for logging
+        
+    Returns:
+        List of cookies or None
+    """
+    debug_prefix = f"[{username}]"
+    
+    with CACHE_LOCK:
+        cache_entry = COOKIE_CACHE.get(username)
+        
+    if cache_entry and datetime.now() >= cache_entry['expiry']:
+        # Reached its expiry without being rejected
+        end_session(username, cache_entry, rejected=False)
+        cache_entry = None
+        
+    if not cache_entry and cookie_store.PERSIST_SESSIONS:
+        # Another process, or this one before a restart, may have logged in
+        cache_entry = load_stored_session(username)
+        
+    if not cache_entry or datetime.now() >= cache_entry['expiry']:
+        return None
+        
+    validated_at = cache_entry.get('validated_at')
+    if LAZY_VALIDATION or (validated_at and datetime.now() - validated_at < VALIDATION_TTL):
+        logger.info(f"{debug_prefix} Using cached cookies ({stage}, recently validated)")
+        cache_entry['last_used'] = datetime.now()
+        return cache_entry['cookies']
+        
+    if not validate_cookies(cache_entry['cookies'], username):
+        logger.info(f"{debug_prefix} Found cached cookies but they're invalid ({stage})")
+        end_session(username, cache_entry)
+        return None
+        
+    with CACHE_LOCK:
+        # Only stamp the entry if a refresh has not replaced it meanwhile
+        if COOKIE_CACHE.get(username) is cache_entry:
+            cache_entry['validated_at'] = datetime.now()
+            
+    logger.info(f"{debug_prefix} Using valid cached cookies ({stage})")
+    cache_entry['last_used'] = datetime.now()
+    return cache_entry['cookies']
+
+def password_hash(password):
+    return hashlib.sha256(password.encode()).hexdigest()
+
 def get_valid_cookies(username, password, force_refresh=False):
     """
     Get valid cookies - completely simplified logic.
+    
+    Raises:
+        login_strategies.InvalidCredentials: FSU rejected this password, now
+            or on an earlier login; callers must not retry with it
     """
     debug_prefix = f"[{username}]"
     logger.info(f"{debug_prefix} Cookie request received (force_refresh={force_refresh})")
     
     # STEP 1: Check for valid cached cookies first (no locks needed)
     if not force_refresh:
-        with CACHE_LOCK:
-            if username in COOKIE_CACHE:
-                cache_entry = COOKIE_CACHE[username]
-                if datetime.now() < cache_entry['expiry']:
-                    if validate_cookies(cache_entry['cookies'], username):
-                        logger.info(f"{debug_prefix} Using valid cached cookies (initial check)")
-                        return cache_entry['cookies']
-                    logger.info(f"{debug_prefix} Found cached cookies but they're invalid")
+        cookies = get_cached_cookies(username, 'initial check')
+        if cookies:
+            COOKIE_CACHE_LOOKUPS.inc(result='hit')
+            return cookies
+        COOKIE_CACHE_LOOKUPS.inc(result='miss')
+    else:
+        COOKIE_CACHE_LOOKUPS.inc(result='forced_refresh')
     
     # STEP 2: Create a lock for this user if needed
-    if username not in REFRESH_LOCKS:
-        with CACHE_LOCK:
-            if username not in REFRESH_LOCKS:
-                REFRESH_LOCKS[username] = threading.Lock()
-    
-    # STEP 3: Check if refresh is already in progress and wait if needed
-    refresh_in_progress = False
     with CACHE_LOCK:
-        refresh_in_progress = username in REFRESH_IN_PROGRESS and REFRESH_IN_PROGRESS[username]
+        user_lock = REFRESH_LOCKS.setdefault(username, threading.Lock())
+        
+        # STEP 3: Check if refresh is already in progress
+        refresh = REFRESH_IN_PROGRESS.get(username)
     
-    if refresh_in_progress:
+    if refresh:
+        # Wait for the refresh to finish (woken the moment it does) and share its cookies
         logger.info(f"{debug_prefix} Refresh already in progress, waiting...")
-        wait_start = time.time()
-        
-        # Wait for the refresh to complete or time out
-        while True:
-            with CACHE_LOCK:
-                if not (username in REFRESH_IN_PROGRESS and REFRESH_IN_PROGRESS[username]):
-                    logger.info(f"{debug_prefix} Another thread completed refresh")
-                    break
-            
-            # Check timeout
-            if time.time() - wait_start > 60:
-                logger.info(f"{debug_prefix} Timeout waiting for refresh")
-                break
-                
-            time.sleep(1)
+        if not refresh.done.wait(REFRESH_WAIT_TIMEOUT):
+            logger.info(f"{debug_prefix} Timeout waiting for refresh")
+        elif refresh.result:
+            logger.info(f"{debug_prefix} Using cookies from the refresh another thread completed")
+            return refresh.result
+        else:
+            logger.info(f"{debug_prefix} Another thread's refresh did not produce cookies")
         
         # Check for valid cookies after waiting
-        with CACHE_LOCK:
-            if username in COOKIE_CACHE:
-                cache_entry = COOKIE_CACHE[username]
-                if datetime.now() < cache_entry['expiry']:
-                    if validate_cookies(cache_entry['cookies'], username):
-                        logger.info(f"{debug_prefix} Using valid cached cookies (after waiting)")
-                        return cache_entry['cookies']
-                    logger.info(f"{debug_prefix} Found cached cookies but they're invalid (after waiting)")
+        cookies = get_cached_cookies(username, 'after waiting')
+        if cookies:
+            return cookies
     
     # STEP 4: Try to acquire the user lock with timeout
     logger.info(f"{debug_prefix} Attempting to acquire user lock")
-    user_lock_acquired = REFRESH_LOCKS[username].acquire(timeout=10)
+    user_lock_acquired = user_lock.acquire(timeout=10)
     
     if not user_lock_acquired:
         logger.info(f"{debug_prefix} Failed to acquire user lock, checking cached cookies as fallback")
         # If we can't get the lock, try to use cached cookies as a fallback
-        with CACHE_LOCK:
-            if username in COOKIE_CACHE:
-                cache_entry = COOKIE_CACHE[username]
-                if datetime.now() < cache_entry['expiry']:
-                    if validate_cookies(cache_entry['cookies'], username):
-                        logger.info(f"{debug_prefix} Using valid cached cookies (lock acquisition failed)")
-                        return cache_entry['cookies']
+        cookies = get_cached_cookies(username, 'lock acquisition failed')
+        if cookies:
+            return cookies
         logger.info(f"{debug_prefix} Failed to acquire user lock and no valid cached cookies available")
         return None
     
@@ -158,109 +334,150 @@ def get_valid_cookies(username, password, force_refresh=False):
     try:
         # STEP 5: Check again for valid cookies now that we have the user lock
         if not force_refresh:
-            with CACHE_LOCK:
-                if username in COOKIE_CACHE:
-                    cache_entry = COOKIE_CACHE[username]
-                    if datetime.now() < cache_entry['expiry']:
-                        if validate_cookies(cache_entry['cookies'], username):
-                            logger.info(f"{debug_prefix} Using valid cached cookies (after user lock)")
-                            return cache_entry['cookies']
+            cookies = get_cached_cookies(username, 'after user lock')
+            if cookies:
+                return cookies
         
         # STEP 6: Mark that we're starting a refresh
+        refresh = Flight()
         with CACHE_LOCK:
-            REFRESH_IN_PROGRESS[username] = True
+            REFRESH_IN_PROGRESS[username] = refresh
         
         try:
-            # STEP 7: Acquire the global login lock
-            logger.info(f"{debug_prefix} Attempting to acquire global login lock")
-            global_lock_acquired = GLOBAL_LOGIN_LOCK.acquire(timeout=120)
+            # STEP 7: One last check before logging in
+            if not force_refresh:
+                cookies = get_cached_cookies(username, 'before login')
+                if cookies:
+                    refresh.result = cookies
+                    return cookies
             
-            if not global_lock_acquired:
-                logger.info(f"{debug_prefix} Failed to acquire global login lock")
-                return None
+            # STEP 8: Log in, over plain HTTP when CAS lets the user through
+            # and in a pooled browser with Duo otherwise
+            with CACHE_LOCK:
+                rejected_hash = REJECTED_PASSWORDS.get(username)
+            if rejected_hash == password_hash(password):
+                logger.info(f"{debug_prefix} Not logging in with the password FSU already rejected")
+                raise login_strategies.InvalidCredentials("FSU rejected this password before")
             
-            # We now have the global login lock
+            logger.info(f"{debug_prefix} Starting login process")
             try:
-                # STEP 8: One last check before starting browser
-                if not force_refresh:
-                    with CACHE_LOCK:
-                        if username in COOKIE_CACHE:
-                            cache_entry = COOKIE_CACHE[username]
-                            if datetime.now() < cache_entry['expiry']:
-                                if validate_cookies(cache_entry['cookies'], username):
-                                    logger.info(f"{debug_prefix} Using valid cached cookies (after global lock)")
-                                    return cache_entry['cookies']
-                
-                # STEP 9: Perform login
-                logger.info(f"{debug_prefix} Starting login process")
-                
-                # Send notification that 2FA will be needed
-                notifications.send_auth_notification(
-                    username, 
-                    "2FA authentication required. Please check your device for Duo push notification.",
-                    category="warning"
-                )
-                
-                cookies = perform_login(username, password)
-                
-                # Validate and cache the cookies
-                if not validate_cookies(cookies, username):
-                    logger.info(f"{debug_prefix} Login succeeded but cookies are invalid")
-                    return None
-                
+                cookies = LOGIN_CHAIN.login(username, password)
+            except browser_pool.BrowserPoolTimeout:
+                logger.info(f"{debug_prefix} No login browser became free")
+                return None
+            except login_strategies.InvalidCredentials:
+                logger.warning(f"{debug_prefix} FSU rejected the saved password")
                 with CACHE_LOCK:
-                    COOKIE_CACHE[username] = {
-                        'cookies': cookies,
-                        'expiry': datetime.now() + COOKIE_EXPIRY
-                    }
-                
-                # Send success notification
-                notifications.send_auth_notification(
-                    username, 
-                    "Authentication successful! Your session is now active.",
-                    category="success"
-                )
-                
-                logger.info(f"{debug_prefix} Login successful, new cookies cached")
-                return cookies
+                    REJECTED_PASSWORDS[username] = password_hash(password)
+                LOGIN_CHAIN.forget(username)
+                raise
+            
+            with CACHE_LOCK:
+                REJECTED_PASSWORDS.pop(username, None)
+            
+            # Validate and cache the cookies
+            try:
+                validated = validate_cookies(cookies, username)
+            except http_client.UpstreamUnavailable as e:
+                # Keep the cookies of a completed login rather than ask for Duo again;
+                # without validated_at they are checked on their next use
+                logger.info(f"{debug_prefix} Could not validate new cookies, caching them unvalidated: {e}")
+                validated = None
+            if validated is False:
+                logger.info(f"{debug_prefix} Login succeeded but cookies are invalid")
+                return None
+            
+            logged_in_at = datetime.now()
+            cache_entry = {
+                'cookies': cookies,
+                'expiry': logged_in_at + session_lifetime(),
+                'validated_at': logged_in_at if validated else None,
+                'logged_in_at': logged_in_at,
+                'last_used': logged_in_at
+            }
+            with CACHE_LOCK:
+                previous = COOKIE_CACHE.get(username)
+                COOKIE_CACHE[username] = cache_entry
+            if previous:
+                # Renewed before the server rejected it
+                record_lifetime(username, previous, rejected=False)
                 
-            finally:
-                # Always release the global login lock
-                logger.info(f"{debug_prefix} Releasing global login lock")
-                GLOBAL_LOGIN_LOCK.release()
+            if cookie_store.PERSIST_SESSIONS:
+                cookie_store.save_session(username, cache_entry)
+            
+            # Send success notification
+            notifications.send_auth_notification(
+                username, 
+                "Authentication successful! Your session is now active.",
+                category="success"
+            )
+            
+            logger.info(f"{debug_prefix} Login successful, new cookies cached")
+            refresh.result = cookies
+            return cookies
                 
         finally:
-            # Clear the refresh-in-progress flag
+            # Clear the refresh-in-progress flag and wake everyone waiting on it
             with CACHE_LOCK:
-                if username in REFRESH_IN_PROGRESS:
-                    REFRESH_IN_PROGRESS[username] = False
+                if REFRESH_IN_PROGRESS.get(username) is refresh:
+                    del REFRESH_IN_PROGRESS[username]
+            refresh.done.set()
             
     finally:
         # Always release the user lock
         logger.info(f"{debug_prefix} Releasing user lock")
-        REFRESH_LOCKS[username].release()
+        user_lock.release()
     
     # If we reach here, something went wrong
     return None
 
-def perform_login(username, password, headless=True): # Set Headless to False for testing
-    """
-    Perform the login process without socket notifications.
+def notify_queue_position(username, position):
+    """Tell a user how many logins are ahead of theirs."""
+    notifications.send_auth_notification(
+        username,
+        f"Waiting for a login browser, you are number {position} in line.",
+        category="info"
+    )
+
+def notify_duo_required(username):
+    """Warn a user that a browser login, and with it a Duo push, is starting."""
+    notifications.send_auth_notification(
+        username, 
+        "2FA authentication required. Please check your device for Duo push notification.",
+        category="warning"
+    )
+
+def cookies_settled():
+    """Wait condition that holds once the browser has cookies and their count stopped changing."""
+    last_count = [None]
+    
+    def check(driver):
+        count = len(driver.get_cookies())
+        settled = count > 0 and count == last_count[0]
+        last_count[0] = count
+        return settled
+    return check
+
+def perform_login(username, password, driver=None):
     """
-    logger.info(f"Starting ChromeDriver for {username}")
+    Perform the login process in a browser from the pool.
     
-    chrome_options = Options()
-    if headless:
-        chrome_options.add_argument("--headless=new")
-        chrome_options.add_argument("--disable-gpu")
+    Args:
+        username: FSU username
+        password: FSU password
+        driver: Browser checked out of browser_pool.BROWSER_POOL (default
+            check one out for this login)
+    """
+    if driver is None:
+        with browser_pool.BROWSER_POOL.session(timeout=login_strategies.BROWSER_QUEUE_TIMEOUT) as driver:
+            return perform_login(username, password, driver)
+            
+    logger.info(f"Starting browser login for {username}")
     
-    driver = None
+    login_start = time.time()
     try:
-        driver = webdriver.Chrome(options=chrome_options)
-        logger.info(f"ChromeDriver initialized for {username}")
-        
         # Navigate to login page
-        driver.get("https://cas.fsu.edu/cas/login?service=https%3A%2F%2Fwww.my.fsu.edu%2Fc%2Fportal%2Flogin")
+        driver.get(login_strategies.CAS_LOGIN_URL)
         
         # Enter credentials
         userfield = driver.find_element(By.NAME, "username")
@@ -273,8 +490,6 @@ def perform_login(username, password, headless=True): # Set Headless to False fo
         login_button.click()
         
         # Wait for Duo 2FA to complete
-        time.sleep(5)  # Wait for page to load after login
-        
         # Wait for Duo to appear and then to disappear (or timeout)
         max_wait = 120  # Maximum wait time in seconds
         start_time = time.time()
@@ -319,7 +534,7 @@ def perform_login(username, password, headless=True): # Set Headless to False fo
                 By.ID, "kgoui_FpageHeader"))
             
             # Navigate to the scheduler to get necessary cookies
-            driver.get("https://fsu.collegescheduler.com/entry")
+            driver.get(f"{http_client.SCHEDULER_BASE}/entry")
             try:
                 WebDriverWait(driver, 20).until(lambda d: d.find_element(By.ID, "Term-options"))
             except Exception as e:
@@ -335,17 +550,22 @@ def perform_login(username, password, headless=True): # Set Headless to False fo
             )
             raise
             
-        # Give a bit more time for all cookies to be set
-        time.sleep(3)
+        # Give the scheduler time to set all of its cookies
+        try:
+            WebDriverWait(driver, 10, poll_frequency=0.5).until(cookies_settled())
+        except TimeoutException:
+            logger.warning(f"Cookies still changing for {username}, using what is set so far")
         
         # Get and return cookies
         cookies = driver.get_cookies()
         logger.info(f"Got {len(cookies)} cookies from login process for {username}")
         
+        LOGINS.inc(result='success')
         return cookies
     
     except Exception as e:
         logger.error(f"Login failed for {username}: {str(e)}")
+        LOGINS.inc(result='failure')
         # Send error notification
         notifications.send_auth_notification(
             username,
@@ -355,9 +575,14 @@ def perform_login(username, password, headless=True): # Set Headless to False fo
         raise
     
     finally:
-        if driver:
-            logger.info(f"Closing ChromeDriver for {username}")
-            driver.quit()
+        LOGIN_SECONDS.observe(time.time() - login_start)
+
+# Login strategies tried in order by get_valid_cookies, see login_strategies
+LOGIN_CHAIN = login_strategies.build_chain(
+    perform_login,
+    on_queued=notify_queue_position,
+    before_login=notify_duo_required
+)
 
 def get_cookie_header(username, password):
     """Get cookies and format them as a header string for API requests."""
@@ -366,16 +591,42 @@ def get_cookie_header(username, password):
         return None
     return "; ".join(f"{cookie['name']}={cookie['value']}" for cookie in cookies)
 
-def clear_cookie_cache(username=None):
-    """Clear cookie cache for a specific user or all users."""
+def clear_cookie_cache(username=None, rejected=True):
+    """
+    Clear cookie cache for a specific user or all users.
+    
+    Args:
+        username: The user to clear, or None for everyone
+        rejected: True if the server rejected the user's cookies, which ends
+            their session and counts towards the lifetime estimate; pass
+            False to drop the cookies for any other reason
+    """
     with CACHE_LOCK:
         if username:
-            if username in COOKIE_CACHE:
+            cache_entry = COOKIE_CACHE.get(username)
+            if cache_entry and not rejected:
                 del COOKIE_CACHE[username]
-                logger.info(f"Cleared cached cookies for {username}")
+            http_client.clear_cookie_jar(username)
         else:
             COOKIE_CACHE.clear()
             logger.info("Cleared all cached cookies")
+            http_client.clear_cookie_jar()
+            
+    # The CAS session is kept, so a rejected scheduler session is renewed
+    # by single sign-on instead of another Duo push
+        
+    if username and cache_entry:
+        if rejected:
+            end_session(username, cache_entry)
+        logger.info(f"Cleared cached cookies for {username}")
+        
+    if cookie_store.PERSIST_SESSIONS:
+        if username:
+            # Only the cleared cookies are stale, a newer login from another process is kept
+            if cache_entry:
+                cookie_store.delete_session(username, cache_entry['cookies'])
+        else:
+            cookie_store.delete_session()
 
 # This function is no longer needed but we'll keep it as a no-op for backward compatibility
 def clear_auth_state(username=None):
@@ -0,0 +1,237 @@
+"""
+Offline load benchmark for the monitor cycle.
+
+Starts the local stand-in College Scheduler (stand_in_scheduler.py), seeds a
+scratch database with N users each watching M random sections, and runs
+check_monitored_courses, fetch_course_data and process_courses against it.
+Reports cycle wall time, upstream requests per second, database writes and
+p50/p95/p99 per-fetch latency, so scraper changes can be checked for
+regressions without touching FSU's servers.
+
+Every monitor cycle is run with a fresh poll scheduler and an empty
+response cache so all courses are due, i.e. it measures the cost of a full
+cycle. The benchmark runs in a temporary directory, so the real
+fsu_courses.db and logs are untouched.
+
+    python benchmark.py --users 50 --sections 5 --latency 0.05 --cycles 3
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from stand_in_scheduler import StandInConfig, start_stand_in
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+class WriteCounter:
+    """Counts INSERT/UPDATE/DELETE statements run on traced connections."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, statement):
+        if statement.lstrip().split(' ', 1)[0].upper() in ('INSERT', 'UPDATE', 'DELETE', 'REPLACE'):
+            self.count += 1
+
+class FetchTimer:
+    """Wraps http_client.get to record the latency of every regblocks fetch."""
+
+    def __init__(self, get):
+        self.get = get
+        self.latencies = []
+
+    def __call__(self, url, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self.get(url, *args, **kwargs)
+        finally:
+            if url.endswith('/regblocks'):
+                self.latencies.append(time.perf_counter() - start)
+
+def seed_database(scraper, cipher, catalog, users, sections_per_user, year, term, rng):
+    """Create users and monitored sections picked from the stand-in catalog."""
+    all_sections = [(subject + number, section['sectionNumber'])
+                    for (subject, number), sections in catalog.sections.items()
+                    for section in sections]
+
+    conn = scraper.get_db_connection()
+    for index in range(users):
+        username = f'bench{index:04d}'
+        conn.execute("INSERT INTO users (username, password, fsu_password) VALUES (?, ?, ?)",
+                     (username, 'x', cipher.encrypt(b'password')))
+        for course_code, section in rng.sample(all_sections, min(sections_per_user, len(all_sections))):
+            conn.execute("""
+                INSERT INTO monitored_courses (username, courseCode, section, year, term)
+                VALUES (?, ?, ?, ?, ?)
+            """, (username, course_code, section, year, term))
+    conn.commit()
+    conn.close()
+
+def run_benchmark(args):
+    """Run the benchmark and return the report dict."""
+    rng = random.Random(args.seed)
+    server = start_stand_in(StandInConfig(
+        latency=args.latency, latency_jitter=args.latency_jitter, error_rate=args.error_rate,
+        seat_churn=args.seat_churn, subjects=args.subjects,
+        courses_per_subject=args.courses_per_subject, sections_per_course=args.sections_per_course,
+        seed=args.seed))
+
+    previous_cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix='fsu-bench-')
+    try:
+        os.chdir(workdir)
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        os.environ['FSU_SCHEDULER_BASE'] = server.base_url
+
+        logging.disable(logging.CRITICAL if not args.verbose else logging.NOTSET)
+
+        # Imported after the chdir so the scraper's log file and database land in the scratch directory
+        import init_db
+        import http_client
+        import rate_limiter
+        import scraper
+        import auth_manager
+        from encryption import cipher
+        from poll_scheduler import AdaptivePollScheduler
+        from response_cache import REGBLOCKS_CACHE
+
+        http_client.SCHEDULER_BASE = server.base_url
+        scraper.FSU_API_BASE = f'{server.base_url}/api'
+        http_client.configure(max_concurrent_requests=args.concurrency)
+        rate_limiter.LIMITER = rate_limiter.RateLimiter(global_rate=args.rps, global_burst=args.rps,
+                                                        user_rate=args.rps, user_burst=args.rps)
+
+        init_db.init_db()
+        seed_database(scraper, cipher, server.catalog, args.users, args.sections, args.year, args.term, rng)
+
+        # Sessions are pre-seeded so no browser login is attempted
+        for index in range(args.users):
+            auth_manager.COOKIE_CACHE[f'bench{index:04d}'] = {
+                'cookies': [{'name': 'session', 'value': f'bench{index:04d}'}],
+                'expiry': datetime.now() + timedelta(days=1)
+            }
+
+        writes = WriteCounter()
+        connect = scraper.get_db_connection
+
+        def traced_connection():
+            conn = connect()
+            conn.set_trace_callback(writes)
+            return conn
+
+        scraper.get_db_connection = traced_connection
+        timer = FetchTimer(http_client.get)
+        http_client.get = timer
+
+        output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        report = {'config': vars(args), 'cycles': []}
+
+        with output:
+            for _ in range(args.cycles):
+                scraper.POLL_SCHEDULER = AdaptivePollScheduler(requests_per_minute=10 ** 9)
+                REGBLOCKS_CACHE.invalidate()
+                requests_before = server.stats['total']
+                writes_before = writes.count
+                fetches_before = len(timer.latencies)
+
+                start = time.perf_counter()
+                scraper.check_monitored_courses(max_workers=args.workers)
+                wall = time.perf_counter() - start
+
+                requests_made = server.stats['total'] - requests_before
+                report['cycles'].append({
+                    'wall_time': wall,
+                    'requests': requests_made,
+                    'requests_per_second': requests_made / wall if wall else 0.0,
+                    'courses_fetched': len(timer.latencies) - fetches_before,
+                    'db_writes': writes.count - writes_before
+                })
+
+            # A single manual fetch + ingest, as /add_course does it
+            subject, number = next(iter(server.catalog.sections))
+            start = time.perf_counter()
+            data = scraper.fetch_course_data(args.year, args.term, subject, number, 'bench0000', 'password', max_age=0)
+            fetch_time = time.perf_counter() - start
+            writes_before = writes.count
+            start = time.perf_counter()
+            scraper.process_courses(data, args.year, args.term)
+            report['fetch_course_data'] = {'seconds': fetch_time}
+            report['process_courses'] = {'seconds': time.perf_counter() - start,
+                                         'db_writes': writes.count - writes_before}
+
+        latencies = timer.latencies
+        report['fetch_latency'] = {
+            'count': len(latencies),
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99)
+        }
+        report['upstream_requests'] = dict(server.stats)
+    finally:
+        server.shutdown()
+        logging.shutdown()
+        os.chdir(previous_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+def print_report(report):
+    """Print the report as a readable summary."""
+    config = report['config']
+    print(f"Monitor benchmark: {config['users']} users x {config['sections']} sections, "
+          f"latency {config['latency'] * 1000:.0f}ms, error rate {config['error_rate']:.0%}, "
+          f"workers {config['workers'] or 'default'}, host concurrency {config['concurrency']}")
+    print(f"{'cycle':>5} {'wall (s)':>10} {'requests':>9} {'req/s':>8} {'courses':>8} {'db writes':>10}")
+    for index, cycle in enumerate(report['cycles'], 1):
+        print(f"{index:>5} {cycle['wall_time']:>10.3f} {cycle['requests']:>9} "
+              f"{cycle['requests_per_second']:>8.1f} {cycle['courses_fetched']:>8} {cycle['db_writes']:>10}")
+
+    latency = report['fetch_latency']
+    print(f"per-fetch latency over {latency['count']} fetches: p50 {latency['p50'] * 1000:.1f}ms, "
+          f"p95 {latency['p95'] * 1000:.1f}ms, p99 {latency['p99'] * 1000:.1f}ms")
+    print(f"fetch_course_data: {report['fetch_course_data']['seconds'] * 1000:.1f}ms, "
+          f"process_courses: {report['process_courses']['seconds'] * 1000:.1f}ms "
+          f"({report['process_courses']['db_writes']} db writes)")
+    print(f"upstream requests by endpoint: {report['upstream_requests']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the monitor cycle against a local stand-in API")
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--sections', type=int, default=5, help="monitored sections per user")
+    parser.add_argument('--cycles', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=None, help="monitor thread pool size")
+    parser.add_argument('--concurrency', type=int, default=4, help="in-flight requests per host")
+    parser.add_argument('--rps', type=float, default=1000.0, help="rate limiter budget for the run")
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--latency-jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--seat-churn', type=float, default=0.1)
+    parser.add_argument('--subjects', type=int, default=10)
+    parser.add_argument('--courses-per-subject', type=int, default=10)
+    parser.add_argument('--sections-per-course', type=int, default=6)
+    parser.add_argument('--year', default='2025')
+    parser.add_argument('--term', default='Fall')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help="print the raw report as JSON")
+    parser.add_argument('--verbose', action='store_true', help="show scraper output")
+    args = parser.parse_args()
+
+    report = run_benchmark(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
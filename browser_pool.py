@@ -0,0 +1,302 @@
+"""
+Pool of reusable browser sessions for logins.
+
+Starting Chrome for every login was slow, and a single global lock meant
+only one user could log in at a time. The pool keeps up to
+BROWSER_POOL_SIZE drivers, hands them out first come first served, and
+reports queue positions to waiting callers. Every driver is reset to a
+clean profile (no cookies or cache) when it is returned, retired
+after MAX_BROWSER_USES logins, and quit if a login holds it for longer
+than STUCK_BROWSER_TIMEOUT. Call warm() at startup so the first logins do
+not wait for Chrome to start, and reap() every REAP_INTERVAL seconds.
+
+Drivers come from a factory with create/reset/is_alive/all_cookies/quit
+methods, so the pool can be run with stand_in_scheduler.StandInDriverFactory
+instead of Chrome. Replace BROWSER_POOL to change the factory or size;
+callers look it up as browser_pool.BROWSER_POOL when they use it, so the
+replacement is the pool that gets warmed, reaped and shut down:
+
+    browser_pool.BROWSER_POOL = browser_pool.BrowserPool(StandInDriverFactory(), size=4)
+"""
+import os
+import threading
+import time
+import logging
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger('browser_pool')
+
+# Pool settings
+BROWSER_POOL_SIZE = int(os.environ.get('FSU_BROWSER_POOL_SIZE', 2))  # Browsers open at once
+MAX_BROWSER_USES = 20  # Logins before a browser is replaced
+STUCK_BROWSER_TIMEOUT = 6 * 60  # Seconds a login may hold a browser, longer than any Duo wait
+REAP_INTERVAL = 30  # Seconds between checks for stuck browsers
+BROWSER_HEADLESS = os.environ.get('FSU_BROWSER_HEADLESS', '1') != '0'  # Set to 0 to watch logins
+
+class BrowserPoolTimeout(Exception):
+    """No browser became free in time."""
+
+class ChromeDriverFactory:
+    """Creates headless Chrome drivers and wipes their profile between logins."""
+
+    def __init__(self, headless=BROWSER_HEADLESS):
+        self.headless = headless
+
+    def create(self):
+        # Imported here so the pool can be used with other factories without Selenium
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+
+        chrome_options = Options()
+        if self.headless:
+            chrome_options.add_argument("--headless=new")
+            chrome_options.add_argument("--disable-gpu")
+        return webdriver.Chrome(options=chrome_options)
+
+    def reset(self, driver):
+        """Give the next login a fresh profile: no cookies or cache from the last user."""
+        driver.get('about:blank')
+        driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+        driver.execute_cdp_cmd('Network.clearBrowserCache', {})
+
+    def is_alive(self, driver):
+        try:
+            driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def all_cookies(self, driver):
+        """Get the cookies of every domain, not just the current page's."""
+        return driver.execute_cdp_cmd('Network.getAllCookies', {})['cookies']
+
+    def quit(self, driver):
+        driver.quit()
+
+class PooledBrowser:
+    """A driver and its bookkeeping."""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.uses = 0
+        self.checked_out_at = None
+        self.reaped = False
+
+class BrowserPool:
+    """Fixed-size FIFO pool of browser drivers."""
+
+    def __init__(self, factory=None, size=BROWSER_POOL_SIZE, max_uses=MAX_BROWSER_USES,
+                 stuck_timeout=STUCK_BROWSER_TIMEOUT):
+        self.factory = factory or ChromeDriverFactory()
+        self.size = size
+        self.max_uses = max_uses
+        self.stuck_timeout = stuck_timeout
+
+        self.condition = threading.Condition()
+        self.idle = deque()  # PooledBrowsers ready for a login
+        self.busy = set()  # PooledBrowsers checked out
+        self.slots = 0  # Browsers open or being created
+        self.queue = deque()  # Tickets of waiting callers, first come first served
+        self.created = 0
+        self.recycled = 0
+
+    def warm(self):
+        """Start browsers in the background until the pool is full."""
+        def fill():
+            while True:
+                with self.condition:
+                    if self.slots >= self.size:
+                        return
+                    self.slots += 1
+                try:
+                    browser = self.create_browser()
+                except Exception as e:
+                    logger.error(f"Could not start a browser while warming the pool: {e}")
+                    with self.condition:
+                        self.slots -= 1
+                        self.condition.notify_all()
+                    return
+                with self.condition:
+                    self.idle.append(browser)
+                    self.condition.notify_all()
+
+        threading.Thread(target=fill, name='browser-pool-warm', daemon=True).start()
+
+    def create_browser(self):
+        """Create a driver for a slot already reserved by the caller."""
+        started = time.time()
+        browser = PooledBrowser(self.factory.create())
+        with self.condition:
+            self.created += 1
+        logger.info(f"Started a browser in {time.time() - started:.1f}s")
+        return browser
+
+    def discard(self, browser):
+        """Quit a browser and free its slot."""
+        try:
+            self.factory.quit(browser.driver)
+        except Exception as e:
+            logger.warning(f"Error quitting browser: {e}")
+        with self.condition:
+            self.slots -= 1
+            self.recycled += 1
+            self.condition.notify_all()
+
+    def reap_stuck(self):
+        """Quit browsers a login has held for longer than stuck_timeout (caller holds the lock)."""
+        now = time.time()
+        stuck = [browser for browser in self.busy
+                 if not browser.reaped and now - browser.checked_out_at > self.stuck_timeout]
+        for browser in stuck:
+            logger.warning(f"Recycling a browser stuck in a login for {now - browser.checked_out_at:.0f}s")
+            browser.reaped = True
+            self.busy.discard(browser)
+            # Quitting makes the hung WebDriver call fail in the thread holding it
+            threading.Thread(target=self.discard, args=(browser,), daemon=True).start()
+
+    def reap(self):
+        """Recycle stuck browsers; run periodically so they are reclaimed even when nobody waits."""
+        with self.condition:
+            self.reap_stuck()
+
+    def acquire(self, timeout=None, on_queued=None):
+        """
+        Wait for a browser.
+
+        Args:
+            timeout: Seconds to wait for a free browser (default forever)
+            on_queued: Called with the caller's 1-based queue position
+                whenever it has to wait or its position changes (outside the
+                pool lock, so it may do I/O)
+
+        Returns:
+            PooledBrowser
+
+        Raises:
+            BrowserPoolTimeout if no browser became free in time
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        ticket = object()
+        reported = None
+
+        with self.condition:
+            self.queue.append(ticket)
+        try:
+            while True:
+                report = None
+                with self.condition:
+                    self.reap_stuck()
+                    position = self.queue.index(ticket) + 1
+                    if position == 1 and (self.idle or self.slots < self.size):
+                        self.queue.popleft()
+                        if self.idle:
+                            browser = self.idle.popleft()
+                        else:
+                            browser = None
+                            self.slots += 1
+                        break
+
+                    if on_queued and position != reported:
+                        # Reported below, once the lock is released
+                        reported = report = position
+                    else:
+                        remaining = None if deadline is None else deadline - time.time()
+                        if remaining is not None and remaining <= 0:
+                            raise BrowserPoolTimeout(f"No browser free after {timeout}s")
+                        # Wake up now and then to reap stuck browsers even if nobody releases one
+                        self.condition.wait(min(remaining, 5) if remaining is not None else 5)
+
+                if report is not None:
+                    on_queued(report)
+        finally:
+            with self.condition:
+                if ticket in self.queue:
+                    self.queue.remove(ticket)
+                self.condition.notify_all()
+
+        if browser is not None and not self.is_alive(browser):
+            logger.info("Idle browser died, replacing it")
+            self.discard(browser)
+            with self.condition:
+                self.slots += 1
+            browser = None
+
+        if browser is None:
+            try:
+                browser = self.create_browser()
+            except Exception:
+                with self.condition:
+                    self.slots -= 1
+                    self.condition.notify_all()
+                raise
+
+        with self.condition:
+            browser.uses += 1
+            browser.checked_out_at = time.time()
+            self.busy.add(browser)
+        return browser
+
+    def release(self, browser):
+        """Return a browser after a login, resetting or retiring it."""
+        with self.condition:
+            if browser.reaped:
+                return
+            self.busy.discard(browser)
+
+        if browser.uses >= self.max_uses:
+            self.discard(browser)
+            return
+
+        try:
+            self.factory.reset(browser.driver)
+        except Exception as e:
+            logger.warning(f"Could not reset browser, replacing it: {e}")
+            self.discard(browser)
+            return
+
+        with self.condition:
+            self.idle.append(browser)
+            self.condition.notify_all()
+
+    def is_alive(self, browser):
+        """Check an idle browser is still usable, without letting the check raise."""
+        try:
+            return self.factory.is_alive(browser.driver)
+        except Exception:
+            return False
+
+    @contextmanager
+    def session(self, timeout=None, on_queued=None):
+        """Check out a driver for the duration of a with block."""
+        browser = self.acquire(timeout, on_queued)
+        try:
+            yield browser.driver
+        finally:
+            self.release(browser)
+
+    def stats(self):
+        with self.condition:
+            return {
+                'size': self.size,
+                'open': self.slots,
+                'idle': len(self.idle),
+                'busy': len(self.busy),
+                'waiting': len(self.queue),
+                'created': self.created,
+                'recycled': self.recycled
+            }
+
+    def shutdown(self):
+        """Quit all browsers, including ones still checked out for a login."""
+        with self.condition:
+            browsers = list(self.idle) + list(self.busy)
+            self.idle.clear()
+            self.busy.clear()
+            for browser in browsers:
+                # A login that returns its browser later finds it already quit
+                browser.reaped = True
+        for browser in browsers:
+            self.discard(browser)
+
+BROWSER_POOL = BrowserPool()
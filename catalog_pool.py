@@ -0,0 +1,143 @@
+"""
+Shared catalog-reader sessions for seat checks.
+
+Regblocks data is the same for every student, yet the monitor fetched each
+course with one of its watchers' sessions, so every watching user needed a
+login and Duo approval, and a user whose session expired stopped being
+polled until they approved the next push. With FSU_CATALOG_READERS set to a
+comma-separated list of app usernames (each with a saved FSU password), the
+monitor fetches with those readers' sessions instead, taking them round
+robin. Watchers' own sessions are only used when no reader has a healthy
+session, so logins and Duo prompts no longer grow with the number of users.
+Readers fetch on behalf of every watcher, so their requests are paced by
+the global rate limit budget only, not the per-user one.
+
+Readers whose session is missing or rejected are logged in again in the
+background, at most once per LOGIN_RETRY_SECONDS each, and the fetch path
+never waits for those logins.
+"""
+import os
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import auth_manager
+import http_client
+import metrics
+import rate_limiter
+from encryption import cipher
+
+logger = logging.getLogger('catalog_pool')
+
+CATALOG_READERS = [username.strip() for username in os.environ.get('FSU_CATALOG_READERS', '').split(',')
+                   if username.strip()]
+LOGIN_RETRY_SECONDS = 10 * 60  # Wait before logging a reader in again, so a failing account is not pushed repeatedly
+
+CATALOG_FETCHES = metrics.counter('fsu_catalog_session_uses_total',
+                                  'Seat checks by whose session was used', ['session'])
+
+class CatalogSessionPool:
+    """Round-robin pool of reader sessions that can fetch any course."""
+
+    def __init__(self, readers=None, login_retry=LOGIN_RETRY_SECONDS):
+        self.readers = list(CATALOG_READERS if readers is None else readers)
+        self.login_retry = login_retry
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='catalog-login')
+        self.lock = threading.Lock()
+        self.next_index = 0
+        self.logging_in = set()
+        self.last_login = {}  # username -> time.monotonic() of the last login attempt
+
+    @property
+    def enabled(self):
+        return bool(self.readers)
+
+    def is_reader(self, username):
+        return username in self.readers
+
+    def sessions(self):
+        """
+        Yield (username, cookies) for each reader with a healthy session,
+        starting one reader further along on every call.
+
+        Readers without a usable session are skipped and logged in again in
+        the background.
+        """
+        with self.lock:
+            start = self.next_index
+            self.next_index = (self.next_index + 1) % max(1, len(self.readers))
+
+        for offset in range(len(self.readers)):
+            username = self.readers[(start + offset) % len(self.readers)]
+            try:
+                cookies = auth_manager.get_cached_cookies(username, 'catalog pool')
+            except http_client.UpstreamUnavailable:
+                # Every reader would hit the same overloaded server
+                return
+            if cookies:
+                yield username, cookies
+            else:
+                self.login_in_background(username)
+
+    def reject(self, username):
+        """Drop a reader's session the server rejected and log it in again."""
+        logger.info(f"Catalog reader {username} was rejected")
+        auth_manager.clear_cookie_cache(username)
+        self.login_in_background(username)
+
+    def login_in_background(self, username):
+        """Start a login for a reader unless one is running or was tried recently."""
+        with self.lock:
+            last = self.last_login.get(username)
+            if username in self.logging_in or (last is not None and time.monotonic() - last < self.login_retry):
+                return
+            self.logging_in.add(username)
+            self.last_login[username] = time.monotonic()
+        self.executor.submit(self.login, username)
+
+    def login(self, username):
+        try:
+            encrypted_password = self.load_password(username)
+            if not encrypted_password:
+                logger.error(f"Catalog reader {username} has no saved FSU password")
+                return
+            logger.info(f"Logging in catalog reader {username}")
+            if not auth_manager.get_valid_cookies(username, cipher.decrypt(encrypted_password)):
+                logger.warning(f"Catalog reader {username} could not log in")
+        except Exception as e:
+            logger.error(f"Catalog reader {username} login failed: {e}")
+        finally:
+            with self.lock:
+                self.logging_in.discard(username)
+
+    def load_password(self, username):
+        # Import here to avoid circular imports
+        import scraper
+
+        conn = scraper.get_db_connection()
+        try:
+            row = conn.execute("SELECT fsu_password FROM users WHERE username = ?", (username,)).fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else None
+
+    def warm(self):
+        """Log in every reader that has no session yet."""
+        for username in self.readers:
+            if not auth_manager.cached_sessions().get(username):
+                self.login_in_background(username)
+
+    def stats(self):
+        sessions = auth_manager.cached_sessions()
+        with self.lock:
+            return {
+                'readers': len(self.readers),
+                'with_session': sum(1 for username in self.readers if username in sessions),
+                'logging_in': len(self.logging_in)
+            }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+CATALOG_POOL = CatalogSessionPool()
+rate_limiter.LIMITER.exempt(CATALOG_POOL.readers)
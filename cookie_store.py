@@ -0,0 +1,131 @@
+"""
+Persistent, encrypted store for login sessions.
+
+auth_manager.COOKIE_CACHE only lives as long as the process, so a restart
+used to mean a browser login and a Duo push for every watched user. With
+FSU_PERSIST_SESSIONS=1, every login's cookies are also saved in the
+cookie_sessions table, encrypted with the same cipher as fsu_password.
+Sessions are loaded lazily, the first time a user's cookies are needed and
+not in memory, which also lets processes sharing the database (the web app
+and monitor workers) pick up each other's logins.
+
+Storage errors are logged and treated as a miss; they never break a login.
+"""
+import os
+import json
+import time
+import logging
+from datetime import datetime
+from encryption import cipher
+
+logger = logging.getLogger('cookie_store')
+
+PERSIST_SESSIONS = os.environ.get('FSU_PERSIST_SESSIONS', '').lower() in ('1', 'true', 'yes')
+
+def to_timestamp(value):
+    """Convert a datetime (or None) to Unix time for storage."""
+    return int(value.timestamp()) if value else None
+
+def from_timestamp(value):
+    """Convert stored Unix time (or None) back to a datetime."""
+    return datetime.fromtimestamp(value) if value else None
+
+def save_session(username, cache_entry):
+    """
+    Save a user's session, replacing any older one.
+
+    Args:
+        username: The user the cookies belong to
+        cache_entry: auth_manager cache entry with 'cookies', 'expiry' and
+            optionally 'validated_at'
+    """
+    # Import here to avoid circular imports
+    import scraper
+
+    try:
+        encrypted_cookies = cipher.encrypt(json.dumps(cache_entry['cookies']).encode())
+        conn = scraper.get_db_connection()
+        try:
+            conn.execute("""
+                INSERT INTO cookie_sessions (username, cookies, expiry, validated_at, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(username) DO UPDATE SET
+                    cookies = excluded.cookies,
+                    expiry = excluded.expiry,
+                    validated_at = excluded.validated_at,
+                    updated_at = excluded.updated_at
+            """, (username, encrypted_cookies, to_timestamp(cache_entry['expiry']),
+                  to_timestamp(cache_entry.get('validated_at')), int(time.time())))
+
+            # Drop other users' sessions that have run out
+            conn.execute("DELETE FROM cookie_sessions WHERE expiry <= ?", (int(time.time()),))
+            conn.commit()
+        finally:
+            conn.close()
+        logger.info(f"Saved session for {username}")
+    except Exception as e:
+        logger.warning(f"Could not save session for {username}: {e}")
+
+def load_session(username):
+    """
+    Load a user's unexpired session.
+
+    Returns:
+        Cache entry dict with 'cookies', 'expiry' and 'validated_at', or None
+    """
+    # Import here to avoid circular imports
+    import scraper
+
+    try:
+        conn = scraper.get_db_connection()
+        try:
+            row = conn.execute(
+                "SELECT cookies, expiry, validated_at FROM cookie_sessions WHERE username = ? AND expiry > ?",
+                (username, int(time.time()))
+            ).fetchone()
+        finally:
+            conn.close()
+        if not row:
+            return None
+
+        encrypted_cookies, expiry, validated_at = row
+        logger.info(f"Loaded stored session for {username}")
+        return {
+            'cookies': json.loads(cipher.decrypt(encrypted_cookies)),
+            'expiry': from_timestamp(expiry),
+            'validated_at': from_timestamp(validated_at)
+        }
+    except Exception as e:
+        logger.warning(f"Could not load session for {username}: {e}")
+        return None
+
+def delete_session(username=None, cookies=None):
+    """
+    Delete a user's stored session, or every stored session.
+
+    Args:
+        username: The user whose session to delete (default all users)
+        cookies: Only delete the user's session if it still holds these
+            cookies, so a rejected session does not wipe out a newer login
+            saved by another process
+    """
+    # Import here to avoid circular imports
+    import scraper
+
+    try:
+        conn = scraper.get_db_connection()
+        try:
+            if username is None:
+                conn.execute("DELETE FROM cookie_sessions")
+            else:
+                if cookies is not None:
+                    row = conn.execute("SELECT cookies FROM cookie_sessions WHERE username = ?",
+                                       (username,)).fetchone()
+                    if not row or json.loads(cipher.decrypt(row[0])) != cookies:
+                        return
+                conn.execute("DELETE FROM cookie_sessions WHERE username = ?", (username,))
+            conn.commit()
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.warning(f"Could not delete stored session for {username or 'all users'}: {e}")
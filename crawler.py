@@ -0,0 +1,286 @@
+"""
+Term-wide catalog crawler.
+
+Walks every subject and course of a term and feeds each course's regblocks
+through the bulk ingest path, so the schedule generator has the whole
+catalog without users adding courses one at a time. Progress is
+checkpointed in the crawl_progress table, so a crashed or restarted crawl
+picks up where it stopped. While the upstream is unavailable, workers wait
+for the circuit breaker before retrying, so an outage does not mark the
+rest of the term failed.
+
+Point FSU_SCHEDULER_BASE at a local stand-in server to crawl without
+touching FSU's servers.
+"""
+import time
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import http_client
+import rate_limiter
+import scraper
+from response_cache import REGBLOCKS_CACHE, course_key
+from auth_manager import get_valid_cookies
+
+logger = logging.getLogger('crawler')
+
+# Crawl limits
+CRAWL_MAX_WORKERS = 4  # Courses fetched in parallel
+CRAWL_REQUESTS_PER_SECOND = 2.0  # Upper bound on the crawl's request rate
+CRAWL_UPSTREAM_RETRIES = 5  # Times a subject or course is retried while the upstream is unavailable
+
+# Marker stored in the course column once a subject's course list is saved
+SUBJECT_LISTED = ''
+
+class RequestPacer:
+    """Space requests out so the crawl never exceeds a fixed rate."""
+
+    def __init__(self, requests_per_second):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0
+        self.lock = threading.Lock()
+        self.next_slot = time.monotonic()
+
+    def wait(self):
+        """Block until the next request is allowed."""
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+class CrawlSession:
+    """Cookies for a crawl, refreshed once when the API rejects them."""
+
+    def __init__(self, username, password):
+        self.username = username
+        self.password = password
+        self.lock = threading.Lock()
+        self.cookies = get_valid_cookies(username, password)
+
+    def get(self, url, pacer):
+        """GET a JSON document, re-authenticating once if the session is rejected."""
+        for attempt in range(2):
+            cookies = self.cookies
+            if not cookies:
+                raise RuntimeError(f"No valid cookies for {self.username}")
+
+            pacer.wait()
+            response = http_client.get(url, cookies=cookies, username=self.username, allow_redirects=False)
+
+            if http_client.is_auth_failure(response) and attempt == 0:
+                logger.info(f"Crawl session rejected ({response.status_code}), refreshing cookies")
+                with self.lock:
+                    if self.cookies is cookies:
+                        self.cookies = get_valid_cookies(self.username, self.password, force_refresh=True)
+                continue
+
+            if http_client.is_auth_failure(response):
+                raise http_client.AuthRejected(f"Session rejected with status {response.status_code}")
+            response.raise_for_status()
+            return response.json()
+
+def item_code(item, *fields):
+    """Get the first present identifier field from a subject or course entry."""
+    if isinstance(item, str):
+        return item
+    for field in fields:
+        if item.get(field):
+            return str(item[field])
+    return None
+
+def list_subjects(session, pacer, year, term):
+    """Get every subject code offered in a term."""
+    data = session.get(f'{scraper.FSU_API_BASE}/terms/{year}%20{term}/subjects', pacer)
+    return [code for code in (item_code(item, 'id', 'subjectId', 'short') for item in data) if code]
+
+def list_courses(session, pacer, year, term, subject):
+    """Get every course number offered for a subject in a term."""
+    data = session.get(f'{scraper.FSU_API_BASE}/terms/{year}%20{term}/subjects/{subject}/courses', pacer)
+    return [code for code in (item_code(item, 'number', 'courseNumber', 'id') for item in data) if code]
+
+def set_progress(rows):
+    """
+    Record crawl progress.
+
+    Args:
+        rows: List of (year, term, subject, course, status) tuples
+    """
+    conn = scraper.get_db_connection()
+    try:
+        conn.executemany("""
+            INSERT INTO crawl_progress (year, term, subject, course, status, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(year, term, subject, course) DO UPDATE SET
+                status = excluded.status,
+                updated_at = excluded.updated_at
+        """, [row + (int(time.time()),) for row in rows])
+        conn.commit()
+    finally:
+        conn.close()
+
+def get_progress(year, term):
+    """
+    Get the checkpoint for a term.
+
+    Returns:
+        Tuple of (set of listed subjects, list of (subject, course) still to fetch)
+    """
+    conn = scraper.get_db_connection()
+    try:
+        cursor = conn.execute("""
+            SELECT subject, course, status FROM crawl_progress
+            WHERE year = ? AND term = ?
+            ORDER BY subject, course
+        """, (str(year), term))
+        rows = cursor.fetchall()
+    finally:
+        conn.close()
+
+    listed = {subject for subject, course, _ in rows if course == SUBJECT_LISTED}
+    pending = [(subject, course) for subject, course, status in rows
+               if course != SUBJECT_LISTED and status != 'done']
+    return listed, pending
+
+def reset_progress(year, term):
+    """Forget a term's checkpoint so the next crawl starts from scratch."""
+    conn = scraper.get_db_connection()
+    try:
+        conn.execute("DELETE FROM crawl_progress WHERE year = ? AND term = ?", (str(year), term))
+        conn.commit()
+    finally:
+        conn.close()
+
+def crawl_subject(session, pacer, year, term, subject):
+    """List a subject's courses and checkpoint them as pending."""
+    courses = list_courses(session, pacer, year, term, subject)
+    set_progress([(str(year), term, subject, course, 'pending') for course in courses] +
+                 [(str(year), term, subject, SUBJECT_LISTED, 'done')])
+    logger.info(f"Listed {len(courses)} courses for {subject} {term} {year}")
+    return len(courses)
+
+def crawl_course(session, pacer, year, term, subject, course):
+    """Fetch and ingest one course, then checkpoint it."""
+    data = session.get(
+        f'{scraper.FSU_API_BASE}/terms/{year}%20{term}/subjects/{subject}/courses/{course}/regblocks', pacer)
+    sections = (data or {}).get('sections', []) if isinstance(data, (dict, type(None))) else None
+    if not isinstance(sections, list):
+        # An error page or unexpected shape, fail this course and keep crawling
+        raise ValueError(f"Unexpected regblocks payload of type {type(data).__name__}")
+
+    REGBLOCKS_CACHE.put(course_key(year, term, subject, course), data)
+    results = scraper.ingest_sections(sections, year, term)
+
+    failed = any(result['status'] == 'error' for result in results)
+    set_progress([(str(year), term, subject, course, 'failed' if failed else 'done')])
+    return len(results)
+
+def when_available(func, *args, retries=None):
+    """
+    Run func(*args), waiting for the circuit breaker and retrying while the
+    upstream is unavailable.
+
+    Raises:
+        http_client.UpstreamUnavailable if it is still unavailable after
+        CRAWL_UPSTREAM_RETRIES retries
+    """
+    retries = CRAWL_UPSTREAM_RETRIES if retries is None else retries
+    for attempt in range(retries + 1):
+        try:
+            return func(*args)
+        except http_client.UpstreamUnavailable as e:
+            if attempt == retries:
+                raise
+            wait = max(rate_limiter.BREAKER.retry_in(), rate_limiter.backoff_delay(attempt))
+            logger.info(f"Upstream unavailable ({e}), retrying in {wait:.1f}s")
+            time.sleep(wait)
+
+def crawl_term(year, term, username, password, max_workers=None, requests_per_second=None, restart=False):
+    """
+    Crawl every subject and course of a term into the database.
+
+    Args:
+        year: The academic year (e.g., 2025)
+        term: The academic term (e.g., Fall)
+        username: FSU username whose session is used for the crawl
+        password: FSU password for that user
+        max_workers: Requests in flight at once (default CRAWL_MAX_WORKERS)
+        requests_per_second: Rate limit for the crawl (default CRAWL_REQUESTS_PER_SECOND)
+        restart: Ignore any saved checkpoint and start over
+
+    Returns:
+        Dict with subjects, courses, sections and failed counts for this run,
+        and deferred for those left to the next run while the upstream was down
+    """
+    start_time = time.time()
+    summary = {'subjects': 0, 'courses': 0, 'sections': 0, 'failed': 0, 'deferred': 0}
+
+    if restart:
+        reset_progress(year, term)
+
+    session = CrawlSession(username, password)
+    if not session.cookies:
+        logger.error(f"Could not authenticate {username}, crawl aborted")
+        return summary
+
+    pacer = RequestPacer(requests_per_second or CRAWL_REQUESTS_PER_SECOND)
+    listed, _ = get_progress(year, term)
+
+    with ThreadPoolExecutor(max_workers=max_workers or CRAWL_MAX_WORKERS,
+                            thread_name_prefix='crawler') as executor:
+        # Phase 1: list the courses of every subject not listed yet
+        subjects = [subject for subject in when_available(list_subjects, session, pacer, year, term)
+                    if subject not in listed]
+        logger.info(f"Crawling {term} {year}: {len(listed)} subjects already listed, {len(subjects)} to go")
+
+        futures = {executor.submit(when_available, crawl_subject, session, pacer, year, term, subject): subject
+                   for subject in subjects}
+        for future, subject in futures.items():
+            try:
+                future.result()
+                summary['subjects'] += 1
+            except http_client.UpstreamUnavailable as e:
+                # Not checkpointed, so the next run lists it
+                logger.error(f"Upstream still unavailable, leaving {subject} for the next run: {e}")
+                summary['deferred'] += 1
+            except Exception as e:
+                logger.error(f"Failed to list courses for {subject}: {e}")
+                summary['failed'] += 1
+
+        # Phase 2: fetch every course that is not done yet
+        _, pending = get_progress(year, term)
+        logger.info(f"Crawling {term} {year}: {len(pending)} courses to fetch")
+
+        futures = {executor.submit(when_available, crawl_course, session, pacer, year, term, subject, course):
+                   (subject, course) for subject, course in pending}
+        for future, (subject, course) in futures.items():
+            try:
+                summary['sections'] += future.result()
+                summary['courses'] += 1
+            except http_client.UpstreamUnavailable as e:
+                # Still pending, so the next run fetches it
+                logger.error(f"Upstream still unavailable, leaving {subject}{course} for the next run: {e}")
+                summary['deferred'] += 1
+            except Exception as e:
+                # Any failure is confined to its course so the rest of the term is still crawled
+                logger.error(f"Failed to crawl {subject}{course}: {e}")
+                set_progress([(str(year), term, subject, course, 'failed')])
+                summary['failed'] += 1
+
+    logger.info(f"Crawl of {term} {year} finished in {time.time() - start_time:.1f}s: {summary}")
+    return summary
+
+# Main execution block
+if __name__ == "__main__":
+    import init_db
+
+    # Initialize the database
+    init_db.init_db()
+
+    username = input("FSU username: ")
+    password = input("FSU password: ")
+    year = input("Year (e.g., 2025): ")
+    term = input("Term (e.g., Fall): ")
+    restart = input("Ignore saved progress and start over? (y/N): ").strip().lower() == 'y'
+
+    print(crawl_term(year, term, username, password, restart=restart))
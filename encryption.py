@@ -7,15 +7,15 @@ class AESCipher(object):
         self.iv = iv
 
     def encrypt(self, raw):
-        self.cipher = AES.new(self.key, AES.MODE_CFB,self.iv)
-        ciphertext = self.cipher.encrypt(raw)
+        cipher = AES.new(self.key, AES.MODE_CFB,self.iv)
+        ciphertext = cipher.encrypt(raw)
         encoded = base64.b64encode(ciphertext)
         return encoded
 
     def decrypt(self, raw):
         decoded = base64.b64decode(raw)
-        self.cipher = AES.new(self.key, AES.MODE_CFB,self.iv)
-        decrypted = self.cipher.decrypt(decoded)
+        cipher = AES.new(self.key, AES.MODE_CFB,self.iv)
+        decrypted = cipher.decrypt(decoded)
         return decrypted.decode('utf-8')
 
 
@@ -0,0 +1,252 @@
+"""
+Shared HTTP client for all College Scheduler traffic.
+
+Every request to fsu.collegescheduler.com goes through one pooled
+requests Session, so keep-alive connections (and their TLS handshakes)
+are reused across course fetches, cookie validation and monitor cycles.
+Each user's cookies are kept in their own cookie jar and attached per
+request; the shared session itself never stores cookies.
+
+Requests are paced by rate_limiter.LIMITER and guarded by
+rate_limiter.BREAKER. Overload (429/5xx, connection failures) is retried
+with backoff and then surfaced as UpstreamUnavailable, while a rejected
+session is surfaced as AuthRejected, so callers only re-login when the
+problem really is authentication.
+"""
+import os
+import threading
+import logging
+from http import cookiejar
+from urllib.parse import urlparse
+import time
+import requests
+from requests.adapters import HTTPAdapter
+import rate_limiter
+import metrics
+
+logger = logging.getLogger('http_client')
+
+# College Scheduler endpoints (override to point at a local stand-in server)
+SCHEDULER_BASE = os.environ.get('FSU_SCHEDULER_BASE', 'https://fsu.collegescheduler.com').rstrip('/')
+API_BASE = f'{SCHEDULER_BASE}/api'
+
+# Connection pool settings
+POOL_CONNECTIONS = 4  # Number of hosts to keep connection pools for
+POOL_MAXSIZE = 16  # Keep-alive connections kept per host
+MAX_CONCURRENT_REQUESTS_PER_HOST = 4  # In-flight requests allowed to a single host
+
+# Default timeouts in seconds
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 10
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+_session = None
+_session_lock = threading.Lock()
+
+# Per-user cookie jars, rebuilt whenever the user's cookies change
+USER_COOKIE_JARS = {}
+JARS_LOCK = threading.Lock()
+
+# Upstream request metrics, labelled by endpoint kind (see endpoint_name)
+REQUEST_SECONDS = metrics.histogram('fsu_upstream_request_seconds',
+                                    'College Scheduler request latency', ['endpoint'])
+RESPONSES = metrics.counter('fsu_upstream_responses_total',
+                            'College Scheduler responses by status code', ['endpoint', 'status'])
+
+# One semaphore per host caps in-flight requests across all threads
+HOST_SEMAPHORES = {}
+HOST_SEMAPHORES_LOCK = threading.Lock()
+
+class UpstreamUnavailable(requests.exceptions.RequestException):
+    """The upstream is overloaded or the circuit breaker is open."""
+
+class AuthRejected(requests.exceptions.RequestException):
+    """The upstream rejected the session's cookies."""
+
+def endpoint_name(url):
+    """Get a low-cardinality endpoint name for a URL, e.g. 'regblocks' or 'entry'."""
+    name = urlparse(url).path.rstrip('/').rsplit('/', 1)[-1]
+    return name if name in ('entry', 'subjects', 'courses', 'regblocks') else 'other'
+
+def is_overload(response):
+    """Check whether a response means the upstream is overloaded rather than broken."""
+    return response.status_code == 429 or response.status_code >= 500
+
+def is_auth_failure(response):
+    """Check whether a response means the cookies were rejected (401/403 or a redirect to login)."""
+    return response.status_code in (401, 403, 302)
+
+class SharedSessionCookiePolicy(cookiejar.DefaultCookiePolicy):
+    """Cookie policy that keeps the shared session from storing response cookies."""
+    def set_ok(self, cookie, request):
+        # The session is shared by every user, so a Set-Cookie from one
+        # user's response must never leak into another user's request
+        return False
+
+def create_session():
+    """Create a requests Session with a keep-alive connection pool."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.cookies.set_policy(SharedSessionCookiePolicy())
+    session.headers['User-Agent'] = USER_AGENT
+    return session
+
+def get_session():
+    """Get the shared Session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+                logger.info(f"Created shared HTTP session (pool_maxsize={POOL_MAXSIZE})")
+    return _session
+
+def configure(pool_connections=None, pool_maxsize=None, max_concurrent_requests=None,
+              connect_timeout=None, read_timeout=None):
+    """
+    Change pool size or timeouts. The shared session is rebuilt on next use.
+
+    Args:
+        pool_connections: Number of hosts to keep connection pools for
+        pool_maxsize: Keep-alive connections kept per host
+        max_concurrent_requests: In-flight requests allowed to a single host
+        connect_timeout: Default connect timeout in seconds
+        read_timeout: Default read timeout in seconds
+    """
+    global _session, POOL_CONNECTIONS, POOL_MAXSIZE, MAX_CONCURRENT_REQUESTS_PER_HOST
+    global CONNECT_TIMEOUT, READ_TIMEOUT
+
+    with _session_lock:
+        if pool_connections is not None:
+            POOL_CONNECTIONS = pool_connections
+        if pool_maxsize is not None:
+            POOL_MAXSIZE = pool_maxsize
+        if connect_timeout is not None:
+            CONNECT_TIMEOUT = connect_timeout
+        if read_timeout is not None:
+            READ_TIMEOUT = read_timeout
+        if _session is not None:
+            _session.close()
+            _session = None
+
+    if max_concurrent_requests is not None:
+        with HOST_SEMAPHORES_LOCK:
+            MAX_CONCURRENT_REQUESTS_PER_HOST = max_concurrent_requests
+            HOST_SEMAPHORES.clear()
+
+def get_host_semaphore(url):
+    """Get the semaphore limiting concurrent requests to the host of a URL."""
+    host = urlparse(url).netloc
+    with HOST_SEMAPHORES_LOCK:
+        if host not in HOST_SEMAPHORES:
+            HOST_SEMAPHORES[host] = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS_PER_HOST)
+        return HOST_SEMAPHORES[host]
+
+def get_cookie_jar(username, cookies):
+    """
+    Get the cookie jar for a user's cookies.
+
+    Args:
+        username: The user the cookies belong to (None for a one-off jar)
+        cookies: List of cookie dictionaries as returned by Selenium
+
+    Returns:
+        RequestsCookieJar holding the cookies
+    """
+    pairs = tuple((cookie['name'], cookie['value']) for cookie in cookies)
+
+    if username:
+        with JARS_LOCK:
+            cached = USER_COOKIE_JARS.get(username)
+            if cached and cached[0] == pairs:
+                return cached[1]
+
+    # Cookies are sent for every path on the scheduler host, like the
+    # Cookie header built from the Selenium cookies always was
+    jar = requests.cookies.RequestsCookieJar()
+    for name, value in pairs:
+        jar.set(name, value)
+
+    if username:
+        with JARS_LOCK:
+            USER_COOKIE_JARS[username] = (pairs, jar)
+    return jar
+
+def clear_cookie_jar(username=None):
+    """Drop the cookie jar for a specific user or all users."""
+    with JARS_LOCK:
+        if username:
+            USER_COOKIE_JARS.pop(username, None)
+        else:
+            USER_COOKIE_JARS.clear()
+
+def get(url, cookies=None, username=None, timeout=None, retries=None, **kwargs):
+    """
+    Make a GET request through the shared session.
+
+    Args:
+        url: The URL to request
+        cookies: List of cookie dictionaries to send (optional)
+        username: The user the cookies belong to, used to reuse their jar
+            and for the per-user rate limit (optional)
+        timeout: Read timeout in seconds (default READ_TIMEOUT)
+        retries: Retries for overload responses (default rate_limiter.MAX_RETRIES)
+        **kwargs: Passed through to requests
+
+    Returns:
+        requests.Response
+
+    Raises:
+        UpstreamUnavailable if the circuit is open or the upstream stayed overloaded
+        requests.exceptions.RequestException for other request failures
+    """
+    if cookies:
+        kwargs['cookies'] = get_cookie_jar(username, cookies)
+    kwargs['timeout'] = (CONNECT_TIMEOUT, timeout if timeout is not None else READ_TIMEOUT)
+    retries = rate_limiter.MAX_RETRIES if retries is None else retries
+    breaker = rate_limiter.BREAKER
+    endpoint = endpoint_name(url)
+
+    for attempt in range(retries + 1):
+        if not breaker.allow():
+            raise UpstreamUnavailable(f"Circuit open for {urlparse(url).netloc}, "
+                                      f"retry in {breaker.retry_in():.0f}s")
+
+        rate_limiter.LIMITER.acquire(username)
+
+        try:
+            with get_host_semaphore(url):
+                with REQUEST_SECONDS.time(endpoint=endpoint):
+                    response = get_session().get(url, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            RESPONSES.inc(endpoint=endpoint, status='error')
+            breaker.record_failure()
+            if attempt < retries:
+                delay = rate_limiter.backoff_delay(attempt)
+                logger.info(f"Request to {url} failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            raise UpstreamUnavailable(f"Request to {url} failed: {e}") from e
+        except requests.exceptions.RequestException:
+            breaker.release()
+            raise
+
+        RESPONSES.inc(endpoint=endpoint, status=response.status_code)
+
+        if not is_overload(response):
+            breaker.record_success()
+            return response
+
+        retry_after = rate_limiter.parse_retry_after(response.headers.get('Retry-After'))
+        breaker.record_failure(retry_after)
+
+        if attempt < retries and (retry_after or 0) <= rate_limiter.MAX_RETRY_AFTER_WAIT:
+            delay = max(retry_after or 0, rate_limiter.backoff_delay(attempt))
+            logger.info(f"Upstream returned {response.status_code} for {url}, retrying in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+
+        raise UpstreamUnavailable(f"Upstream returned {response.status_code} for {url}")
@@ -54,6 +54,102 @@ def init_courses():
             )
         """)
 
+        # Hash of the last written data for each section, used to skip unchanged writes
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS course_fingerprints (
+                courseCode TEXT NOT NULL,
+                section TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                PRIMARY KEY (courseCode, section)
+            )
+        """)
+
+        # Seat counts over time, one row per change. A change in the same
+        # second as the previous one is stored a second later (see
+        # seat_history.record_changes), so the key never overwrites a row
+        columns = [row[1] for row in cursor.execute("PRAGMA table_info(seat_history)")]
+        if 'id' in columns:
+            # Rowid tables repeated the whole key in a separate index
+            cursor.execute("ALTER TABLE seat_history RENAME TO seat_history_old")
+            cursor.execute("DROP INDEX IF EXISTS idx_seat_history_section_ts")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS seat_history (
+                courseCode TEXT NOT NULL,
+                section TEXT NOT NULL,
+                year TEXT NOT NULL,
+                term TEXT NOT NULL,
+                ts INTEGER NOT NULL,  -- Unix time of the change
+                open INTEGER NOT NULL,
+                capacity INTEGER NOT NULL,
+                PRIMARY KEY (courseCode, section, year, term, ts)
+            ) WITHOUT ROWID
+        """)
+        if 'id' in columns:
+            rows = cursor.execute("""
+                SELECT courseCode, section, year, term, ts, open, capacity
+                FROM seat_history_old ORDER BY courseCode, section, year, term, ts, id
+            """).fetchall()
+            migrated = []
+            for row in rows:
+                previous = migrated[-1] if migrated else None
+                ts = row[4]
+                if previous and previous[:4] == row[:4] and previous[4] >= ts:
+                    ts = previous[4] + 1
+                migrated.append(row[:4] + (ts,) + row[5:])
+            cursor.executemany("""
+                INSERT INTO seat_history (courseCode, section, year, term, ts, open, capacity)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, migrated)
+            cursor.execute("DROP TABLE seat_history_old")
+
+        # Checkpoints for term-wide catalog crawls
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS crawl_progress (
+                year TEXT NOT NULL,
+                term TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                course TEXT NOT NULL,  -- '' marks a subject whose course list is saved
+                status TEXT NOT NULL,  -- pending, done or failed
+                updated_at INTEGER NOT NULL,
+                PRIMARY KEY (year, term, subject, course)
+            )
+        """)
+
+        conn.commit()
+
+def init_monitor():
+    """Initialize the tables shared by monitor worker processes."""
+    with sqlite3.connect("fsu_courses.db") as conn:
+        cursor = conn.cursor()
+
+        # Live monitor worker processes
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS monitor_workers (
+                worker_id TEXT PRIMARY KEY,
+                started_at INTEGER NOT NULL,
+                heartbeat_at INTEGER NOT NULL
+            )
+        """)
+
+        # Which worker polls each shard of the watch list, until expires_at
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS monitor_leases (
+                shard INTEGER PRIMARY KEY,
+                worker_id TEXT NOT NULL,
+                expires_at INTEGER NOT NULL
+            )
+        """)
+
+        # Notifications from worker processes waiting to be emitted by the web process
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS notification_outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at INTEGER NOT NULL
+            )
+        """)
+
         conn.commit()
 
 def init_users():
@@ -69,6 +165,18 @@ def init_users():
             )
         """)
 
+        # Login cookies kept across restarts (see cookie_store.py), encrypted like fsu_password
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS cookie_sessions (
+                username TEXT PRIMARY KEY,
+                cookies BLOB NOT NULL,
+                expiry INTEGER NOT NULL,  -- Unix time the cookies stop being used
+                validated_at INTEGER,
+                updated_at INTEGER NOT NULL,
+                FOREIGN KEY (username) REFERENCES users(username)
+            )
+        """)
+
         conn.commit()
 
 def init_schedules():
@@ -105,6 +213,7 @@ def init_db():
     init_courses()
     init_users()
     init_schedules()
+    init_monitor()
 
 if __name__ == '__main__':
     init_db()
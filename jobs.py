@@ -0,0 +1,117 @@
+"""
+Background job queue for slow course fetches.
+
+/add_course and /sync_course used to fetch inside the request, which held a
+web thread for as long as a Duo login took. They now submit a job here and
+return its ID right away; a small worker pool runs the fetch and ingest,
+the result is pushed to the user over the Socket.IO 'notification'
+channel, and /jobs/<id> reports the status for clients that poll.
+
+Jobs are kept in memory only, finished jobs are forgotten after
+JOB_RETENTION seconds.
+"""
+import threading
+import time
+import uuid
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import notifications
+
+logger = logging.getLogger('jobs')
+
+JOB_MAX_WORKERS = 4  # Jobs run at once; logins for one user are serialized by auth_manager anyway
+JOB_RETENTION = 60 * 60  # Seconds finished jobs stay queryable
+
+class JobQueue:
+    """Thread pool running submitted jobs and tracking their status."""
+
+    def __init__(self, max_workers=JOB_MAX_WORKERS, retention=JOB_RETENTION):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self.retention = retention
+        self.lock = threading.Lock()
+        self.jobs = {}  # job_id -> job dict
+        self.active = {}  # dedupe key -> job_id of a queued or running job
+
+    def submit(self, job_type, username, func, *args, description=None, key=None):
+        """
+        Queue a job.
+
+        Args:
+            job_type: Short job kind, e.g. 'add_course' or 'sync_course'
+            username: The user the job runs for and who is notified
+            func: Callable run on the pool; returns a success message and
+                raises on failure
+            *args: Passed to func
+            description: Human-readable description used in notifications
+            key: Optional dedupe key; while a job with the same key is queued
+                or running, its ID is returned instead of queuing a new one
+
+        Returns:
+            The job ID
+        """
+        with self.lock:
+            self.prune()
+
+            if key is not None and key in self.active:
+                return self.active[key]
+
+            job_id = uuid.uuid4().hex
+            self.jobs[job_id] = {
+                'id': job_id,
+                'type': job_type,
+                'username': username,
+                'description': description or job_type,
+                'status': 'queued',
+                'message': None,
+                'error': None,
+                'created_at': time.time(),
+                'started_at': None,
+                'finished_at': None
+            }
+            if key is not None:
+                self.active[key] = job_id
+
+        self.executor.submit(self.run, job_id, key, func, args)
+        logger.info(f"Queued {job_type} job {job_id} for {username}")
+        return job_id
+
+    def run(self, job_id, key, func, args):
+        """Run a job on the pool and publish its outcome."""
+        with self.lock:
+            job = self.jobs[job_id]
+            job['status'] = 'running'
+            job['started_at'] = time.time()
+
+        try:
+            message = func(*args)
+            update = {'status': 'done', 'message': message}
+        except Exception as e:
+            logger.error(f"Job {job_id} ({job['description']}) failed: {e}")
+            update = {'status': 'failed', 'error': str(e)}
+
+        with self.lock:
+            job.update(update, finished_at=time.time())
+            if key is not None and self.active.get(key) == job_id:
+                del self.active[key]
+            snapshot = dict(job)
+
+        notifications.send_job_notification(snapshot['username'], snapshot)
+
+    def get(self, job_id):
+        """Get a copy of a job, or None if it is unknown or expired."""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def prune(self):
+        """Forget finished jobs older than the retention period (caller holds the lock)."""
+        cutoff = time.time() - self.retention
+        for job_id, job in list(self.jobs.items()):
+            if job['finished_at'] and job['finished_at'] < cutoff:
+                del self.jobs[job_id]
+
+    def shutdown(self, wait=False):
+        """Stop accepting jobs."""
+        self.executor.shutdown(wait=wait)
+
+JOB_QUEUE = JobQueue()
@@ -0,0 +1,313 @@
+"""
+Pluggable login strategies, cheapest first.
+
+A browser login costs a Chrome process (hundreds of MB) and several
+seconds of startup even when CAS would let the user straight through.
+HttpLoginStrategy does the CAS form post and the redirects to the
+scheduler with a plain requests Session, and keeps each user's CAS single
+sign-on cookie (CASTGC) between logins, so a user who has signed in within
+the CAS session lifetime gets new scheduler cookies without a browser or a
+Duo prompt. Whenever an interactive step is needed (the Duo prompt, or
+anything the HTTP client cannot make sense of) it raises
+InteractiveLoginRequired and LoginChain falls back to BrowserLoginStrategy,
+which hands the CAS cookies of its login back to the HTTP strategy. A
+rejected password raises InvalidCredentials instead, which ends the chain,
+since every other strategy would only fail the same way and count another
+failed attempt against the account.
+
+FSU_LOGIN_STRATEGIES sets the order, e.g. "browser" to always use Chrome.
+Each strategy's outcomes and latency are tracked in metrics and stats().
+"""
+import os
+import threading
+import time
+import logging
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlparse
+import requests
+import browser_pool
+import http_client
+import metrics
+
+logger = logging.getLogger('login_strategies')
+
+# Where logins start (override to point at a stand-in login page)
+CAS_LOGIN_URL = os.environ.get(
+    'FSU_CAS_LOGIN_URL',
+    "https://cas.fsu.edu/cas/login?service=https%3A%2F%2Fwww.my.fsu.edu%2Fc%2Fportal%2Flogin"
+)
+
+LOGIN_STRATEGY_ORDER = [name.strip() for name in os.environ.get('FSU_LOGIN_STRATEGIES', 'http,browser').split(',')
+                        if name.strip()]
+HTTP_LOGIN_TIMEOUT = 15  # Seconds per request of an HTTP-only login
+BROWSER_QUEUE_TIMEOUT = 120  # Seconds a login waits for a browser from browser_pool.BROWSER_POOL
+
+LOGIN_ATTEMPTS = metrics.counter('fsu_login_attempts_total', 'Login attempts by strategy and outcome',
+                                 ['strategy', 'result'])
+LOGIN_STRATEGY_SECONDS = metrics.histogram('fsu_login_strategy_seconds', 'Login duration by strategy',
+                                           ['strategy'])
+
+class InteractiveLoginRequired(Exception):
+    """The login needs a step this strategy cannot do, the next strategy should try."""
+
+class InvalidCredentials(Exception):
+    """CAS rejected the username or password, no strategy should try again."""
+
+class LoginFormParser(HTMLParser):
+    """Finds the form with a password field and its input values."""
+
+    def __init__(self):
+        super().__init__()
+        self.forms = []  # (action, {name: value}, has password field)
+        self.current = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'form':
+            self.current = [attrs.get('action') or '', {}, False]
+        elif tag == 'input' and self.current is not None:
+            if attrs.get('type') == 'password':
+                self.current[2] = True
+            if attrs.get('name'):
+                self.current[1][attrs['name']] = attrs.get('value') or ''
+
+    def handle_endtag(self, tag):
+        if tag == 'form' and self.current is not None:
+            self.forms.append(tuple(self.current))
+            self.current = None
+
+def find_login_form(html):
+    """
+    Get the login form of a page.
+
+    Returns:
+        Tuple of (action, field values) or None if the page has no login form
+    """
+    parser = LoginFormParser()
+    parser.feed(html)
+    for action, fields, has_password in parser.forms:
+        if has_password:
+            return action, fields
+    return None
+
+def is_duo_prompt(response):
+    return 'duosecurity.com' in urlparse(response.url).netloc or 'Secured by Duo' in response.text
+
+def cookies_for_url(jar, url):
+    """Get the cookies a browser would send to url, as Selenium-style dictionaries."""
+    parsed = urlparse(url)
+    host = parsed.hostname or ''
+    path = parsed.path or '/'
+    cookies = []
+    for cookie in jar:
+        domain = cookie.domain.lstrip('.')
+        if (host == domain or host.endswith('.' + domain)) and path.startswith(cookie.path or '/'):
+            cookies.append({'name': cookie.name, 'value': cookie.value,
+                            'domain': cookie.domain, 'path': cookie.path})
+    return cookies
+
+class HttpLoginStrategy:
+    """CAS login over plain HTTP, reusing each user's CAS single sign-on session."""
+
+    name = 'http'
+
+    def __init__(self, timeout=HTTP_LOGIN_TIMEOUT):
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.sessions = {}  # username -> requests.Session holding their CAS cookies
+
+    def session_for(self, username):
+        with self.lock:
+            session = self.sessions.get(username)
+            if session is None:
+                session = self.sessions[username] = requests.Session()
+                session.headers['User-Agent'] = http_client.USER_AGENT
+            return session
+
+    def remember_sso(self, username, cookies):
+        """Keep the CAS cookies of a login done elsewhere (e.g. in a browser) for the next HTTP login."""
+        cas_host = urlparse(CAS_LOGIN_URL).hostname
+        cas_cookies = [cookie for cookie in cookies
+                       if cas_host == cookie['domain'].lstrip('.')
+                       or cas_host.endswith('.' + cookie['domain'].lstrip('.'))]
+        if not cas_cookies:
+            return
+        session = self.session_for(username)
+        for cookie in cas_cookies:
+            session.cookies.set(cookie['name'], cookie['value'],
+                                domain=cookie['domain'], path=cookie.get('path', '/'))
+        logger.info(f"Kept {len(cas_cookies)} CAS cookies of {username}'s browser login")
+
+    def forget(self, username=None):
+        """Drop a user's CAS session (everyone's if username is None), so their next login starts over."""
+        with self.lock:
+            if username is None:
+                sessions = list(self.sessions.values())
+                self.sessions.clear()
+            else:
+                session = self.sessions.pop(username, None)
+                sessions = [session] if session else []
+        for session in sessions:
+            session.close()
+
+    def login(self, username, password):
+        session = self.session_for(username)
+
+        response = session.get(CAS_LOGIN_URL, timeout=self.timeout)
+        form = find_login_form(response.text)
+        if form is not None:
+            action, fields = form
+            fields.update(username=username, password=password)
+            response = session.post(urljoin(response.url, action), data=fields, timeout=self.timeout)
+            if find_login_form(response.text) is not None:
+                raise InvalidCredentials("CAS rejected the username or password")
+
+        if is_duo_prompt(response):
+            raise InteractiveLoginRequired("CAS asked for Duo")
+
+        entry_url = f"{http_client.SCHEDULER_BASE}/entry"
+        entry = session.get(entry_url, timeout=self.timeout)
+        if "Term-options" not in entry.text and "Choose a Term" not in entry.text:
+            raise InteractiveLoginRequired(f"Scheduler entry page not reached (ended at {entry.url})")
+
+        cookies = cookies_for_url(session.cookies, entry_url)
+        if not cookies:
+            raise InteractiveLoginRequired("Scheduler set no cookies")
+        return cookies
+
+class BrowserLoginStrategy:
+    """Full browser login with Duo, using a driver from browser_pool.BROWSER_POOL."""
+
+    name = 'browser'
+
+    def __init__(self, login_func, sso_store=None, on_queued=None, before_login=None,
+                 queue_timeout=BROWSER_QUEUE_TIMEOUT):
+        """
+        Args:
+            login_func: Called with (username, password, driver), returns cookies
+            sso_store: Strategy whose remember_sso gets the CAS cookies of each login
+            on_queued: Called with (username, queue position) while waiting for a browser
+            before_login: Called with the username once a browser is free,
+                e.g. to warn the user a Duo push is coming
+            queue_timeout: Seconds to wait for a browser
+        """
+        self.login_func = login_func
+        self.sso_store = sso_store
+        self.on_queued = on_queued
+        self.before_login = before_login
+        self.queue_timeout = queue_timeout
+
+    def login(self, username, password):
+        pool = browser_pool.BROWSER_POOL
+        on_queued = (lambda position: self.on_queued(username, position)) if self.on_queued else None
+        browser = pool.acquire(timeout=self.queue_timeout, on_queued=on_queued)
+        try:
+            if self.before_login:
+                self.before_login(username)
+            cookies = self.login_func(username, password, browser.driver)
+
+            if self.sso_store:
+                try:
+                    self.sso_store.remember_sso(username, pool.factory.all_cookies(browser.driver))
+                except Exception as e:
+                    logger.warning(f"Could not keep CAS cookies of {username}'s browser login: {e}")
+            return cookies
+        finally:
+            pool.release(browser)
+
+class LoginChain:
+    """Tries login strategies in order until one produces cookies."""
+
+    def __init__(self, strategies):
+        self.strategies = list(strategies)
+        self.lock = threading.Lock()
+        self.counts = {}  # strategy name -> {result: count}
+        self.seconds = {}  # strategy name -> total seconds spent
+
+    def record(self, strategy, result, seconds):
+        LOGIN_ATTEMPTS.inc(strategy=strategy.name, result=result)
+        LOGIN_STRATEGY_SECONDS.observe(seconds, strategy=strategy.name)
+        with self.lock:
+            counts = self.counts.setdefault(strategy.name, {})
+            counts[result] = counts.get(result, 0) + 1
+            self.seconds[strategy.name] = self.seconds.get(strategy.name, 0.0) + seconds
+
+    def login(self, username, password):
+        """
+        Log in with the first strategy that succeeds.
+
+        Returns:
+            List of cookies
+
+        Raises:
+            InvalidCredentials as soon as a strategy reports them,
+            otherwise the last strategy's error if none succeeded
+        """
+        last_error = None
+        for strategy in self.strategies:
+            started = time.time()
+            try:
+                cookies = strategy.login(username, password)
+            except InvalidCredentials as e:
+                self.record(strategy, 'rejected', time.time() - started)
+                logger.warning(f"{strategy.name} login for {username} was rejected: {e}")
+                raise
+            except InteractiveLoginRequired as e:
+                self.record(strategy, 'interactive', time.time() - started)
+                logger.info(f"{strategy.name} login for {username} needs another strategy: {e}")
+                last_error = e
+                continue
+            except Exception as e:
+                self.record(strategy, 'error', time.time() - started)
+                logger.warning(f"{strategy.name} login for {username} failed: {e}")
+                last_error = e
+                continue
+
+            self.record(strategy, 'success', time.time() - started)
+            logger.info(f"Logged in {username} with the {strategy.name} strategy")
+            return cookies
+
+        raise last_error or RuntimeError("No login strategies configured")
+
+    def forget(self, username=None):
+        """Drop any login state the strategies keep for a user (or for everyone if username is None)."""
+        for strategy in self.strategies:
+            if hasattr(strategy, 'forget'):
+                strategy.forget(username)
+
+    def stats(self):
+        """Get each strategy's attempts, success rate and mean latency."""
+        with self.lock:
+            stats = {}
+            for strategy in self.strategies:
+                counts = dict(self.counts.get(strategy.name, {}))
+                attempts = sum(counts.values())
+                stats[strategy.name] = {
+                    'attempts': attempts,
+                    'results': counts,
+                    'success_rate': counts.get('success', 0) / attempts if attempts else None,
+                    'mean_seconds': self.seconds.get(strategy.name, 0.0) / attempts if attempts else None
+                }
+            return stats
+
+def build_chain(login_func, on_queued=None, before_login=None, order=None):
+    """
+    Build the login chain in LOGIN_STRATEGY_ORDER (or the given order).
+
+    Args:
+        login_func: Browser login function, see BrowserLoginStrategy
+        on_queued, before_login: Browser strategy callbacks
+        order: List of strategy names
+    """
+    http_strategy = HttpLoginStrategy()
+    available = {
+        'http': http_strategy,
+        'browser': BrowserLoginStrategy(login_func, sso_store=http_strategy,
+                                        on_queued=on_queued, before_login=before_login)
+    }
+    strategies = []
+    for name in order or LOGIN_STRATEGY_ORDER:
+        if name not in available:
+            raise ValueError(f"Unknown login strategy {name!r}, expected one of {sorted(available)}")
+        strategies.append(available[name])
+    return LoginChain(strategies)
@@ -0,0 +1,282 @@
+"""
+Standalone monitor worker.
+
+Runs the monitored course checks outside the Flask process, so polling does
+not compete with web requests and can be spread over several processes or
+machines sharing the database:
+
+    python monitor_worker.py            # as many times as needed
+    FSU_EXTERNAL_MONITOR=1 python app.py
+
+The watch list is split into SHARD_COUNT shards. Each worker heartbeats in
+monitor_workers and holds leases on roughly SHARD_COUNT / live workers
+shards in monitor_leases, renewing them every HEARTBEAT_INTERVAL. A worker
+that dies stops renewing, and once its leases expire the remaining workers
+claim its shards. Courses are sharded by their own (year, term, subject,
+course) key, so a course stays on the same shard however its watchers
+change, and its last notified seat counts stay with the worker that polls
+it. A user's session is renewed by the worker holding their first watched
+course.
+
+With FSU_WORKER_METRICS_PORT (or --metrics-port) set, a worker serves its
+monitor, fetch and login metrics at /metrics on that port; give each worker
+on a host its own port.
+
+Each worker takes its shards' share of the poll budget and of the global
+request rate limit, so together they stay within the budget of a single
+process. Every worker must use the same shard count. Notifications are queued in the
+database and emitted by the web process.
+"""
+import argparse
+import math
+import os
+import signal
+import socket
+import threading
+import time
+import uuid
+import logging
+import zlib
+import browser_pool
+import catalog_pool
+import init_db
+import metrics
+import notifications
+import poll_scheduler
+import rate_limiter
+import scraper
+import session_refresher
+
+logger = logging.getLogger('monitor_worker')
+
+# Sharding and lease timing
+SHARD_COUNT = int(os.environ.get('FSU_MONITOR_SHARDS', 16))
+LEASE_TTL = 30  # Seconds a lease stays valid without renewal
+HEARTBEAT_INTERVAL = 10  # Seconds between heartbeats, well inside LEASE_TTL
+
+# Prometheus endpoint of this worker, off unless a port is given
+METRICS_PORT = int(os.environ.get('FSU_WORKER_METRICS_PORT', 0))
+METRICS_HOST = os.environ.get('FSU_WORKER_METRICS_HOST', '127.0.0.1')
+
+def shard_for(key, shard_count=SHARD_COUNT):
+    """Get the shard of a fetch plan key (year, term, subject, course)."""
+    return zlib.crc32('|'.join(str(part) for part in key).encode('utf-8')) % shard_count
+
+def session_owners(plan, shards, shard_count=SHARD_COUNT):
+    """Get the users whose first watched course (in key order) is on one of the given shards."""
+    first_course = {}
+    for key in sorted(plan, key=lambda key: tuple(str(part) for part in key)):
+        for username, _, _ in plan[key]:
+            first_course.setdefault(username, key)
+    return {username for username, key in first_course.items() if shard_for(key, shard_count) in shards}
+
+class MonitorWorker:
+    """One monitor process: keeps its leases alive and polls the shards it holds."""
+
+    def __init__(self, shard_count=SHARD_COUNT, lease_ttl=LEASE_TTL,
+                 heartbeat_interval=HEARTBEAT_INTERVAL, max_workers=None):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.shard_count = shard_count
+        self.lease_ttl = lease_ttl
+        self.heartbeat_interval = heartbeat_interval
+        self.max_workers = max_workers
+
+        self.lock = threading.Lock()
+        self.shards = set()
+        self.renewed_at = 0.0  # monotonic time of the last successful renewal
+        self.shards_changed = False
+        self.stop_event = threading.Event()
+
+    def heartbeat(self):
+        """
+        Record that this worker is alive, renew its leases and rebalance shards.
+
+        Claims expired or unowned shards up to a fair share of the live
+        workers, and gives back shards above that share so new workers
+        pick them up.
+        """
+        now = int(time.time())
+        conn = scraper.get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+
+            cursor.execute("""
+                INSERT INTO monitor_workers (worker_id, started_at, heartbeat_at) VALUES (?, ?, ?)
+                ON CONFLICT(worker_id) DO UPDATE SET heartbeat_at = excluded.heartbeat_at
+            """, (self.worker_id, now, now))
+            cursor.execute("DELETE FROM monitor_workers WHERE heartbeat_at < ?", (now - self.lease_ttl,))
+            live_workers = cursor.execute("SELECT COUNT(*) FROM monitor_workers").fetchone()[0]
+            fair_share = math.ceil(self.shard_count / max(1, live_workers))
+
+            cursor.execute("UPDATE monitor_leases SET expires_at = ? WHERE worker_id = ?",
+                           (now + self.lease_ttl, self.worker_id))
+            cursor.execute("SELECT shard, worker_id, expires_at FROM monitor_leases")
+            leases = {shard: (worker_id, expires_at) for shard, worker_id, expires_at in cursor.fetchall()}
+
+            owned = sorted(shard for shard, (worker_id, _) in leases.items()
+                           if worker_id == self.worker_id and shard < self.shard_count)
+
+            if len(owned) > fair_share:
+                released = owned[fair_share:]
+                owned = owned[:fair_share]
+                cursor.executemany("DELETE FROM monitor_leases WHERE shard = ? AND worker_id = ?",
+                                   [(shard, self.worker_id) for shard in released])
+                logger.info(f"Released shards {released} to other workers")
+            else:
+                free = [shard for shard in range(self.shard_count)
+                        if shard not in leases or leases[shard][1] < now]
+                claimed = free[:fair_share - len(owned)]
+                cursor.executemany("""
+                    INSERT INTO monitor_leases (shard, worker_id, expires_at) VALUES (?, ?, ?)
+                    ON CONFLICT(shard) DO UPDATE SET worker_id = excluded.worker_id,
+                                                     expires_at = excluded.expires_at
+                """, [(shard, self.worker_id, now + self.lease_ttl) for shard in claimed])
+                if claimed:
+                    logger.info(f"Claimed shards {claimed}")
+                owned.extend(claimed)
+
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        with self.lock:
+            if set(owned) != self.shards:
+                self.shards = set(owned)
+                self.shards_changed = True
+            self.renewed_at = time.monotonic()
+
+    def release(self):
+        """Give up all leases and deregister, so other workers take over at once."""
+        conn = scraper.get_db_connection()
+        try:
+            conn.execute("DELETE FROM monitor_leases WHERE worker_id = ?", (self.worker_id,))
+            conn.execute("DELETE FROM monitor_workers WHERE worker_id = ?", (self.worker_id,))
+            conn.commit()
+        finally:
+            conn.close()
+
+        with self.lock:
+            self.shards = set()
+
+    def heartbeat_loop(self):
+        """
+        Heartbeat on a separate thread so a slow cycle or login never lets the leases lapse.
+
+        Stuck login browsers are reaped here too, since the cycle that
+        would otherwise wait for one may be the one holding it.
+        """
+        last_reap = time.monotonic()
+        while not self.stop_event.wait(self.heartbeat_interval):
+            try:
+                self.heartbeat()
+            except Exception as e:
+                logger.error(f"Heartbeat failed: {e}")
+            if time.monotonic() - last_reap >= browser_pool.REAP_INTERVAL:
+                last_reap = time.monotonic()
+                browser_pool.BROWSER_POOL.reap()
+
+    def current_shards(self):
+        """
+        Get the shards this worker may poll right now.
+
+        Returns an empty set if the leases have not been renewed within
+        LEASE_TTL, since another worker may already have claimed them.
+        """
+        with self.lock:
+            if time.monotonic() - self.renewed_at >= self.lease_ttl:
+                return set()
+            return set(self.shards)
+
+    def run_cycle(self):
+        """Run one monitor cycle over the shards this worker holds."""
+        shards = self.current_shards()
+        if not shards:
+            print(f"[WORKER] {self.worker_id} holds no shards, skipping cycle")
+            return
+
+        with self.lock:
+            reload_state = self.shards_changed
+            self.shards_changed = False
+
+        if reload_state:
+            # Newly claimed sections continue from the seat counts their
+            # previous worker stored, so nobody is notified twice
+            scraper.load_seat_state()
+            # The upstream's budget is shared by every worker, so each takes its shards' share
+            share = len(shards) / self.shard_count
+            scraper.POLL_SCHEDULER.requests_per_minute = max(1, poll_scheduler.REQUESTS_PER_MINUTE * share)
+            rate_limiter.LIMITER.set_global_share(share)
+
+        # Renew sessions of the users whose courses this worker fetches before they expire;
+        # every worker keeps its own catalog reader sessions
+        fetch_plan = scraper.build_fetch_plan()
+        owners = session_owners(fetch_plan[0], shards, self.shard_count)
+        session_refresher.SESSION_REFRESHER.run_once(
+            owns_user=lambda username: catalog_pool.CATALOG_POOL.is_reader(username) or username in owners
+        )
+        scraper.check_monitored_courses(
+            max_workers=self.max_workers,
+            fetch_plan=fetch_plan,
+            owns=lambda key, watchers: shard_for(key, self.shard_count) in shards
+        )
+
+    def run(self, tick_seconds=None):
+        """Poll until stopped, then hand the shards back."""
+        tick_seconds = tick_seconds or scraper.MONITOR_TICK_SECONDS
+        self.heartbeat()
+        print(f"[WORKER] {self.worker_id} started with shards {sorted(self.shards)} of {self.shard_count}")
+
+        heartbeat_thread = threading.Thread(target=self.heartbeat_loop, name='monitor-heartbeat', daemon=True)
+        heartbeat_thread.start()
+
+        try:
+            while not self.stop_event.is_set():
+                started = time.monotonic()
+                try:
+                    self.run_cycle()
+                except Exception as e:
+                    print(f"[WORKER] Error in monitor cycle: {e}")
+                self.stop_event.wait(max(0.0, tick_seconds - (time.monotonic() - started)))
+        finally:
+            self.stop_event.set()
+            heartbeat_thread.join(timeout=self.heartbeat_interval)
+            self.release()
+            print(f"[WORKER] {self.worker_id} stopped and released its shards")
+
+    def stop(self, *args):
+        """Ask the worker to stop after the current cycle."""
+        self.stop_event.set()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a monitor worker process")
+    parser.add_argument('--shards', type=int, default=SHARD_COUNT,
+                        help="total shard count, the same for every worker")
+    parser.add_argument('--workers', type=int, default=None, help="courses checked in parallel")
+    parser.add_argument('--tick', type=float, default=None, help="seconds between monitor cycles")
+    parser.add_argument('--metrics-port', type=int, default=METRICS_PORT,
+                        help="port to serve /metrics on (default off)")
+    args = parser.parse_args()
+
+    init_db.init_db()
+    notifications.enable_outbox()
+    browser_pool.BROWSER_POOL.warm()
+    catalog_pool.CATALOG_POOL.warm()
+
+    metrics_server = None
+    if args.metrics_port:
+        metrics_server = metrics.serve(args.metrics_port, METRICS_HOST)
+        print(f"[WORKER] Serving metrics at http://{METRICS_HOST}:{args.metrics_port}/metrics")
+
+    worker = MonitorWorker(shard_count=args.shards, max_workers=args.workers)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run(tick_seconds=args.tick)
+    session_refresher.SESSION_REFRESHER.shutdown()
+    catalog_pool.CATALOG_POOL.shutdown()
+    browser_pool.BROWSER_POOL.shutdown()
+    if metrics_server:
+        metrics_server.shutdown()
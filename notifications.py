@@ -5,6 +5,7 @@ Handles sending real-time notifications to the frontend.
 import json
 import logging
 import time
+import metrics
 from flask import request, current_app
 from flask_socketio import SocketIO, join_room, leave_room, rooms
 
@@ -18,6 +19,16 @@ logger = logging.getLogger('notifications')
 # Store username to sid mappings
 user_sessions = {}
 
+# Monitor worker processes have no SocketIO server, so their notifications
+# are queued in the database and delivered by the web process instead
+outbox_enabled = False
+OUTBOX_POLL_SECONDS = 2  # How often the web process delivers queued notifications
+OUTBOX_BATCH_SIZE = 100
+
+# Notification metrics, labelled by notification type
+EMITS = metrics.counter('fsu_socketio_emits_total', 'Notifications emitted over SocketIO', ['type'])
+QUEUED = metrics.counter('fsu_notifications_queued_total', 'Notifications queued for the web process', ['type'])
+
 def init_socketio(app):
     """Initialize the SocketIO instance with the Flask app"""
     global socketio
@@ -25,6 +36,73 @@ def init_socketio(app):
     logger.info("SocketIO initialized for notifications with async mode: threading")
     return socketio
 
+def enable_outbox():
+    """Queue notifications in the database instead of emitting them (for monitor workers)"""
+    global outbox_enabled
+    outbox_enabled = True
+    logger.info("Notifications will be queued for delivery by the web process")
+
+def queue_notification(username, payload):
+    """Store a notification for the web process to emit to a user's room"""
+    # Import here to avoid circular imports
+    import scraper
+    
+    conn = scraper.get_db_connection()
+    try:
+        conn.execute(
+            "INSERT INTO notification_outbox (username, payload, created_at) VALUES (?, ?, ?)",
+            (username, json.dumps(payload), int(time.time()))
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    QUEUED.inc(type=payload.get('type', 'unknown'))
+
+def emit_notification(username, payload):
+    """Emit a notification to a user's room, or queue it when running in a monitor worker"""
+    if socketio:
+        socketio.emit('notification', payload, room=username)
+        EMITS.inc(type=payload.get('type', 'unknown'))
+    else:
+        queue_notification(username, payload)
+
+def deliver_queued_notifications():
+    """
+    Emit notifications queued by monitor worker processes.
+    
+    Returns:
+        Number of notifications delivered
+    """
+    if not socketio:
+        return 0
+        
+    # Import here to avoid circular imports
+    import scraper
+    
+    conn = scraper.get_db_connection()
+    try:
+        rows = conn.execute(
+            "SELECT id, username, payload FROM notification_outbox ORDER BY id LIMIT ?",
+            (OUTBOX_BATCH_SIZE,)
+        ).fetchall()
+        
+        for notification_id, username, payload in rows:
+            try:
+                payload = json.loads(payload)
+                socketio.emit('notification', payload, room=username)
+                EMITS.inc(type=payload.get('type', 'unknown'))
+            except Exception as e:
+                logger.error(f"Failed to deliver queued notification {notification_id}: {str(e)}")
+                
+        # Each notification is delivered at most once, even if emitting it failed
+        if rows:
+            conn.executemany("DELETE FROM notification_outbox WHERE id = ?",
+                             [(row[0],) for row in rows])
+            conn.commit()
+        return len(rows)
+    finally:
+        conn.close()
+
 def log_all_rooms():
     """Debug function to log all active rooms"""
     global user_sessions
@@ -40,7 +118,7 @@ def send_auth_notification(username, message, category="info"):
         message: The notification message
         category: The notification category (info, warning, success, error)
     """
-    if not socketio:
+    if not socketio and not outbox_enabled:
         logger.warning("SocketIO not initialized, can't send auth notification")
         return False
         
@@ -49,18 +127,18 @@ def send_auth_notification(username, message, category="info"):
         
         # Check if user is in our session mapping
         sid = user_sessions.get(username)
-        if not sid:
+        if not sid and not outbox_enabled:
             logger.warning(f"No active session found for user {username}")
             log_all_rooms()
             
         # Emit to the username room
-        socketio.emit('notification', {
+        emit_notification(username, {
             'type': 'auth',
             'category': category,
             'message': message,
             'requires_action': '2FA' in message,
             'timestamp': time.strftime('%H:%M:%S')
-        }, room=username)
+        })
         
         logger.info(f"Auth notification sent to room '{username}'")
         return True
@@ -79,7 +157,7 @@ def send_course_notification(username, course_code, section, seats_available, to
         seats_available: Number of available seats
         total_seats: Total number of seats
     """
-    if not socketio:
+    if not socketio and not outbox_enabled:
         logger.warning("SocketIO not initialized, can't send course notification")
         return False
         
@@ -89,12 +167,12 @@ def send_course_notification(username, course_code, section, seats_available, to
         
         # Check if user is in our session mapping
         sid = user_sessions.get(username)
-        if not sid:
+        if not sid and not outbox_enabled:
             logger.warning(f"No active session found for user {username} for course notification")
             log_all_rooms()
         
         # Emit to the username room
-        socketio.emit('notification', {
+        emit_notification(username, {
             'type': 'course_availability',
             'category': 'success',
             'course_code': course_code,
@@ -103,7 +181,7 @@ def send_course_notification(username, course_code, section, seats_available, to
             'total_seats': total_seats,
             'message': message,
             'timestamp': time.strftime('%H:%M:%S')
-        }, room=username)
+        })
         
         logger.info(f"Course notification sent to room '{username}'")
         return True
@@ -111,6 +189,79 @@ def send_course_notification(username, course_code, section, seats_available, to
         logger.error(f"Failed to send course notification: {str(e)}", exc_info=True)
         return False
 
+def send_course_full_notification(username, course_code, section, total_seats):
+    """
+    Send a notification that a previously open course section is full again
+    
+    Args:
+        username: The username to send the notification to
+        course_code: The course code (e.g., 'MAT1033')
+        section: The section number
+        total_seats: Total number of seats
+    """
+    if not socketio and not outbox_enabled:
+        logger.warning("SocketIO not initialized, can't send course notification")
+        return False
+        
+    try:
+        message = f"SECTION FULL: {course_code}-{section} has no open seats left (0/{total_seats})"
+        logger.info(f"Sending course notification to {username}: {message}")
+        
+        # Emit to the username room
+        emit_notification(username, {
+            'type': 'course_full',
+            'category': 'warning',
+            'course_code': course_code,
+            'section': section, 
+            'seats_available': 0,
+            'total_seats': total_seats,
+            'message': message,
+            'timestamp': time.strftime('%H:%M:%S')
+        })
+        
+        logger.info(f"Course notification sent to room '{username}'")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to send course notification: {str(e)}", exc_info=True)
+        return False
+
+def send_job_notification(username, job):
+    """
+    Send a notification that a background job finished or failed
+    
+    Args:
+        username: The username to send the notification to
+        job: The job dict from jobs.JobQueue
+    """
+    if not socketio and not outbox_enabled:
+        logger.warning("SocketIO not initialized, can't send job notification")
+        return False
+        
+    try:
+        if job['status'] == 'done':
+            message = job['message'] or f"{job['description']} finished"
+            category = 'success'
+        else:
+            message = f"{job['description']} failed: {job['error']}"
+            category = 'error'
+        logger.info(f"Sending job notification to {username}: {message}")
+        
+        emit_notification(username, {
+            'type': 'job',
+            'category': category,
+            'job_id': job['id'],
+            'job_type': job['type'],
+            'status': job['status'],
+            'message': message,
+            'timestamp': time.strftime('%H:%M:%S')
+        })
+        
+        logger.info(f"Job notification sent to room '{username}'")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to send job notification: {str(e)}", exc_info=True)
+        return False
+
 def send_global_notification(message, category="info"):
     """Send a notification to all connected clients"""
     if not socketio:
@@ -125,6 +276,7 @@ def send_global_notification(message, category="info"):
             'message': message,
             'timestamp': time.strftime('%H:%M:%S')
         })
+        EMITS.inc(type='system')
         return True
     except Exception as e:
         logger.error(f"Failed to send global notification: {str(e)}")
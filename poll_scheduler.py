@@ -0,0 +1,180 @@
+"""
+Adaptive polling scheduler for monitored courses.
+
+Every watched (year, term, subject, course) gets its own next-due time in
+a priority queue. Courses whose seat counts changed recently or are close
+to opening/closing are polled more often, courses that never change back
+off towards the maximum interval, and a global request budget caps how
+many courses can be polled per minute.
+"""
+import heapq
+import threading
+import time
+import logging
+
+logger = logging.getLogger('poll_scheduler')
+
+# Polling interval bounds in seconds
+MIN_POLL_INTERVAL = 15
+MAX_POLL_INTERVAL = 600
+DEFAULT_POLL_INTERVAL = 60
+
+# How intervals adapt after each poll
+SHRINK_FACTOR = 0.5  # Applied when seats are near zero
+GROWTH_FACTOR = 1.5  # Applied when nothing has changed
+NEAR_ZERO_SEATS = 3  # 1..N open seats counts as "about to change"
+RECENT_CHANGE_WINDOW = 30 * 60  # Hold the interval for this long after a change
+
+# Global upstream budget
+REQUESTS_PER_MINUTE = 120
+
+class AdaptivePollScheduler:
+    """
+    Priority queue of watched courses keyed by their next-due time.
+
+    Keys are (year, term, subject, course) tuples from the monitor's fetch plan.
+    """
+
+    def __init__(self, min_interval=MIN_POLL_INTERVAL, max_interval=MAX_POLL_INTERVAL,
+                 default_interval=DEFAULT_POLL_INTERVAL, requests_per_minute=REQUESTS_PER_MINUTE):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.default_interval = default_interval
+        self.requests_per_minute = requests_per_minute
+
+        self.lock = threading.Lock()
+        self.queue = []  # (next_due, key) heap, may hold stale entries
+        self.state = {}  # key -> {'interval', 'next_due', 'seats', 'last_change'}
+
+        # Token bucket for the global budget, starts full
+        self.tokens = float(requests_per_minute)
+        self.last_refill = time.monotonic()
+
+    def sync(self, keys, now=None):
+        """
+        Match the queue to the current watch list.
+
+        New keys become due immediately, keys nobody watches any more are dropped.
+        """
+        now = time.monotonic() if now is None else now
+        keys = set(keys)
+
+        with self.lock:
+            for key in list(self.state):
+                if key not in keys:
+                    del self.state[key]
+
+            for key in keys:
+                if key not in self.state:
+                    self.state[key] = {
+                        'interval': self.default_interval,
+                        'next_due': now,
+                        'seats': None,
+                        'last_change': None
+                    }
+                    heapq.heappush(self.queue, (now, key))
+
+    def refill(self, now):
+        """Add the tokens earned since the last refill."""
+        elapsed = max(0.0, now - self.last_refill)
+        self.tokens = min(float(self.requests_per_minute),
+                          self.tokens + elapsed * self.requests_per_minute / 60.0)
+        self.last_refill = now
+
+    def pop_due(self, now=None):
+        """
+        Take every key that is due, as far as the request budget allows.
+
+        Keys left over because the budget ran out stay queued and are
+        returned first on the next call.
+
+        Returns:
+            List of due keys, most overdue first
+        """
+        now = time.monotonic() if now is None else now
+        due = []
+
+        with self.lock:
+            self.refill(now)
+
+            while self.queue and self.queue[0][0] <= now:
+                next_due, key = self.queue[0]
+                entry = self.state.get(key)
+
+                # Drop entries for unwatched keys or superseded due times
+                if entry is None or entry['next_due'] != next_due:
+                    heapq.heappop(self.queue)
+                    continue
+
+                if self.tokens < 1:
+                    logger.info(f"Request budget exhausted, {len(self.queue)} courses deferred")
+                    break
+
+                heapq.heappop(self.queue)
+                self.tokens -= 1
+                entry['next_due'] = None  # In flight until recorded
+                due.append(key)
+
+        return due
+
+    def record(self, key, seats, now=None):
+        """
+        Record a successful poll and schedule the next one.
+
+        Args:
+            key: The polled (year, term, subject, course)
+            seats: Dict of watched section number -> open seats
+        """
+        now = time.monotonic() if now is None else now
+
+        with self.lock:
+            entry = self.state.get(key)
+            if entry is None:
+                return
+
+            changed = entry['seats'] is not None and seats != entry['seats']
+            if changed:
+                entry['last_change'] = now
+
+            near_zero = any(0 < open_seats <= NEAR_ZERO_SEATS for open_seats in seats.values())
+            recently_changed = (entry['last_change'] is not None and
+                                now - entry['last_change'] < RECENT_CHANGE_WINDOW)
+
+            if changed:
+                interval = self.min_interval
+            elif near_zero:
+                interval = entry['interval'] * SHRINK_FACTOR
+            elif recently_changed:
+                interval = entry['interval']
+            else:
+                interval = entry['interval'] * GROWTH_FACTOR
+
+            entry['seats'] = seats
+            self.reschedule(key, entry, interval, now)
+
+    def record_failure(self, key, now=None):
+        """Back off a key whose poll failed."""
+        now = time.monotonic() if now is None else now
+
+        with self.lock:
+            entry = self.state.get(key)
+            if entry is not None:
+                self.reschedule(key, entry, entry['interval'] * 2, now)
+
+    def reschedule(self, key, entry, interval, now):
+        """Clamp the interval and push the key's next due time. Caller holds the lock."""
+        entry['interval'] = max(self.min_interval, min(self.max_interval, interval))
+        entry['next_due'] = now + entry['interval']
+        heapq.heappush(self.queue, (entry['next_due'], key))
+
+    def snapshot(self):
+        """Get a copy of every key's interval and seconds until due (for debugging)."""
+        now = time.monotonic()
+        with self.lock:
+            return {
+                key: {
+                    'interval': entry['interval'],
+                    'due_in': None if entry['next_due'] is None else max(0.0, entry['next_due'] - now)
+                }
+                for key, entry in self.state.items()
+            }
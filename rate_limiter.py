@@ -0,0 +1,233 @@
+"""
+Rate limiting and circuit breaking for College Scheduler API calls.
+
+A global token bucket and one bucket per user keep outbound traffic under
+a fixed budget. The circuit breaker trips after repeated 429/5xx responses
+or connection failures (or when the server sends Retry-After) and keeps
+callers off the upstream until it has had time to recover, instead of
+letting every caller retry at once.
+"""
+import random
+import threading
+import time
+import logging
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+logger = logging.getLogger('rate_limiter')
+
+# Request budgets
+GLOBAL_REQUESTS_PER_SECOND = 10.0
+GLOBAL_BURST = 20
+USER_REQUESTS_PER_SECOND = 2.0
+USER_BURST = 5
+
+# Retry behaviour for overload responses
+MAX_RETRIES = 2
+BACKOFF_BASE = 0.5  # Seconds, doubled per attempt
+BACKOFF_CAP = 10.0
+MAX_RETRY_AFTER_WAIT = 30.0  # Longer Retry-After values fail fast instead of blocking
+
+# Circuit breaker
+FAILURE_THRESHOLD = 5  # Consecutive failures before the circuit opens
+RESET_TIMEOUT = 30.0  # Seconds the circuit stays open before a probe is allowed
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def try_acquire(self):
+        """
+        Take a token if one is available.
+
+        Returns:
+            0 if a token was taken, otherwise seconds until one will be
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+    def configure(self, rate, capacity):
+        """Change the bucket's rate and size, keeping the tokens it has up to the new size."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.rate = rate
+            self.capacity = capacity
+            self.tokens = min(self.tokens, capacity)
+
+    def acquire(self):
+        """Block until a token is available."""
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            time.sleep(wait)
+
+class RateLimiter:
+    """A global budget plus a separate budget for each user."""
+
+    def __init__(self, global_rate=GLOBAL_REQUESTS_PER_SECOND, global_burst=GLOBAL_BURST,
+                 user_rate=USER_REQUESTS_PER_SECOND, user_burst=USER_BURST):
+        self.global_rate = global_rate
+        self.global_burst = global_burst
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.user_buckets = {}
+        self.exempt_users = set()
+        self.lock = threading.Lock()
+
+    def user_bucket(self, username):
+        """Get the bucket for a user, creating it on first use."""
+        with self.lock:
+            if username not in self.user_buckets:
+                self.user_buckets[username] = TokenBucket(self.user_rate, self.user_burst)
+            return self.user_buckets[username]
+
+    def exempt(self, usernames):
+        """Pace these users by the global budget only, e.g. accounts that fetch on behalf of everyone."""
+        with self.lock:
+            self.exempt_users.update(usernames)
+
+    def set_global_share(self, share):
+        """
+        Limit this process to a fraction of the global budget, for when
+        several processes send requests to the same upstream.
+        """
+        self.global_bucket.configure(self.global_rate * share, max(1, self.global_burst * share))
+
+    def acquire(self, username=None):
+        """Block until both the user's budget and the global budget allow a request."""
+        if username and username not in self.exempt_users:
+            self.user_bucket(username).acquire()
+        self.global_bucket.acquire()
+
+class CircuitBreaker:
+    """
+    Closed -> open after FAILURE_THRESHOLD consecutive failures, open ->
+    half-open after RESET_TIMEOUT, and half-open lets a single probe
+    through whose result closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.lock = threading.Lock()
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.blocked_until = 0.0  # Set from Retry-After
+        self.probe_in_flight = False
+
+    def allow(self):
+        """Check whether a request may go out now."""
+        with self.lock:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                return False
+
+            if self.state == 'open':
+                if now - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = 'half_open'
+                self.probe_in_flight = False
+                logger.info("Circuit half-open, allowing a probe request")
+
+            if self.state == 'half_open':
+                if self.probe_in_flight:
+                    return False
+                self.probe_in_flight = True
+
+            return True
+
+    def is_open(self):
+        """Check whether the upstream is currently considered unhealthy (no side effects)."""
+        with self.lock:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                return True
+            return self.state == 'open' and now - self.opened_at < self.reset_timeout
+
+    def retry_in(self):
+        """Seconds until the breaker will let a request through again."""
+        with self.lock:
+            now = time.monotonic()
+            wait = self.blocked_until - now
+            if self.state == 'open':
+                wait = max(wait, self.opened_at + self.reset_timeout - now)
+            return max(0.0, wait)
+
+    def record_success(self):
+        """Close the circuit after a healthy response."""
+        with self.lock:
+            if self.state != 'closed':
+                logger.info("Upstream healthy again, circuit closed")
+            self.state = 'closed'
+            self.failures = 0
+            self.probe_in_flight = False
+
+    def release(self):
+        """Give back a half-open probe whose request failed for an unrelated reason."""
+        with self.lock:
+            self.probe_in_flight = False
+
+    def record_failure(self, retry_after=None):
+        """
+        Count an overload response or connection failure.
+
+        Args:
+            retry_after: Seconds the server asked us to wait, if it said
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.failures += 1
+            self.probe_in_flight = False
+
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    logger.warning(f"Circuit opened after {self.failures} consecutive failures")
+                self.state = 'open'
+                self.opened_at = now
+
+def parse_retry_after(value):
+    """
+    Parse a Retry-After header.
+
+    Returns:
+        Seconds to wait, or None if the header is missing or malformed
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt):
+    """Exponential backoff with full jitter for a 0-based retry attempt."""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+LIMITER = RateLimiter()
+BREAKER = CircuitBreaker()
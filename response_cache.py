@@ -0,0 +1,90 @@
+"""
+Bounded TTL cache for regblocks responses.
+
+/add_course, /sync_course, the monitor and the crawler all read through
+one cache keyed by (year, term, subject, course), so a manual sync right
+after the monitor polled the same course is answered without another
+upstream request. Entries expire after a TTL, callers can ask for
+fresher data with max_age, and the least recently used entry is evicted
+once the cache is full.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+# Cache limits
+RESPONSE_CACHE_SIZE = 512  # Courses kept
+RESPONSE_CACHE_TTL = 60  # Seconds an entry stays usable by default
+
+class ResponseCache:
+    """Thread-safe LRU cache whose entries expire after a TTL."""
+
+    def __init__(self, maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (stored_at, value)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, max_age=None):
+        """
+        Get a cached value if it is fresh enough.
+
+        Args:
+            key: Cache key
+            max_age: Oldest acceptable entry in seconds (default the TTL,
+                0 always misses)
+
+        Returns:
+            The cached value (treat it as read-only) or None
+        """
+        max_age = self.ttl if max_age is None else min(max_age, self.ttl)
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                age = time.monotonic() - entry[0]
+                if age <= max_age:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                if age > self.ttl:
+                    del self.entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entry if full."""
+        with self.lock:
+            self.entries[key] = (time.monotonic(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, key=None):
+        """Drop one entry, or everything when no key is given."""
+        with self.lock:
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(key, None)
+
+    def stats(self):
+        """Get hit/miss counters and size."""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self.entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl
+            }
+
+def course_key(year, term, subject, course):
+    """Build the cache key for a course."""
+    return (str(year), term, subject.upper(), str(course))
+
+REGBLOCKS_CACHE = ResponseCache()
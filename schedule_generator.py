@@ -10,6 +10,13 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger('schedule_generator')
 
+# Weekly occupancy bitmasks: each day is SLOTS_PER_DAY bits, one per
+# SLOT_MINUTES of the day, and days are packed in WEEK_DAYS order. Slots are
+# one minute wide so meetings a few minutes apart never share a bit
+WEEK_DAYS = "MTWRFSU"
+SLOT_MINUTES = 1
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
 def generate_optimal_schedules(required_courses, optional_courses, earliest_time, latest_time, 
                               preferred_days, max_courses, year, term, prioritize_gaps, username):
     """
@@ -92,33 +99,31 @@ def generate_optimal_schedules(required_courses, optional_courses, earliest_time
         conn.close()
         raise ValueError(f"No available sections found for required courses: {', '.join(missing_required)}")
     
+    # Compile each section's meeting times once; a conflict check is then
+    # a single AND of two masks and adding a section a single OR
+    course_masks = {
+        course_code: [(section, section_mask(section)) for section in sections]
+        for course_code, sections in course_sections.items()
+    }
+    
     # Generate all possible combinations
     schedules = []
     
-    # Start with required courses
-    required_combinations = []
+    # Start with required courses, as (sections, occupied slots) pairs
+    required_combinations = [([], 0)]
     for course in required_courses:
-        if course in course_sections:
-            sections = course_sections[course]
-            if not required_combinations:
-                required_combinations = [[section] for section in sections]
-            else:
-                new_combinations = []
-                for combo in required_combinations:
-                    for section in sections:
-                        if not has_time_conflict(combo + [section]):
-                            new_combinations.append(combo + [section])
-                required_combinations = new_combinations
+        new_combinations = []
+        for combo, combo_mask in required_combinations:
+            for section, mask in course_masks[course]:
+                if not combo_mask & mask:
+                    new_combinations.append((combo + [section], combo_mask | mask))
+        required_combinations = new_combinations
     
     # If no valid combinations of required courses, return empty list
-    if required_courses and not required_combinations:
+    if not required_combinations:
         conn.close()
         return []
     
-    # If we have no required courses, start with an empty list
-    if not required_combinations:
-        required_combinations = [[]]
-    
     # Add optional courses if possible
     optional_courses_available = [c for c in optional_courses if c in course_sections]
     remaining_slots = max_courses - len(required_courses)
@@ -127,20 +132,25 @@ def generate_optimal_schedules(required_courses, optional_courses, earliest_time
         for r in range(1, min(remaining_slots + 1, len(optional_courses_available) + 1)):
             for opt_course_combo in itertools.combinations(optional_courses_available, r):
                 # Create cartesian product of sections for these optional courses
-                opt_section_combos = [course_sections[course] for course in opt_course_combo]
+                opt_section_combos = [course_masks[course] for course in opt_course_combo]
                 for opt_sections in itertools.product(*opt_section_combos):
+                    # Skip combos whose optional sections already conflict with each other
+                    opt_mask = combine_masks(mask for _, mask in opt_sections)
+                    if opt_mask is None:
+                        continue
+                    
                     # For each base schedule of required courses
-                    for req_combo in required_combinations:
+                    for req_combo, req_mask in required_combinations:
                         # Check if this combo of optional sections works with required courses
-                        candidate_schedule = req_combo + list(opt_sections)
-                        if not has_time_conflict(candidate_schedule):
+                        if not req_mask & opt_mask:
+                            candidate_schedule = req_combo + [section for section, _ in opt_sections]
                             schedules.append({
                                 'courses': candidate_schedule,
                                 'score': calculate_schedule_score(candidate_schedule, prioritize_gaps)
                             })
     else:
         # Just use the required courses
-        for req_combo in required_combinations:
+        for req_combo, _ in required_combinations:
             schedules.append({
                 'courses': req_combo,
                 'score': calculate_schedule_score(req_combo, prioritize_gaps)
@@ -154,6 +164,57 @@ def generate_optimal_schedules(required_courses, optional_courses, earliest_time
     # Return top 10 schedules
     return schedules[:10]
 
+def section_mask(section):
+    """
+    Compile a section's meeting times into a weekly occupancy bitmask.
+    
+    Each meeting covers the minutes from its start time up to, but not
+    including, its end time, so two sections conflict exactly when their
+    masks share a bit.
+    
+    Args:
+        section (dict): Course section dictionary
+    
+    Returns:
+        int: Bitmask of occupied slots (0 for sections without day or time
+        information, which never conflict)
+    """
+    if not section.get('days') or not section.get('startTime') or not section.get('endTime'):
+        return 0
+    
+    day_indexes = [WEEK_DAYS.index(day) for day in set(section['days']) if day in WEEK_DAYS]
+    
+    try:
+        start = max(0, time_to_minutes(section['startTime']) // SLOT_MINUTES)
+        end = min(SLOTS_PER_DAY, -(-time_to_minutes(section['endTime']) // SLOT_MINUTES))
+    except (ValueError, TypeError) as e:
+        # If time conversion fails, be cautious and block out its whole days
+        logger.warning(f"Error compiling times for {section.get('courseCode')} {section.get('section')}: {e}")
+        start, end = 0, SLOTS_PER_DAY
+    
+    if end <= start:
+        return 0
+    
+    day_mask = ((1 << (end - start)) - 1) << start
+    mask = 0
+    for day_index in day_indexes:
+        mask |= day_mask << (day_index * SLOTS_PER_DAY)
+    return mask
+
+def combine_masks(masks):
+    """
+    OR occupancy bitmasks together.
+    
+    Returns:
+        int: The combined mask, or None if any two of them overlap
+    """
+    combined = 0
+    for mask in masks:
+        if combined & mask:
+            return None
+        combined |= mask
+    return combined
+
 def has_time_conflict(sections):
     """
     Check if there is a time conflict between the provided sections.
@@ -164,42 +225,7 @@ def has_time_conflict(sections):
     Returns:
         bool: True if there is a conflict, False otherwise
     """
-    for i, section1 in enumerate(sections):
-        # Skip sections without day or time information
-        if not section1.get('days') or not section1.get('startTime') or not section1.get('endTime'):
-            continue
-            
-        for j in range(i+1, len(sections)):
-            section2 = sections[j]
-            
-            # Skip sections without day or time information
-            if not section2.get('days') or not section2.get('startTime') or not section2.get('endTime'):
-                continue
-            
-            # Check for day overlap
-            common_days = set(section1['days']) & set(section2['days'])
-            if not common_days:
-                continue
-            
-            # Convert times to integers for better comparison
-            try:
-                start1 = time_to_minutes(section1['startTime'])
-                end1 = time_to_minutes(section1['endTime'])
-                start2 = time_to_minutes(section2['startTime'])
-                end2 = time_to_minutes(section2['endTime'])
-                
-                # Check for time overlap
-                if max(start1, start2) < min(end1, end2):
-                    logger.debug(f"Time conflict detected between sections:")
-                    logger.debug(f"  Section 1: {section1['courseCode']} {section1['section']} at {section1['startTime']}-{section1['endTime']} on {section1['days']}")
-                    logger.debug(f"  Section 2: {section2['courseCode']} {section2['section']} at {section2['startTime']}-{section2['endTime']} on {section2['days']}")
-                    return True
-            except (ValueError, TypeError) as e:
-                # If time conversion fails, be cautious and assume there might be a conflict
-                logger.warning(f"Error comparing times: {e}")
-                return True
-                
-    return False
+    return combine_masks(section_mask(section) for section in sections) is None
 
 def time_to_minutes(time_str):
     """Convert time in 'HHMM' or 'HMM' format to minutes since midnight."""
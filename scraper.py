@@ -7,10 +7,22 @@ courses for seat availability.
 """
 
 import sqlite3
+import hashlib
+import json
 import requests
 import time
 import threading
 import logging
+from concurrent.futures import ThreadPoolExecutor
+import http_client
+import login_strategies
+import rate_limiter
+import seat_history
+import metrics
+from response_cache import REGBLOCKS_CACHE, course_key
+from singleflight import SingleFlight
+from catalog_pool import CATALOG_POOL, CATALOG_FETCHES
+from poll_scheduler import AdaptivePollScheduler
 from encryption import cipher
 from auth_manager import get_valid_cookies, clear_cookie_cache
 
@@ -26,10 +38,70 @@ logging.basicConfig(
 logger = logging.getLogger('scraper')
 
 # API Constants
-FSU_API_BASE = 'https://fsu.collegescheduler.com/api'
+FSU_API_BASE = http_client.API_BASE
 DB_PATH = "fsu_courses.db"
+DB_BUSY_TIMEOUT = 30  # Seconds a connection waits for another writer before failing
 
-def fetch_course_data(year, term, subject, course, username=None, password=None, retry=True):
+# Monitor concurrency limit (requests per host are capped in http_client)
+MONITOR_MAX_WORKERS = 8  # Courses checked in parallel per cycle
+
+# How often the monitor job wakes up to poll whichever courses are due
+MONITOR_TICK_SECONDS = 10
+
+# Oldest cached response the monitor accepts instead of polling, in seconds
+MONITOR_CACHE_MAX_AGE = 10
+
+# Instructor name -> id, shared by every ingesting thread. IDs never change
+# once assigned, so entries stay valid for the life of the process
+INSTRUCTOR_CACHE = {}
+INSTRUCTOR_CACHE_LOCK = threading.Lock()
+INSTRUCTOR_CACHE_LOADED = False
+
+# Last open-seat count each watcher was told about, keyed by
+# (username, course_code, section). Rebuilt from the database at startup
+LAST_SEAT_STATE = {}
+SEAT_STATE_LOCK = threading.Lock()
+SEAT_STATE_LOADED = False
+
+# Per-course next-due times shared by every monitor cycle in this process
+POLL_SCHEDULER = AdaptivePollScheduler()
+
+# Concurrent fetch + ingest of the same course (web syncs and the monitor) runs once
+COURSE_FLIGHTS = SingleFlight()
+COURSE_FLIGHT_WAIT = 30  # Seconds to wait on another caller's fetch before giving up on it
+
+# Monitor and ingest metrics
+MONITOR_CYCLE_SECONDS = metrics.histogram('fsu_monitor_cycle_seconds', 'Duration of monitor cycles')
+MONITOR_CYCLE_OVERRUNS = metrics.counter('fsu_monitor_cycle_overruns_total',
+                                         'Monitor cycles that took longer than MONITOR_TICK_SECONDS')
+MONITOR_COURSES_CHECKED = metrics.counter('fsu_monitor_courses_checked_total',
+                                          'Courses checked by the monitor by outcome', ['result'])
+INGEST_ROWS = metrics.counter('fsu_ingest_rows_total', 'Sections ingested by outcome', ['status'])
+INGEST_SECONDS = metrics.histogram('fsu_ingest_seconds', 'Duration of section ingest transactions')
+
+def fetch_regblocks(year, term, subject, course, cookies, username=None):
+    """
+    Request the regblocks for a course with an already obtained set of cookies.
+    
+    Raises:
+        http_client.AuthRejected if the cookies were rejected
+        http_client.UpstreamUnavailable if the API is overloaded or the circuit is open
+        requests.exceptions.RequestException if the request fails otherwise
+    """
+    api_url = f'{FSU_API_BASE}/terms/{year}%20{term}/subjects/{subject}/courses/{course}/regblocks'
+    
+    # Don't follow redirects, a redirect to the login page means the session expired
+    response = http_client.get(api_url, cookies=cookies, username=username, allow_redirects=False)
+    if http_client.is_auth_failure(response):
+        raise http_client.AuthRejected(f"Session rejected with status {response.status_code}")
+    response.raise_for_status()
+    data = response.json()
+    
+    # Every fresh response is shared with the other fetch paths
+    REGBLOCKS_CACHE.put(course_key(year, term, subject, course), data)
+    return data
+
+def fetch_course_data(year, term, subject, course, username=None, password=None, retry=True, max_age=None):
     """
     Fetch course data from FSU's College Scheduler API.
     
@@ -41,12 +113,18 @@ def fetch_course_data(year, term, subject, course, username=None, password=None,
         username: FSU username for authentication (optional)
         password: FSU password for authentication (optional)
         retry: Whether to retry on failure (default True)
+        max_age: Oldest cached response to accept in seconds (default the
+            cache TTL, 0 always fetches)
         
     Returns:
         JSON response data or None if request fails
     """
     try:
-        api_url = f'{FSU_API_BASE}/terms/{year}%20{term}/subjects/{subject}/courses/{course}/regblocks'
+        cached = REGBLOCKS_CACHE.get(course_key(year, term, subject, course), max_age)
+        if cached is not None:
+            logger.info(f"Using cached data for {subject}{course} {term} {year}")
+            return cached
+            
         logger.info(f"Fetching data for {subject}{course} {term} {year}")
         
         # Get authentication cookies if credentials provided
@@ -68,17 +146,21 @@ def fetch_course_data(year, term, subject, course, username=None, password=None,
             return None
             
         # Make API request with cookies
-        headers = {
-            "Cookie": "; ".join(f"{cookie['name']}={cookie['value']}" for cookie in cookies),
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-        }
-        
-        response = requests.get(api_url, headers=headers, timeout=10)
-        response.raise_for_status()
+        data = fetch_regblocks(year, term, subject, course, cookies, username)
         logger.info(f"Successfully fetched data for {subject}{course}")
-        return response.json()
+        return data
         
-    except requests.exceptions.RequestException as e:
+    except http_client.UpstreamUnavailable as e:
+        # Overload is a server-side problem, logging in again would not help
+        logger.error(f"College Scheduler unavailable: {e}")
+        return None
+        
+    except login_strategies.InvalidCredentials as e:
+        # Logging in again would only post the wrong password again
+        logger.error(f"Could not log in {username}: {e}")
+        return None
+        
+    except http_client.AuthRejected as e:
         logger.error(f"Request failed: {e}")
         
         # Only retry if this wasn't already a retry attempt
@@ -88,18 +170,29 @@ def fetch_course_data(year, term, subject, course, username=None, password=None,
             
             try:
                 cookies = get_valid_cookies(username, password, force_refresh=True)
-                return fetch_course_data(year, term, subject, course, username, password, retry=False)
+                return fetch_course_data(year, term, subject, course, username, password, retry=False, max_age=0)
+            except login_strategies.InvalidCredentials as retry_error:
+                logger.error(f"Could not log in {username}: {retry_error}")
             except Exception as retry_error:
                 logger.error(f"Retry failed: {retry_error}")
                 
+        return None
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Request failed: {e}")
         return None
     except Exception as e:
         logger.error(f"Unexpected error in fetch_course_data: {e}")
         return None
 
 def get_db_connection():
-    """Get a connection to the SQLite database with foreign key support."""
-    conn = sqlite3.connect(DB_PATH)
+    """
+    Get a connection to the SQLite database with foreign key support.
+    
+    WAL lets readers run while another process writes, and writers wait up
+    to DB_BUSY_TIMEOUT seconds for the write lock instead of failing.
+    """
+    conn = sqlite3.connect(DB_PATH, timeout=DB_BUSY_TIMEOUT)
+    conn.execute("PRAGMA journal_mode = WAL")
     conn.execute("PRAGMA foreign_keys = ON")
     return conn
 
@@ -124,82 +217,310 @@ def insert_course(course_code, section, seats_capacity, seats_available, instruc
     Returns:
         True if successful, False otherwise
     """
+    results = ingest_rows([(course_code, section, seats_capacity, seats_available, instructors,
+                            days, start_time, end_time, location, year, term)])
+    return bool(results) and results[0]['status'] != 'error'
+
+def section_fingerprint(course_code, section, seats_capacity, seats_available, instructors,
+                        days, start_time, end_time, location, year, term):
+    """
+    Hash everything ingest_rows would store for a section.
+    
+    Two fetches that produce the same fingerprint would write exactly the
+    same rows, so the second write can be skipped.
+    """
+    payload = json.dumps([course_code, section, seats_capacity, seats_available, instructor_names(instructors),
+                          days, start_time, end_time, location, str(year), term])
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def instructor_names(instructors):
+    """Get the instructor names from a section's instructor list."""
+    return [instructor.get("name", "Unknown") for instructor in instructors or []
+            if isinstance(instructor, dict)]
+
+def parse_section(course, year, term):
+    """
+    Turn one section from the API into a row for ingest_rows.
+    
+    Returns:
+        Tuple of insert_course arguments, or None for non-main campus sections
+    """
+    # Skip non-main campus courses
+    if course.get("campusCode", "MAIN") != "MAIN":
+        return None
+        
+    # Extract basic course details
+    course_code = course.get("course", "Unknown")
+    subject_id = course.get("subjectId", "Unknown")
+    section_code = course.get("sectionNumber", "Unknown")
+    seats_capacity = course.get("seatsCapacity", 0)
+    seats_available = course.get("openSeats", 0)
+    instructor_list = course.get("instructor", "Unknown")
+    
+    # Default values for meeting details
+    days = start_time = end_time = location = None
+    
+    # Extract meeting details if available
+    if "meetings" in course and course["meetings"] and len(course["meetings"]) > 0:
+        meeting = course["meetings"][0]
+        days = meeting.get("days")
+        start_time = meeting.get("startTime")
+        end_time = meeting.get("endTime")
+        location = meeting.get("location")
+        
+    # Form the complete course code
+    complete_course_code = f"{subject_id}{course_code}"
+    
+    return (complete_course_code, section_code, seats_capacity, seats_available,
+            instructor_list, days, start_time, end_time, location, year, term)
+
+def in_clause(values):
+    """Build the placeholder list for an SQL IN clause."""
+    return ", ".join("?" for _ in values)
+
+def load_instructor_cache(cursor):
+    """Fill the instructor cache from the instructors table on first use."""
+    global INSTRUCTOR_CACHE_LOADED
+    
+    with INSTRUCTOR_CACHE_LOCK:
+        if INSTRUCTOR_CACHE_LOADED:
+            return
+            
+    cursor.execute("SELECT instructorName, id FROM instructors")
+    rows = cursor.fetchall()
+    
+    with INSTRUCTOR_CACHE_LOCK:
+        INSTRUCTOR_CACHE.update(rows)
+        INSTRUCTOR_CACHE_LOADED = True
+        logger.info(f"Loaded {len(INSTRUCTOR_CACHE)} instructors into cache")
+
+def resolve_instructor_ids(cursor, names):
+    """
+    Get instructor IDs for a set of names, inserting any that are new.
+    
+    Known names come from INSTRUCTOR_CACHE; only names the cache has never
+    seen are written. New IDs are not added to the cache here because the
+    caller's transaction could still roll back - pass them to
+    cache_instructor_ids once it has committed.
+    
+    Returns:
+        Tuple of (dict of name -> id for every name, dict of the new names only)
+    """
+    if not names:
+        return {}, {}
+        
+    load_instructor_cache(cursor)
+    
+    with INSTRUCTOR_CACHE_LOCK:
+        ids = {name: INSTRUCTOR_CACHE[name] for name in names if name in INSTRUCTOR_CACHE}
+    missing = [name for name in names if name not in ids]
+    
+    new_ids = {}
+    if missing:
+        cursor.executemany("""
+            INSERT INTO instructors (instructorName) VALUES (?)
+            ON CONFLICT(instructorName) DO NOTHING
+        """, [(name,) for name in missing])
+        cursor.execute(f"""
+            SELECT instructorName, id FROM instructors
+            WHERE instructorName IN ({in_clause(missing)})
+        """, missing)
+        new_ids = dict(cursor.fetchall())
+        ids.update(new_ids)
+        
+    return ids, new_ids
+
+def cache_instructor_ids(new_ids):
+    """Add committed instructor IDs to the cache."""
+    if new_ids:
+        with INSTRUCTOR_CACHE_LOCK:
+            INSTRUCTOR_CACHE.update(new_ids)
+
+def compare_fingerprints(cursor, latest, course_codes):
+    """
+    Find the sections of a batch that differ from what is stored.
+    
+    Args:
+        cursor: Database cursor
+        latest: Dict of (course_code, section) -> row
+        course_codes: Every course code in latest
+        
+    Returns:
+        Tuple of ({key: 'inserted', 'updated' or 'unchanged'}, changed rows,
+        (course_code, section, fingerprint) tuples of the changed rows)
+    """
+    cursor.execute(f"""
+        SELECT c.courseCode, c.section, f.fingerprint
+        FROM courses c
+        LEFT JOIN course_fingerprints f ON f.courseCode = c.courseCode AND f.section = c.section
+        WHERE c.courseCode IN ({in_clause(course_codes)})
+    """, course_codes)
+    existing = {(course_code, section): fingerprint for course_code, section, fingerprint in cursor.fetchall()}
+    
+    results = {}
+    changed = []
+    fingerprints = []
+    for key, row in latest.items():
+        fingerprint = section_fingerprint(*row)
+        if key in existing and existing[key] == fingerprint:
+            results[key] = 'unchanged'
+            continue
+        results[key] = 'updated' if key in existing else 'inserted'
+        changed.append(row)
+        fingerprints.append((row[0], row[1], fingerprint))
+    return results, changed, fingerprints
+
+def ingest_rows(rows):
+    """
+    Write a batch of parsed sections to the database in a single transaction.
+    
+    Sections are upserted with one executemany, instructor IDs are resolved
+    in bulk, and sections whose fingerprint matches the last write are left
+    untouched. Fingerprints are compared with a plain read, so a batch with
+    nothing new never takes the write lock. Seat count changes are appended
+    to seat_history in the same transaction. If the batch fails, each section is retried in a transaction
+    of its own so only the bad ones are reported as errors.
+    
+    Args:
+        rows: List of tuples in insert_course argument order
+        
+    Returns:
+        List of {'courseCode', 'section', 'status'} dicts in input order, where
+        status is one of 'inserted', 'updated', 'unchanged' or 'error'
+    """
+    if not rows:
+        return []
+        
+    ingest_start = time.perf_counter()
+    
+    # Later duplicates of a section win, as they would with one-by-one writes
+    latest = {(row[0], row[1]): row for row in rows}
+    course_codes = list({row[0] for row in rows})
+    results = {}
+    
     try:
         conn = get_db_connection()
+    except sqlite3.Error as db_error:
+        logger.error(f"Database error opening ingest connection: {db_error}")
+        return [{'courseCode': row[0], 'section': row[1], 'status': 'error'} for row in rows]
+        
+    try:
         cursor = conn.cursor()
+        
+        # Most polls change nothing, so compare fingerprints with a plain read
+        # and only take the write lock when something has to be written
+        results, changed, fingerprints = compare_fingerprints(cursor, latest, course_codes)
+        new_instructor_ids = {}
+        
+        if changed:
+            # Another process may have written these sections since the read
+            cursor.execute("BEGIN IMMEDIATE")
+            results, changed, fingerprints = compare_fingerprints(cursor, latest, course_codes)
+            
+        if changed:
+            cursor.executemany("""
+                INSERT INTO courses (courseCode, section, seatsCapacity, seatsAvailable,
+                                     days, startTime, endTime, location, year, term)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(courseCode, section) DO UPDATE SET
+                    seatsCapacity = excluded.seatsCapacity,
+                    seatsAvailable = excluded.seatsAvailable,
+                    days = excluded.days,
+                    startTime = excluded.startTime,
+                    endTime = excluded.endTime,
+                    location = excluded.location,
+                    year = excluded.year,
+                    term = excluded.term
+            """, [(row[0], row[1], row[2], row[3], row[5], row[6], row[7], row[8], row[9], row[10])
+                  for row in changed])
+            
+            # Course IDs for the changed sections, including the new ones
+            changed_codes = list({row[0] for row in changed})
+            cursor.execute(f"""
+                SELECT courseCode, section, id FROM courses
+                WHERE courseCode IN ({in_clause(changed_codes)})
+            """, changed_codes)
+            course_ids = {(course_code, section): course_id
+                          for course_code, section, course_id in cursor.fetchall()}
+            
+            instructor_ids, new_instructor_ids = resolve_instructor_ids(
+                cursor, {name for row in changed for name in instructor_names(row[4])})
+            
+            # Replace instructor links for the changed sections
+            cursor.executemany("DELETE FROM course_instructors WHERE course_id = ?",
+                               [(course_ids[(row[0], row[1])],) for row in changed])
+            cursor.executemany("""
+                INSERT INTO course_instructors (course_id, instructor_id)
+                VALUES (?, ?)
+            """, [(course_ids[(row[0], row[1])], instructor_ids[name])
+                  for row in changed for name in instructor_names(row[4])])
+            
+            seat_history.record_changes(cursor, [(row[0], row[1], row[9], row[10], row[3], row[2])
+                                                 for row in changed])
+            
+            cursor.executemany("""
+                INSERT INTO course_fingerprints (courseCode, section, fingerprint)
+                VALUES (?, ?, ?)
+                ON CONFLICT(courseCode, section) DO UPDATE SET fingerprint = excluded.fingerprint
+            """, fingerprints)
+            
+        conn.commit()
+        cache_instructor_ids(new_instructor_ids)
+        
+        for row in changed:
+            course_code, section, seats_capacity, seats_available, _, days, start_time, end_time, location = row[:9]
+            logger.info(f"{results[(course_code, section)].capitalize()}: {course_code}-{section} " +
+                        f"({seats_available}/{seats_capacity} seats) " +
+                        f"{days or 'N/A'} {start_time or 'TBA'}-{end_time or 'TBA'} @ {location or 'TBA'}")
+            
+    except Exception as ingest_error:
+        conn.rollback()
+        if len(latest) == 1:
+            logger.error(f"Error ingesting {'-'.join(map(str, next(iter(latest))))}: {ingest_error}")
+            results = {key: 'error' for key in latest}
+        else:
+            logger.warning(f"Error ingesting {len(latest)} sections, retrying one at a time: {ingest_error}")
+            results = None
+    finally:
+        conn.close()
+        
+    if results is None:
+        # One malformed section should only fail itself, as with one-by-one writes
+        results = {key: ingest_rows([row])[0]['status'] for key, row in latest.items()}
+        return [{'courseCode': row[0], 'section': row[1], 'status': results[(row[0], row[1])]} for row in rows]
+        
+    INGEST_SECONDS.observe(time.perf_counter() - ingest_start)
+    for status in results.values():
+        INGEST_ROWS.inc(status=status)
+        
+    return [{'courseCode': row[0], 'section': row[1], 'status': results[(row[0], row[1])]} for row in rows]
 
+def ingest_sections(sections, year, term):
+    """
+    Write every section of an API response in a single transaction.
+    
+    Args:
+        sections: The 'sections' list from a regblocks response
+        year: The academic year
+        term: The academic term
+        
+    Returns:
+        Per-section results as returned by ingest_rows (non-main campus
+        sections are left out), followed by an 'error' result for each
+        section that could not be parsed
+    """
+    rows = []
+    unparsed = []
+    for course in sections:
         try:
-            # Check if course exists
-            cursor.execute("""
-                SELECT id FROM courses 
-                WHERE courseCode = ? AND section = ?
-            """, (course_code, section))
-            existing_course = cursor.fetchone()
-
-            if existing_course:
-                # Update existing course
-                cursor.execute("""
-                    UPDATE courses 
-                    SET seatsCapacity = ?, seatsAvailable = ?, 
-                        days = ?, startTime = ?, endTime = ?, location = ?,
-                        year = ?, term = ?
-                    WHERE courseCode = ? AND section = ?
-                """, (seats_capacity, seats_available, days, start_time, end_time, 
-                      location, year, term, course_code, section))
-                course_id = existing_course[0]
-                
-                # Remove old instructor links
-                cursor.execute("DELETE FROM course_instructors WHERE course_id = ?", (course_id,))
-                action = "Updated"
-            else:
-                # Insert new course
-                cursor.execute("""
-                    INSERT INTO courses (courseCode, section, seatsCapacity, seatsAvailable, 
-                                       days, startTime, endTime, location, year, term)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (course_code, section, seats_capacity, seats_available, 
-                     days, start_time, end_time, location, year, term))
-                course_id = cursor.lastrowid
-                action = "Inserted"
-
-            # Insert/update instructors
-            if instructors:
-                for instructor in instructors:
-                    if isinstance(instructor, dict):
-                        instructor_name = instructor.get("name", "Unknown")
-                        cursor.execute("""
-                            INSERT INTO instructors (instructorName) 
-                            VALUES (?)
-                            ON CONFLICT(instructorName) DO UPDATE SET 
-                            instructorName = excluded.instructorName
-                            RETURNING id
-                        """, (instructor_name,))
-                        instructor_result = cursor.fetchone()
-                        instructor_id = instructor_result[0]
-
-                        cursor.execute("""
-                            INSERT INTO course_instructors (course_id, instructor_id)
-                            VALUES (?, ?)
-                        """, (course_id, instructor_id))
-
-            conn.commit()
-            logger.info(f"{action}: {course_code}-{section} ({seats_available}/{seats_capacity} seats) " +
-                      f"{days or 'N/A'} {start_time or 'TBA'}-{end_time or 'TBA'} @ {location or 'TBA'}")
-            return True
-
-        except sqlite3.Error as db_error:
-            conn.rollback()
-            logger.error(f"Database error for {course_code}-{section}: {db_error}")
-            return False
-        finally:
-            conn.close()
-
-    except ValueError:
-        logger.error(f"Invalid seats_capacity value for {course_code}-{section}")
-        return False
-    except Exception as e:
-        logger.error(f"Unexpected error inserting {course_code}-{section}: {e}")
-        return False
+            row = parse_section(course, year, term)
+        except (AttributeError, TypeError, IndexError, KeyError) as e:
+            logger.error(f"Skipping malformed section {course!r:.80}: {e}")
+            unparsed.append({'courseCode': None, 'section': None, 'status': 'error'})
+            continue
+        if row:
+            rows.append(row)
+    return ingest_rows(rows) + unparsed
 
 def process_courses(data, year, term):
     """
@@ -211,209 +532,524 @@ def process_courses(data, year, term):
         term: The academic term
         
     Returns:
-        Number of courses processed
+        Number of courses processed (written or already up to date)
     """
     if not data:
         logger.warning("No data to process")
         return 0
         
-    courses_processed = 0
-    
     try:
         if 'sections' not in data:
             logger.error(f"Invalid data format - 'sections' field missing: {data}")
             return 0
             
-        for course in data['sections']:
-            # Skip non-main campus courses
-            if course.get("campusCode", "MAIN") != "MAIN":
-                continue
-                
-            # Extract basic course details
-            course_code = course.get("course", "Unknown")
-            subject_id = course.get("subjectId", "Unknown")
-            section_code = course.get("sectionNumber", "Unknown")
-            seats_capacity = course.get("seatsCapacity", 0)
-            seats_available = course.get("openSeats", 0)
-            instructor_list = course.get("instructor", "Unknown")
+        start_time = time.time()
+        results = ingest_sections(data['sections'], year, term)
+        
+        courses_processed = sum(1 for result in results if result['status'] != 'error')
+        courses_unchanged = sum(1 for result in results if result['status'] == 'unchanged')
+        
+        logger.info(f"Processed {courses_processed} courses for {term} {year} " +
+                    f"({courses_unchanged} unchanged) in {time.time() - start_time:.3f}s")
+        return courses_processed
+        
+    except Exception as e:
+        logger.error(f"Error processing courses: {e}")
+        return 0
+
+def refresh_course(year, term, subject, course, cookies, username=None):
+    """
+    Fetch a course with the given session and store it, sharing the work
+    with concurrent refreshes.
+    
+    If another thread (a web sync or the monitor) is already refreshing the
+    same course, this waits for it and returns its data instead of making a
+    second upstream request and a second write transaction. Only the request
+    and the ingest are shared; callers get their cookies first, so nobody
+    waits on another user's login. If the shared fetch's session was
+    rejected, the waiter fetches with its own session; any other failure is
+    shared, since a second request would hit the same upstream. A waiter
+    that gives up after COURSE_FLIGHT_WAIT gets the cached data, if any,
+    rather than adding a request to an upstream that is already slow.
+    
+    Args:
+        year, term, subject, course: The course to refresh
+        cookies: Session cookies to fetch with
+        username: The user the cookies belong to
+        
+    Returns:
+        JSON regblocks data
+        
+    Raises:
+        http_client.AuthRejected, http_client.UpstreamUnavailable or
+        requests exceptions from the fetch; UpstreamUnavailable also if the
+        shared fetch timed out and nothing is cached
+    """
+    def fetch_and_process():
+        data = fetch_regblocks(year, term, subject, course, cookies, username)
+        if data:
+            process_courses(data, year, term)
+        return data
+        
+    key = course_key(year, term, subject, course)
+    try:
+        return COURSE_FLIGHTS.do(key, fetch_and_process, timeout=COURSE_FLIGHT_WAIT,
+                                 retry_alone=(http_client.AuthRejected,))
+    except TimeoutError as e:
+        stale = REGBLOCKS_CACHE.get(key)
+        if stale is not None:
+            logger.info(f"Using cached data for {subject}{course} {term} {year}: {e}")
+            return stale
+        raise http_client.UpstreamUnavailable(str(e)) from e
+
+def sync_course_data(year, term, subject, course, username, password):
+    """
+    Fetch a course with a user's credentials and store it (see refresh_course).
+    
+    Returns:
+        JSON regblocks data, or None if the fetch failed
+    """
+    try:
+        cached = REGBLOCKS_CACHE.get(course_key(year, term, subject, course))
+        if cached is not None:
+            logger.info(f"Using cached data for {subject}{course} {term} {year}")
+            process_courses(cached, year, term)
+            return cached
             
-            # Default values for meeting details
-            days = start_time = end_time = location = None
+        cookies = get_valid_cookies(username, password)
+        if not cookies:
+            logger.warning(f"No valid cookies obtained for {username}")
+            return None
             
-            # Extract meeting details if available
-            if "meetings" in course and course["meetings"] and len(course["meetings"]) > 0:
-                meeting = course["meetings"][0]
-                days = meeting.get("days")
-                start_time = meeting.get("startTime")
-                end_time = meeting.get("endTime")
-                location = meeting.get("location")
-                
-            # Form the complete course code
-            complete_course_code = f"{subject_id}{course_code}"
+        try:
+            return refresh_course(year, term, subject, course, cookies, username)
+        except http_client.AuthRejected as e:
+            logger.error(f"Request failed: {e}")
+            logger.info("Attempting to refresh cookies and retry...")
+            clear_cookie_cache(username)
+            cookies = get_valid_cookies(username, password, force_refresh=True)
+            if not cookies:
+                return None
+            return refresh_course(year, term, subject, course, cookies, username)
+            
+    except http_client.UpstreamUnavailable as e:
+        # Overload is a server-side problem, logging in again would not help
+        logger.error(f"College Scheduler unavailable: {e}")
+        return None
+    except login_strategies.InvalidCredentials as e:
+        logger.error(f"Could not log in {username}: {e}")
+        return None
+    except Exception as e:
+        logger.error(f"Could not sync {subject}{course} {term} {year}: {e}")
+        return None
+
+def split_course_code(course_code):
+    """Split a course code like 'MAC2311' into its subject and course number."""
+    subject = ''.join(filter(str.isalpha, course_code))
+    course_num = ''.join(filter(str.isdigit, course_code))
+    return subject, course_num
+
+def build_fetch_plan():
+    """
+    Group every monitored section by the regblocks request that covers it.
+    
+    All sections of a course come back from a single regblocks call, so each
+    (year, term, subject, course) only needs to be fetched once per cycle no
+    matter how many users are watching sections of it.
+    
+    Returns:
+        Tuple of (plan, passwords) where plan maps (year, term, subject, course)
+        to a list of (username, course_code, section) watchers and passwords
+        maps each watching username to their encrypted FSU password
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT mc.username, mc.courseCode, mc.section, mc.year, mc.term,
+               u.fsu_password as encrypted_password
+        FROM monitored_courses mc
+        JOIN users u ON mc.username = u.username
+        ORDER BY mc.courseCode, mc.section
+    """)
+    rows = cursor.fetchall()
+    conn.close()
+    
+    plan = {}
+    passwords = {}
+    for username, course_code, section, year, term, encrypted_password in rows:
+        subject, course_num = split_course_code(course_code)
+        plan.setdefault((year, term, subject, course_num), []).append((username, course_code, section))
+        passwords[username] = encrypted_password
+        
+    return plan, passwords
+
+def get_monitor_cookies(username, encrypted_password):
+    """
+    Get cookies for a user during a monitoring cycle, refreshing once if needed.
+    
+    Returns:
+        List of cookies or None if the user could not be authenticated
+    """
+    try:
+        # Decrypt password
+        password = cipher.decrypt(encrypted_password)
+        
+        # Using force_refresh=False to reuse existing cookies from the shared cookie cache
+        print(f"[SCHEDULER] Getting cached cookies for {username}")
+        cookies = get_valid_cookies(username, password, force_refresh=False)
+        
+        # If we couldn't get valid cookies, try one refresh
+        if not cookies:
+            print(f"[SCHEDULER] No valid cached cookies, attempting refresh for {username}")
+            cookies = get_valid_cookies(username, password, force_refresh=True)
+        
+        if not cookies:
+            print(f"[SCHEDULER] Failed to get valid cookies for {username} after refresh")
+            return None
+        
+        print(f"[SCHEDULER] Successfully obtained cookies for {username}")
+        return cookies
+        
+    except http_client.UpstreamUnavailable as upstream_error:
+        # The cookies may be fine, the server just could not check them
+        print(f"[SCHEDULER] Could not check cookies for {username}: {upstream_error}")
+        return None
+        
+    except login_strategies.InvalidCredentials as login_error:
+        # No refresh, it would only post the wrong password again
+        print(f"[SCHEDULER] FSU rejected the saved password for {username}: {login_error}")
+        return None
+        
+    except http_client.AuthRejected as auth_error:
+        print(f"[SCHEDULER] Session for {username} rejected: {auth_error}")
+        clear_cookie_cache(username)
+        return None
+        
+    except Exception as auth_error:
+        print(f"[SCHEDULER] Authentication error for {username}: {auth_error}")
+        # Not a rejection, so the session's lifetime says nothing about how long sessions last
+        clear_cookie_cache(username, rejected=False)
+        return None
+
+def load_seat_state():
+    """
+    Rebuild the last-known seat table from the database.
+    
+    Each watcher starts from the seat count currently stored for their
+    section, so a restart does not re-notify for seats that were already open.
+    """
+    global SEAT_STATE_LOADED
+    
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute("""
+            SELECT mc.username, mc.courseCode, mc.section, c.seatsAvailable
+            FROM monitored_courses mc
+            LEFT JOIN courses c ON mc.courseCode = c.courseCode AND mc.section = c.section
+        """)
+        rows = cursor.fetchall()
+    finally:
+        conn.close()
+        
+    with SEAT_STATE_LOCK:
+        LAST_SEAT_STATE.clear()
+        for username, course_code, section, seats_available in rows:
+            if seats_available is not None:
+                LAST_SEAT_STATE[(username, course_code, section)] = seats_available
+        SEAT_STATE_LOADED = True
+        
+    logger.info(f"Loaded last known seat state for {len(LAST_SEAT_STATE)} watched sections")
+
+def prune_seat_state(plan):
+    """Forget the seat state of sections nobody watches any more."""
+    watched = {watcher for watchers in plan.values() for watcher in watchers}
+    with SEAT_STATE_LOCK:
+        for key in list(LAST_SEAT_STATE):
+            if key not in watched:
+                del LAST_SEAT_STATE[key]
+
+def seat_transition(previous, open_seats):
+    """
+    Classify a change in open seats.
+    
+    Returns:
+        'opened' (full to open), 'increased' (more seats open than before),
+        'closed' (open to full) or None when the user should not hear about it
+    """
+    if open_seats > 0:
+        if previous is None or previous <= 0:
+            return 'opened'
+        if open_seats > previous:
+            return 'increased'
+    elif previous is not None and previous > 0:
+        return 'closed'
+    return None
+
+def course_sections(data):
+    """
+    Get the section dicts of a regblocks payload.
+    
+    Returns:
+        List of section dicts (entries that are not dicts are left out), or
+        None if the payload is not a regblocks response at all
+    """
+    if not isinstance(data, dict) or not isinstance(data.get('sections', []), list):
+        return None
+    return [course_section for course_section in data.get('sections', []) if isinstance(course_section, dict)]
+
+def notify_watchers(data, watchers):
+    """
+    Check freshly fetched sections against everyone watching them.
+    
+    Users are only notified when their section changes state: it opens,
+    more seats open up, or it fills up again. A section that stays open
+    does not notify again on every cycle.
+    
+    Args:
+        data: JSON regblocks data for one course
+        watchers: List of (username, course_code, section) tuples
+    """
+    sections = {course_section.get('sectionNumber'): course_section
+                for course_section in course_sections(data) or []}
+    
+    for username, course_code, section in watchers:
+        course_section = sections.get(section)
+        if not course_section:
+            continue
             
-            # Insert into database
-            success = insert_course(
-                complete_course_code, section_code, seats_capacity, seats_available,
-                instructor_list, days, start_time, end_time, location, year, term
-            )
+        open_seats = course_section.get('openSeats', 0)
+        total_seats = course_section.get('seatsCapacity', 0)
+        print(f"[SCHEDULER] Course {course_code}-{section}: {open_seats}/{total_seats} seats available")
+        
+        with SEAT_STATE_LOCK:
+            previous = LAST_SEAT_STATE.get((username, course_code, section))
+            LAST_SEAT_STATE[(username, course_code, section)] = open_seats
             
-            if success:
-                courses_processed += 1
+        transition = seat_transition(previous, open_seats)
+        if not transition:
+            continue
+            
+        try:
+            # Import here to avoid circular imports
+            import notifications
+            
+            if transition == 'closed':
+                print(f"[SCHEDULER] SECTION FULL AGAIN: {course_code}-{section}")
+                notification_result = notifications.send_course_full_notification(
+                    username,
+                    course_code,
+                    section,
+                    total_seats
+                )
+            else:
+                print(f"[SCHEDULER] SEATS AVAILABLE: {course_code}-{section} ({open_seats} seats)")
                 
-        logger.info(f"Processed {courses_processed} courses for {term} {year}")
-        return courses_processed
+                # Send notification to the user
+                notification_result = notifications.send_course_notification(
+                    username, 
+                    course_code, 
+                    section, 
+                    open_seats, 
+                    total_seats
+                )
+            
+            if notification_result:
+                print(f"[SCHEDULER] Successfully sent notification to {username} for {course_code}-{section}")
+            else:
+                print(f"[SCHEDULER] Failed to send notification to {username} for {course_code}-{section}")
+                
+        except Exception as notify_error:
+            print(f"[SCHEDULER] Error notifying {username} for {course_code}-{section}: {notify_error}")
+
+def check_course(key, watchers, cookies_for):
+    """
+    Fetch one course from the fetch plan and check it for all of its watchers.
+    
+    Args:
+        key: (year, term, subject, course) tuple from the fetch plan
+        watchers: List of (username, course_code, section) tuples
+        cookies_for: Callable returning cookies for a username (or None)
         
-    except Exception as e:
-        logger.error(f"Error processing courses: {e}")
-        return courses_processed
+    Returns:
+        JSON regblocks data, or None if no catalog reader or watcher could fetch the course
+    """
+    year, term, subject, course_num = key
+    
+    def fetch():
+        # Seat counts are the same for everyone, so shared catalog reader
+        # sessions are tried first, round robin
+        for username, cookies in CATALOG_POOL.sessions():
+            try:
+                data = refresh_course(year, term, subject, course_num, cookies, username)
+                CATALOG_FETCHES.inc(session='reader')
+                return data
+            except http_client.UpstreamUnavailable as upstream_error:
+                print(f"[SCHEDULER] Upstream unavailable for {subject}{course_num} {term} {year}: {upstream_error}")
+                return None
+            except http_client.AuthRejected as auth_error:
+                print(f"[SCHEDULER] Catalog reader session for {username} rejected: {auth_error}")
+                CATALOG_POOL.reject(username)
+            except Exception as course_error:
+                print(f"[SCHEDULER] Error checking {subject}{course_num} {term} {year} as reader {username}: {course_error}")
+                
+        # Any watcher's session can fetch the course, try them in order
+        for username in dict.fromkeys(watcher[0] for watcher in watchers):
+            cookies = cookies_for(username)
+            if not cookies:
+                continue
+                
+            try:
+                data = refresh_course(year, term, subject, course_num, cookies, username)
+                CATALOG_FETCHES.inc(session='watcher')
+                return data
+            except http_client.UpstreamUnavailable as upstream_error:
+                # Another watcher's session would hit the same overloaded server
+                print(f"[SCHEDULER] Upstream unavailable for {subject}{course_num} {term} {year}: {upstream_error}")
+                return None
+            except http_client.AuthRejected as auth_error:
+                print(f"[SCHEDULER] Session for {username} rejected: {auth_error}")
+                clear_cookie_cache(username)
+            except Exception as course_error:
+                print(f"[SCHEDULER] Error checking {subject}{course_num} {term} {year} as {username}: {course_error}")
+        return None
+        
+    # A manual sync may have fetched and stored this course moments ago;
+    # otherwise fetch and store the fresh seat counts (unchanged sections are
+    # skipped by fingerprint), getting each session's cookies outside the
+    # shared fetch so nobody waits on another user's login
+    data = REGBLOCKS_CACHE.get(course_key(year, term, subject, course_num), MONITOR_CACHE_MAX_AGE)
+    if data is None:
+        data = fetch()
+    
+    if data is None:
+        print(f"[SCHEDULER] Could not fetch {subject}{course_num} {term} {year} for any watcher")
+        return None
+        
+    if course_sections(data) is None:
+        print(f"[SCHEDULER] Unexpected regblocks payload of type {type(data).__name__} for {subject}{course_num} {term} {year}")
+        return None
+        
+    notify_watchers(data, watchers)
+    return data
+
+def watched_seats(data, watchers):
+    """Get the open seats of each watched section in a regblocks payload."""
+    watched = {section for _, _, section in watchers}
+    return {
+        course_section['sectionNumber']: course_section.get('openSeats', 0)
+        for course_section in course_sections(data) or []
+        if course_section.get('sectionNumber') in watched
+    }
 
-def check_monitored_courses():
+def check_monitored_courses(max_workers=None, owns=None, fetch_plan=None):
     """
     Task to check monitored courses for seat availability.
     This function runs periodically to check if seats have become 
     available in any monitored courses.
+    
+    Each course is fetched once per cycle and the result is shared with
+    every user watching any of its sections. Only courses that POLL_SCHEDULER
+    reports as due are fetched, so busy courses are polled more often than
+    ones that never change. Courses are checked on a thread pool, with
+    in-flight requests to each host capped by
+    http_client.MAX_CONCURRENT_REQUESTS_PER_HOST.
+    
+    Args:
+        max_workers: Number of courses to check in parallel (default MONITOR_MAX_WORKERS)
+        owns: Callable taking a plan key and its watchers and returning whether
+            this process polls that course (default all courses), used by
+            monitor_worker.py to split the watch list between processes
+        fetch_plan: (plan, passwords) from build_fetch_plan, if the caller
+            has already built it this cycle
     """
     # Log with timestamp for easier debugging
     start_time = time.time()
     print(f"[SCHEDULER] Running monitored courses check at {time.strftime('%H:%M:%S', time.localtime(start_time))}")
     
     try:
-        # Get all users with monitored courses
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        plan, passwords = fetch_plan or build_fetch_plan()
         
-        cursor.execute("""
-            SELECT DISTINCT mc.username, u.fsu_password as encrypted_password
-            FROM monitored_courses mc
-            JOIN users u ON mc.username = u.username
-        """)
-        users = cursor.fetchall()
-        conn.close()
+        if owns is not None:
+            plan = {key: watchers for key, watchers in plan.items() if owns(key, watchers)}
         
-        user_count = len(users)
-        if user_count == 0:
+        if not plan:
             print("[SCHEDULER] No users with monitored courses found")
             return
             
-        print(f"[SCHEDULER] Found {user_count} users with monitored courses")
+        watcher_count = sum(len(watchers) for watchers in plan.values())
+        print(f"[SCHEDULER] Found {len(passwords)} users watching {watcher_count} sections across {len(plan)} courses")
         
-        # Process users one by one
-        for username, encrypted_password in users:
-            try:
-                # Decrypt password
-                password = cipher.decrypt(encrypted_password)
-                
-                # Get this user's monitored courses
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT mc.courseCode, mc.section, mc.year, mc.term
-                    FROM monitored_courses mc
-                    WHERE mc.username = ?
-                    ORDER BY mc.courseCode, mc.section
-                """, (username,))
-                user_courses = cursor.fetchall()
-                conn.close()
-                
-                course_count = len(user_courses)
-                print(f"[SCHEDULER] Checking {course_count} courses for user {username}")
-                
-                if course_count == 0:
-                    continue
-                    
-                # Get cookies once for this user - using force_refresh=False to reuse existing cookies
-                # This is the key part to ensure we're using the shared cookie cache
-                cookies = None
-                try:
-                    print(f"[SCHEDULER] Getting cached cookies for {username}")
-                    cookies = get_valid_cookies(username, password, force_refresh=False)
-                    
-                    # If we couldn't get valid cookies, try one refresh
-                    if not cookies:
-                        print(f"[SCHEDULER] No valid cached cookies, attempting refresh for {username}")
-                        cookies = get_valid_cookies(username, password, force_refresh=True)
-                    
-                    if not cookies:
-                        print(f"[SCHEDULER] Failed to get valid cookies for {username} after refresh")
-                        continue
-                    
-                    print(f"[SCHEDULER] Successfully obtained cookies for {username}")
-                        
-                    # Check each course
-                    for course_code, section, year, term in user_courses:
-                        try:
-                            # Extract subject and course number
-                            subject = ''.join(filter(str.isalpha, course_code))
-                            course_num = ''.join(filter(str.isdigit, course_code))
-                            
-                            # Make API request
-                            api_url = f'https://fsu.collegescheduler.com/api/terms/{year}%20{term}/subjects/{subject}/courses/{course_num}/regblocks'
-                            headers = {
-                                "Cookie": "; ".join(f"{cookie['name']}={cookie['value']}" for cookie in cookies),
-                                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-                            }
-                            
-                            response = requests.get(api_url, headers=headers, timeout=10)
-                            response.raise_for_status()
-                            data = response.json()
-                            
-                            # Check for open seats
-                            if data and 'sections' in data:
-                                for course_section in data['sections']:
-                                    if course_section['sectionNumber'] == section:
-                                        open_seats = course_section.get('openSeats', 0)
-                                        total_seats = course_section.get('seatsCapacity', 0)
-                                        print(f"[SCHEDULER] Course {course_code}-{section}: {open_seats}/{total_seats} seats available")
-                                        
-                                        if open_seats > 0:
-                                            # Seats available! Update database
-                                            print(f"[SCHEDULER] SEATS AVAILABLE: {course_code}-{section} ({open_seats} seats)")
-                                            
-                                            # Update course in database
-                                            conn = get_db_connection()
-                                            cursor = conn.cursor()
-                                            cursor.execute("""
-                                                UPDATE courses 
-                                                SET seatsCapacity = ?, seatsAvailable = ?
-                                                WHERE courseCode = ? AND section = ?
-                                            """, (course_section.get('seatsCapacity', 0), open_seats, 
-                                                  course_code, section))
-                                            conn.commit()
-                                            conn.close()
-
-                                            # Import here to avoid circular imports
-                                            import notifications
-                                            
-                                            # Send notification to the user
-                                            notification_result = notifications.send_course_notification(
-                                                username, 
-                                                course_code, 
-                                                section, 
-                                                open_seats, 
-                                                total_seats
-                                            )
-                                            
-                                            if notification_result:
-                                                print(f"[SCHEDULER] Successfully sent notification to {username} for {course_code}-{section}")
-                                            else:
-                                                print(f"[SCHEDULER] Failed to send notification to {username} for {course_code}-{section}")
-                                        break
-                                
-                        except Exception as course_error:
-                            print(f"[SCHEDULER] Error checking {course_code}-{section}: {course_error}")
-                            continue
-                            
-                except Exception as auth_error:
-                    print(f"[SCHEDULER] Authentication error for {username}: {auth_error}")
-                    # Only clear cache if there was an authentication error
-                    clear_cookie_cache(username)
-                
-            except Exception as user_error:
-                print(f"[SCHEDULER] Error processing user {username}: {user_error}")
+        if not SEAT_STATE_LOADED:
+            load_seat_state()
+        prune_seat_state(plan)
+        
+        POLL_SCHEDULER.sync(plan.keys())
+        
+        # Pause polling while the upstream is unhealthy; due courses stay queued
+        if rate_limiter.BREAKER.is_open():
+            print(f"[SCHEDULER] College Scheduler unhealthy, pausing polling for {rate_limiter.BREAKER.retry_in():.0f}s")
+            return
+            
+        due_keys = POLL_SCHEDULER.pop_due()
+        
+        if not due_keys:
+            print("[SCHEDULER] No courses due this cycle")
+            return
+            
+        print(f"[SCHEDULER] {len(due_keys)} of {len(plan)} courses due this cycle")
+        
+        # Cookies are looked up at most once per user per cycle, even when
+        # several workers need the same user's session at the same time
+        user_cookies = {}
+        user_locks = {}
+        locks_guard = threading.Lock()
+        
+        def cookies_for(username):
+            with locks_guard:
+                user_lock = user_locks.setdefault(username, threading.Lock())
+            with user_lock:
+                if username not in user_cookies:
+                    user_cookies[username] = get_monitor_cookies(username, passwords[username])
+                return user_cookies[username]
+        
+        # Every popped course must be rescheduled, even when checking it fails,
+        # or it is never due again
+        rescheduled = set()
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers or MONITOR_MAX_WORKERS,
+                                    thread_name_prefix='monitor') as executor:
+                futures = {executor.submit(check_course, key, plan[key], cookies_for): key
+                           for key in due_keys}
+                for future, key in futures.items():
+                    seats = None
+                    try:
+                        data = future.result()
+                        if data is not None:
+                            seats = watched_seats(data, plan[key])
+                    except Exception as course_error:
+                        print(f"[SCHEDULER] Error checking course: {course_error}")
+                    finally:
+                        rescheduled.add(key)
+                        if seats is None:
+                            POLL_SCHEDULER.record_failure(key)
+                            MONITOR_COURSES_CHECKED.inc(result='failed')
+                        else:
+                            POLL_SCHEDULER.record(key, seats)
+                            MONITOR_COURSES_CHECKED.inc(result='ok')
+        finally:
+            for key in due_keys:
+                if key not in rescheduled:
+                    POLL_SCHEDULER.record_failure(key)
                 
     except Exception as e:
         print(f"[SCHEDULER] Error in monitoring task: {e}")
         
+    finally:
+        cycle_duration = time.time() - start_time
+        MONITOR_CYCLE_SECONDS.observe(cycle_duration)
+        if cycle_duration > MONITOR_TICK_SECONDS:
+            MONITOR_CYCLE_OVERRUNS.inc()
+        
     end_time = time.time()
     duration = end_time - start_time
     print(f"[SCHEDULER] Completed monitored courses check at {time.strftime('%H:%M:%S', time.localtime(end_time))} (took {duration:.2f}s)")
@@ -0,0 +1,124 @@
+"""
+Seat-count history for course sections.
+
+A row is written only when a section's open seats or capacity differ from
+its last recorded values, so the table grows with the number of changes
+rather than the number of polls. Rows are keyed by section and Unix time
+in a WITHOUT ROWID table, which keeps them compact and makes both
+"last N changes" and "state as of a time" single index lookups. The table
+is append-only: a change recorded in the same second as the section's
+previous one is stored a second later instead of replacing it.
+"""
+import time
+import logging
+from datetime import datetime
+
+logger = logging.getLogger('seat_history')
+
+def to_timestamp(when):
+    """Convert a datetime or number to whole Unix seconds."""
+    if isinstance(when, datetime):
+        return int(when.timestamp())
+    return int(when)
+
+def latest_rows(cursor, sections):
+    """
+    Get the last recorded row of each section in one query.
+
+    Returns:
+        Dict of (course_code, section, year, term) -> (ts, open, capacity)
+    """
+    course_codes = list({course_code for course_code, *_ in sections})
+    if not course_codes:
+        return {}
+    # SQLite takes the bare columns of a MAX() aggregate from the row holding the maximum
+    cursor.execute(f"""
+        SELECT courseCode, section, year, term, MAX(ts), open, capacity FROM seat_history
+        WHERE courseCode IN ({", ".join("?" for _ in course_codes)})
+        GROUP BY courseCode, section, year, term
+    """, course_codes)
+    return {tuple(row[:4]): tuple(row[4:]) for row in cursor.fetchall()}
+
+def record_changes(cursor, sections, when=None):
+    """
+    Append history rows for sections whose seat counts changed.
+
+    Meant to run inside the caller's ingest transaction.
+
+    Args:
+        cursor: Cursor of an open transaction
+        sections: List of (course_code, section, year, term, open_seats, capacity) tuples
+        when: Time of the observation (default now)
+
+    Returns:
+        Number of history rows written
+    """
+    ts = to_timestamp(time.time() if when is None else when)
+    latest = latest_rows(cursor, sections)
+    changes = []
+
+    for course_code, section, year, term, open_seats, capacity in sections:
+        last = latest.get((course_code, section, str(year), term))
+        if last is not None and last[1:] == (open_seats, capacity):
+            continue
+        # Keep the key unique and in order when the last change was this second
+        row_ts = ts if last is None or last[0] < ts else last[0] + 1
+        changes.append((course_code, section, str(year), term, row_ts, open_seats, capacity))
+
+    if changes:
+        cursor.executemany("""
+            INSERT INTO seat_history (courseCode, section, year, term, ts, open, capacity)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, changes)
+
+    return len(changes)
+
+def recent_changes(course_code, section, year, term, limit=20):
+    """
+    Get the last N recorded changes for a section, newest first.
+
+    Returns:
+        List of {'timestamp', 'open', 'capacity'} dicts
+    """
+    # Import here to avoid circular imports
+    import scraper
+
+    conn = scraper.get_db_connection()
+    try:
+        cursor = conn.execute("""
+            SELECT ts, open, capacity FROM seat_history
+            WHERE courseCode = ? AND section = ? AND year = ? AND term = ?
+            ORDER BY ts DESC LIMIT ?
+        """, (course_code, section, str(year), term, limit))
+        return [{'timestamp': ts, 'open': open_seats, 'capacity': capacity}
+                for ts, open_seats, capacity in cursor.fetchall()]
+    finally:
+        conn.close()
+
+def state_at(course_code, section, year, term, when):
+    """
+    Get a section's seat counts as they were at a given time.
+
+    Args:
+        when: datetime or Unix timestamp
+
+    Returns:
+        {'timestamp', 'open', 'capacity'} of the last change at or before
+        that time, or None if nothing was recorded yet
+    """
+    # Import here to avoid circular imports
+    import scraper
+
+    conn = scraper.get_db_connection()
+    try:
+        cursor = conn.execute("""
+            SELECT ts, open, capacity FROM seat_history
+            WHERE courseCode = ? AND section = ? AND year = ? AND term = ? AND ts <= ?
+            ORDER BY ts DESC LIMIT 1
+        """, (course_code, section, str(year), term, to_timestamp(when)))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return {'timestamp': row[0], 'open': row[1], 'capacity': row[2]}
+    finally:
+        conn.close()
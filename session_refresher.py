@@ -0,0 +1,193 @@
+"""
+Proactive renewal of login sessions before they expire.
+
+Cached cookies used to be renewed only once they had expired, so the next
+request (usually a monitor cycle) blocked on a full Duo login, and every
+user who logged in around the same time was due in the same wave. The
+refresher logs users in again shortly before their session's expiry, with
+a random lead of REFRESH_LEAD plus up to REFRESH_JITTER so renewals are
+spread out. Users with monitored courses (or the catalog readers, when
+catalog_pool is enabled) are renewed first; other users only if they used
+their session within ACTIVE_WINDOW, so nobody gets Duo pushes for a
+session they have stopped using.
+
+Session expiry itself comes from auth_manager.session_lifetime(), which
+tracks how long sessions actually last. The old cookies stay in the cache
+while a renewal runs, so the fetch path keeps using them without waiting.
+
+Set FSU_PROACTIVE_REFRESH=0 to turn the refresher off.
+"""
+import os
+import random
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import auth_manager
+import metrics
+from catalog_pool import CATALOG_POOL
+from encryption import cipher
+
+logger = logging.getLogger('session_refresher')
+
+PROACTIVE_REFRESH = os.environ.get('FSU_PROACTIVE_REFRESH', '1') != '0'
+REFRESH_INTERVAL = 30  # Seconds between checks for sessions that are due
+REFRESH_LEAD = timedelta(minutes=10)  # Renew at least this long before expiry
+REFRESH_JITTER = timedelta(minutes=10)  # Extra random lead per session
+ACTIVE_WINDOW = timedelta(minutes=30)  # Users without monitored courses must have used their session this recently
+REFRESH_CONCURRENCY = 1  # Renewals at once, leaving the other pooled browsers to logins users wait on
+
+SESSION_REFRESHES = metrics.counter('fsu_session_refreshes_total',
+                                    'Proactive session renewals by outcome', ['result'])
+
+class SessionRefresher:
+    """Renews cached sessions in the background before they expire."""
+
+    def __init__(self, lead=REFRESH_LEAD, jitter=REFRESH_JITTER, active_window=ACTIVE_WINDOW,
+                 concurrency=REFRESH_CONCURRENCY):
+        self.lead = lead
+        self.jitter = jitter
+        self.active_window = active_window
+        self.concurrency = concurrency
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='session-refresh')
+        self.lock = threading.Lock()
+        self.refresh_at = {}  # username -> (session expiry, when to renew it)
+        self.attempted = {}  # username -> expiry of the session last renewed or tried
+        self.in_flight = set()
+
+    def renew_time(self, username, expiry):
+        """Get when to renew a session, picking its jitter once per session."""
+        scheduled = self.refresh_at.get(username)
+        if not scheduled or scheduled[0] != expiry:
+            lead = self.lead + timedelta(seconds=random.uniform(0, self.jitter.total_seconds()))
+            scheduled = self.refresh_at[username] = (expiry, expiry - lead)
+        return scheduled[1]
+
+    def load_users(self, usernames):
+        """
+        Get the encrypted password and whether they monitor any course for each user.
+
+        Returns:
+            Dict of username -> (encrypted_password, monitored)
+        """
+        if not usernames:
+            return {}
+        # Import here to avoid circular imports
+        import scraper
+
+        conn = scraper.get_db_connection()
+        try:
+            placeholders = ', '.join('?' for _ in usernames)
+            rows = conn.execute(f"""
+                SELECT u.username, u.fsu_password,
+                       EXISTS (SELECT 1 FROM monitored_courses mc WHERE mc.username = u.username)
+                FROM users u
+                WHERE u.username IN ({placeholders}) AND u.fsu_password IS NOT NULL
+            """, list(usernames)).fetchall()
+        finally:
+            conn.close()
+        return {username: (encrypted_password, bool(monitored))
+                for username, encrypted_password, monitored in rows}
+
+    def due_sessions(self, include_monitored=True, owns_user=None):
+        """
+        Get the users whose session should be renewed now, most urgent first.
+
+        Args:
+            include_monitored: Whether to renew users with monitored courses
+                (off when monitor workers in other processes hold their sessions)
+            owns_user: Optional predicate limiting renewals to some usernames
+
+        Returns:
+            List of (username, encrypted_password) tuples
+        """
+        now = datetime.now()
+        sessions = auth_manager.cached_sessions()
+        if owns_user:
+            sessions = {username: entry for username, entry in sessions.items() if owns_user(username)}
+
+        with self.lock:
+            # Forget users whose session is gone
+            for username in list(self.refresh_at):
+                if username not in sessions:
+                    del self.refresh_at[username]
+            candidates = {
+                username: entry for username, entry in sessions.items()
+                if entry['expiry'] > now
+                and username not in self.in_flight
+                and self.attempted.get(username) != entry['expiry']
+                and self.renew_time(username, entry['expiry']) <= now
+            }
+
+        users = self.load_users(candidates)
+        due = []
+        for username, entry in candidates.items():
+            if username not in users:
+                continue
+            encrypted_password, monitored = users[username]
+            if CATALOG_POOL.enabled:
+                # Catalog readers do the monitor's fetching, watchers' own sessions are only a fallback
+                monitored = CATALOG_POOL.is_reader(username)
+            if monitored and not include_monitored:
+                continue
+            last_used = entry.get('last_used')
+            if not monitored and (not last_used or now - last_used > self.active_window):
+                continue
+            due.append((not monitored, entry['expiry'], username, encrypted_password))
+
+        due.sort()
+        return [(username, encrypted_password) for _, _, username, encrypted_password in due]
+
+    def run_once(self, include_monitored=True, owns_user=None):
+        """Start renewals for the sessions that are due, up to the concurrency limit."""
+        if not PROACTIVE_REFRESH:
+            return
+
+        try:
+            due = self.due_sessions(include_monitored, owns_user)
+        except Exception as e:
+            logger.error(f"Could not check sessions for renewal: {e}")
+            return
+
+        for username, encrypted_password in due:
+            with self.lock:
+                if len(self.in_flight) >= self.concurrency:
+                    return
+                self.in_flight.add(username)
+            self.executor.submit(self.refresh, username, encrypted_password)
+
+    def refresh(self, username, encrypted_password):
+        """Log a user in again, keeping their old cookies in use until it finishes."""
+        try:
+            entry = auth_manager.cached_sessions().get(username)
+            if entry:
+                with self.lock:
+                    # One try per session, a failed renewal falls back to renewing on expiry
+                    self.attempted[username] = entry['expiry']
+                logger.info(f"[{username}] Renewing session that expires at {entry['expiry']:%H:%M:%S}")
+
+            cookies = auth_manager.get_valid_cookies(username, cipher.decrypt(encrypted_password),
+                                                     force_refresh=True)
+            SESSION_REFRESHES.inc(result='success' if cookies else 'failure')
+            if not cookies:
+                logger.warning(f"[{username}] Session renewal did not produce cookies")
+        except Exception as e:
+            SESSION_REFRESHES.inc(result='failure')
+            logger.error(f"[{username}] Session renewal failed: {e}")
+        finally:
+            with self.lock:
+                self.in_flight.discard(username)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'enabled': PROACTIVE_REFRESH,
+                'scheduled': len(self.refresh_at),
+                'in_flight': len(self.in_flight),
+                'session_lifetime_seconds': auth_manager.session_lifetime().total_seconds()
+            }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+SESSION_REFRESHER = SessionRefresher()
@@ -0,0 +1,90 @@
+"""
+Single-flight coalescing of concurrent identical calls.
+
+When several threads ask for the same key at once, only the first runs the
+function; the others wait for it and share its result (or its exception).
+The key is forgotten as soon as the call finishes, so this only removes
+duplicate concurrent work and never serves stale results; response_cache
+handles reuse over time.
+"""
+import threading
+import logging
+
+logger = logging.getLogger('singleflight')
+
+class Flight:
+    """One in-progress call that later callers can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Runs at most one call per key at a time and shares its outcome."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights = {}  # key -> Flight
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key, func, *args, timeout=None, retry_alone=()):
+        """
+        Run func(*args) unless a call for key is already in progress, in
+        which case wait for that call and return its result.
+
+        Args:
+            key: Hashable key identifying identical calls
+            func: The callable to run
+            *args: Passed to func
+            timeout: Seconds a waiting caller gives up after (default wait
+                for the running call to finish)
+            retry_alone: Exception types that depend on the caller (e.g. a
+                rejected session); a waiter whose shared call raised one of
+                these runs func(*args) itself instead of sharing the failure
+
+        Returns:
+            func's return value
+
+        Raises:
+            Whatever func raised, for the caller and every waiter (except
+            retry_alone types, which waiters retry)
+            TimeoutError if a waiter gave up before the call finished
+        """
+        with self.lock:
+            flight = self.flights.get(key)
+            if flight is None:
+                flight = self.flights[key] = Flight()
+                leader = True
+                self.calls += 1
+            else:
+                leader = False
+                self.shared += 1
+
+        if not leader:
+            logger.info(f"Waiting on in-flight call for {key}")
+            if not flight.done.wait(timeout):
+                raise TimeoutError(f"Timed out waiting on in-flight call for {key}")
+            if flight.error is None:
+                return flight.result
+            if isinstance(flight.error, tuple(retry_alone)):
+                logger.info(f"In-flight call for {key} failed for its caller ({flight.error}), running it alone")
+                return func(*args)
+            raise flight.error
+
+        try:
+            flight.result = func(*args)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+
+    def stats(self):
+        """Get the number of calls run and the number of callers that shared one."""
+        with self.lock:
+            return {'calls': self.calls, 'shared': self.shared, 'in_flight': len(self.flights)}
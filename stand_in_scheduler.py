@@ -0,0 +1,475 @@
+"""
+Local stand-in for the College Scheduler API.
+
+Serves the endpoints the scraper, crawler and cookie validation use, with a
+generated catalog and configurable latency, error rate and seat churn, so
+scraper changes can be measured without touching FSU's servers:
+
+    /entry
+    /api/terms/{year term}/subjects
+    /api/terms/{year term}/subjects/{subject}/courses
+    /api/terms/{year term}/subjects/{subject}/courses/{course}/regblocks
+
+Any request carrying a Cookie header counts as logged in.
+
+It also serves a stand-in CAS login with a Duo step that approves itself
+after duo_delay seconds (/cas/login, /cas/duo, /portal), and
+StandInDriverFactory provides a minimal browser driver for it, so logins
+and browser_pool.BrowserPool can be exercised without Chrome or Duo. A
+completed login sets a CASTGC single sign-on cookie, and /cas/login skips
+the form and Duo for requests that carry it, like the real CAS. A login
+with StandInConfig.bad_password is rejected like a wrong password:
+
+    FSU_CAS_LOGIN_URL=http://127.0.0.1:8765/cas/login
+
+Run standalone and point the app at it with FSU_SCHEDULER_BASE:
+
+    python stand_in_scheduler.py --port 8765 --latency 0.1
+    FSU_SCHEDULER_BASE=http://127.0.0.1:8765 python app.py
+"""
+import argparse
+import itertools
+import json
+import random
+import string
+import threading
+import time
+import uuid
+from collections import Counter
+from html.parser import HTMLParser
+from http.cookies import SimpleCookie
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs, unquote, urljoin, urlparse
+import requests
+from selenium.common.exceptions import NoSuchElementException
+
+# Subjects listed first so realistic codes exist in small catalogs
+KNOWN_SUBJECTS = ['MAC', 'CHM', 'BSC', 'ENC', 'PHY', 'COP', 'CDA', 'STA', 'PSY', 'ECO']
+
+class StandInConfig:
+    """Knobs for the stand-in server."""
+
+    def __init__(self, latency=0.0, latency_jitter=0.0, error_rate=0.0, seat_churn=0.0,
+                 subjects=10, courses_per_subject=10, sections_per_course=6, seed=0, duo_delay=1.0,
+                 bad_password=None):
+        self.latency = latency  # Seconds added to every response
+        self.latency_jitter = latency_jitter  # Up to this many extra seconds, uniformly
+        self.error_rate = error_rate  # Fraction of API requests answered with 503
+        self.seat_churn = seat_churn  # Chance per section per fetch that its open seats change
+        self.subjects = subjects
+        self.courses_per_subject = courses_per_subject
+        self.sections_per_course = sections_per_course
+        self.seed = seed
+        self.duo_delay = duo_delay  # Seconds until a stand-in Duo prompt approves itself
+        self.bad_password = bad_password  # Password the stand-in CAS rejects, like a wrong one
+
+class Catalog:
+    """Generated subjects, courses and sections with mutable seat counts."""
+
+    def __init__(self, config):
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.lock = threading.Lock()
+        self.courses = {}  # subject -> [course numbers]
+        self.sections = {}  # (subject, course) -> [section dicts]
+
+        synthetic = (''.join(letters) for letters in itertools.product(string.ascii_uppercase, repeat=3))
+        subjects = list(KNOWN_SUBJECTS[:config.subjects])
+        while len(subjects) < config.subjects:
+            code = next(synthetic)
+            if code not in subjects:
+                subjects.append(code)
+
+        for subject in subjects:
+            numbers = [str(1000 + index * 7) for index in range(config.courses_per_subject)]
+            self.courses[subject] = numbers
+            for number in numbers:
+                self.sections[(subject, number)] = [
+                    self.make_section(subject, number, index + 1)
+                    for index in range(config.sections_per_course)
+                ]
+
+    def make_section(self, subject, number, index):
+        """Create one section with random meeting times and seats."""
+        capacity = self.random.choice([20, 30, 45, 60, 120, 300])
+        start = self.random.choice([800, 905, 1010, 1115, 1220, 1325, 1430, 1535])
+        return {
+            'subjectId': subject,
+            'course': number,
+            'sectionNumber': f'{index:04d}',
+            'campusCode': 'MAIN',
+            'seatsCapacity': capacity,
+            'openSeats': self.random.choice([0, 0, 0, 1, 2, 5, capacity // 2]),
+            'instructor': [{'name': f'Instructor {self.random.randint(1, 200)}'}],
+            'meetings': [{
+                'days': self.random.choice(['MWF', 'TR', 'MW', 'F']),
+                'startTime': f'{start:04d}',
+                'endTime': f'{start + 50:04d}',
+                'location': f'BLDG {self.random.randint(100, 399)}'
+            }]
+        }
+
+    def regblocks(self, subject, number):
+        """Get a course's sections, applying seat churn first."""
+        with self.lock:
+            sections = self.sections.get((subject, number))
+            if sections is None:
+                return None
+            for section in sections:
+                if self.random.random() < self.config.seat_churn:
+                    change = self.random.choice([-2, -1, 1, 2])
+                    section['openSeats'] = max(0, min(section['seatsCapacity'], section['openSeats'] + change))
+            return {'sections': json.loads(json.dumps(sections))}
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Request handler; the server instance carries the config, catalog and stats."""
+
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like the real host
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, status, body, content_type='application/json', headers=None):
+        data = body.encode('utf-8') if isinstance(body, str) else json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for name, values in (headers or {}).items():
+            for value in (values if isinstance(values, list) else [values]):
+                self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        server = self.server
+        config = server.config
+        path = unquote(urlparse(self.path).path)
+        parts = [part for part in path.split('/') if part]
+
+        delay = config.latency + (random.uniform(0, config.latency_jitter) if config.latency_jitter else 0)
+        if delay:
+            time.sleep(delay)
+
+        logged_in = bool(self.headers.get('Cookie'))
+
+        if parts[:1] == ['cas'] or parts == ['portal']:
+            self.login_page(parts, parse_qs(urlparse(self.path).query))
+            return
+
+        if parts == ['entry']:
+            server.count('entry')
+            if not logged_in:
+                self.send_body(302, '', 'text/html', {'Location': '/cas/login'})
+            else:
+                self.send_body(200, '<html><body><div id="Term-options">Choose a Term</div></body></html>', 'text/html')
+            return
+
+        if not parts or parts[0] != 'api':
+            server.count('not_found')
+            self.send_body(404, {'error': 'not found'})
+            return
+
+        if not logged_in:
+            server.count('unauthorized')
+            self.send_body(401, {'error': 'not logged in'})
+            return
+
+        if config.error_rate and random.random() < config.error_rate:
+            server.count('error')
+            self.send_body(503, {'error': 'service unavailable'})
+            return
+
+        catalog = server.catalog
+        # /api/terms/{term}/subjects[/{subject}/courses[/{course}/regblocks]]
+        if len(parts) == 4 and parts[1] == 'terms' and parts[3] == 'subjects':
+            server.count('subjects')
+            self.send_body(200, [{'id': subject, 'short': subject} for subject in catalog.courses])
+        elif len(parts) == 6 and parts[3] == 'subjects' and parts[5] == 'courses':
+            server.count('courses')
+            numbers = catalog.courses.get(parts[4])
+            if numbers is None:
+                self.send_body(404, {'error': 'unknown subject'})
+            else:
+                self.send_body(200, [{'number': number, 'subjectId': parts[4]} for number in numbers])
+        elif len(parts) == 8 and parts[5] == 'courses' and parts[7] == 'regblocks':
+            server.count('regblocks')
+            data = catalog.regblocks(parts[4], parts[6])
+            if data is None:
+                self.send_body(404, {'error': 'unknown course'})
+            else:
+                self.send_body(200, data)
+        else:
+            server.count('not_found')
+            self.send_body(404, {'error': 'not found'})
+
+    def do_POST(self):
+        path = unquote(urlparse(self.path).path)
+        length = int(self.headers.get('Content-Length') or 0)
+        form = parse_qs(self.rfile.read(length).decode('utf-8'))
+
+        if path != '/cas/login':
+            self.send_body(404, {'error': 'not found'})
+            return
+
+        self.server.count('login')
+        if not form.get('username') or not form.get('password') or not form.get('execution'):
+            self.send_body(200, LOGIN_PAGE.format(error='Enter your username and password'), 'text/html')
+            return
+        if self.server.config.bad_password is not None and form['password'][0] == self.server.config.bad_password:
+            self.server.count('login_rejected')
+            self.send_body(200, LOGIN_PAGE.format(error='Invalid credentials'), 'text/html')
+            return
+
+        ticket = uuid.uuid4().hex
+        with self.server.stats_lock:
+            self.server.logins[ticket] = time.time() + self.server.config.duo_delay
+        self.send_body(302, '', 'text/html', {'Location': f'/cas/duo?ticket={ticket}'})
+
+    def login_page(self, parts, query):
+        """Serve the stand-in CAS login, Duo prompt and portal pages."""
+        ticket = query.get('ticket', [''])[0]
+        with self.server.stats_lock:
+            approve_at = self.server.logins.get(ticket)
+
+        if parts == ['cas', 'login']:
+            sso = SimpleCookie(self.headers.get('Cookie', '')).get('CASTGC')
+            with self.server.stats_lock:
+                signed_in = sso is not None and sso.value in self.server.sso_tickets
+                if signed_in:
+                    ticket = uuid.uuid4().hex
+                    self.server.logins[ticket] = 0.0
+            if signed_in:
+                # Single sign-on: straight back to the service, no Duo
+                self.server.count('sso_login')
+                self.send_body(302, '', 'text/html', {'Location': f'/portal?ticket={ticket}'})
+            else:
+                self.send_body(200, LOGIN_PAGE.format(error=''), 'text/html')
+        elif approve_at is None:
+            self.send_body(302, '', 'text/html', {'Location': '/cas/login'})
+        elif parts == ['cas', 'duo']:
+            if time.time() < approve_at:
+                self.send_body(200, DUO_PAGE, 'text/html')
+            else:
+                self.send_body(200, TRUST_PAGE.format(ticket=ticket), 'text/html')
+        elif parts == ['portal']:
+            sso_ticket = f'TGT-{uuid.uuid4().hex}'
+            with self.server.stats_lock:
+                self.server.logins.pop(ticket, None)
+                self.server.sso_tickets.add(sso_ticket)
+            self.server.count('login_complete')
+            self.send_body(200, PORTAL_PAGE, 'text/html', {'Set-Cookie': [
+                f'session={uuid.uuid4().hex}; Path=/',
+                f'CASTGC={sso_ticket}; Path=/cas; HttpOnly'
+            ]})
+        else:
+            self.send_body(404, {'error': 'not found'})
+
+LOGIN_PAGE = """<html><body><p>{error}</p>
+<form method="post" action="/cas/login">
+<input name="execution" type="hidden" value="e1s1">
+<input name="username" type="text"><input name="password" type="password">
+<button name="submit" type="submit">Log In</button>
+</form></body></html>"""
+
+# The real prompt updates itself with JavaScript; a meta refresh stands in for that
+DUO_PAGE = """<html><head><meta http-equiv="refresh" content="1"></head>
+<body><div>Secured by Duo</div><p>Check your device for a push notification.</p></body></html>"""
+
+TRUST_PAGE = """<html><body><p>Is this your device?</p>
+<button id="dont-trust-browser-button" data-href="/portal?ticket={ticket}">No, other people use this device</button>
+</body></html>"""
+
+PORTAL_PAGE = """<html><body><div id="kgoui_FpageHeader">myFSU</div></body></html>"""
+
+class StandInServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the catalog and request counters."""
+
+    daemon_threads = True
+
+    def __init__(self, address, config=None, handler=StandInHandler):
+        super().__init__(address, handler)
+        self.config = config or StandInConfig()
+        self.catalog = Catalog(self.config)
+        self.stats = Counter()
+        self.stats_lock = threading.Lock()
+        self.logins = {}  # Duo ticket -> time it approves itself
+        self.sso_tickets = set()  # CASTGC values of completed logins
+
+    def count(self, name):
+        with self.stats_lock:
+            self.stats[name] += 1
+            self.stats['total'] += 1
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+class PageParser(HTMLParser):
+    """Collects the elements a login needs: anything with an id or name, and meta refresh."""
+
+    def __init__(self):
+        super().__init__()
+        self.elements = []  # (attrs, form action or None)
+        self.hidden = {}  # form action -> hidden input values submitted with it
+        self.form_action = None
+        self.refresh = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs, tag=tag)
+        if tag == 'form':
+            self.form_action = attrs.get('action', '')
+        elif tag == 'meta' and attrs.get('http-equiv', '').lower() == 'refresh':
+            self.refresh = float(attrs.get('content', '0').split(';')[0])
+        elif tag == 'input' and attrs.get('type') == 'hidden' and self.form_action is not None:
+            self.hidden.setdefault(self.form_action, {})[attrs.get('name')] = attrs.get('value', '')
+        if 'id' in attrs or 'name' in attrs:
+            self.elements.append((attrs, self.form_action))
+
+    def handle_endtag(self, tag):
+        if tag == 'form':
+            self.form_action = None
+
+class StandInElement:
+    """A found element supporting the send_keys/click calls a login makes."""
+
+    def __init__(self, browser, attrs, form_action):
+        self.browser = browser
+        self.attrs = attrs
+        self.form_action = form_action
+
+    def send_keys(self, text):
+        name = self.attrs['name']
+        self.browser.form_values[name] = self.browser.form_values.get(name, '') + text
+
+    def click(self):
+        if 'data-href' in self.attrs:
+            self.browser.get(urljoin(self.browser.current_url, self.attrs['data-href']))
+        elif self.form_action is not None:
+            self.browser.submit(urljoin(self.browser.current_url, self.form_action),
+                                self.browser.parser.hidden.get(self.form_action, {}))
+
+class StandInBrowser:
+    """
+    Minimal stand-in for a Selenium WebDriver, driving the stand-in login
+    pages over HTTP. Supports get, find_element by id or name, page_source,
+    current_url, get_cookies, delete_all_cookies and quit.
+    """
+
+    def __init__(self):
+        self.session = requests.Session()
+        self.current_url = 'about:blank'
+        self.source = ''
+        self.parser = PageParser()
+        self.loaded_at = 0.0
+        self.form_values = {}
+
+    def load(self, response):
+        self.current_url = response.url
+        self.source = response.text
+        self.parser = PageParser()
+        self.parser.feed(self.source)
+        self.loaded_at = time.monotonic()
+
+    def get(self, url):
+        self.form_values = {}
+        if url == 'about:blank':
+            self.current_url, self.source, self.parser = url, '', PageParser()
+            return
+        self.load(self.session.get(url, timeout=10))
+
+    def submit(self, url, hidden=None):
+        values, self.form_values = dict(hidden or {}, **self.form_values), {}
+        self.load(self.session.post(url, data=values, timeout=10))
+
+    def refresh_if_due(self):
+        """Honour meta refresh, so self-updating pages change while a login waits on them."""
+        if self.parser.refresh is not None and time.monotonic() - self.loaded_at >= self.parser.refresh:
+            self.load(self.session.get(self.current_url, timeout=10))
+
+    @property
+    def page_source(self):
+        self.refresh_if_due()
+        return self.source
+
+    def find_element(self, by, value):
+        self.refresh_if_due()
+        for attrs, form_action in self.parser.elements:
+            if attrs.get(by) == value:
+                return StandInElement(self, attrs, form_action)
+        raise NoSuchElementException(f"No element with {by} {value!r}")
+
+    def get_cookies(self):
+        """Cookies visible to the current page, like Selenium's get_cookies."""
+        path = urlparse(self.current_url).path or '/'
+        return [cookie for cookie in self.all_cookies() if path.startswith(cookie['path'])]
+
+    def all_cookies(self):
+        return [{'name': cookie.name, 'value': cookie.value, 'domain': cookie.domain, 'path': cookie.path}
+                for cookie in self.session.cookies]
+
+    def delete_all_cookies(self):
+        self.session.cookies.clear()
+
+    def quit(self):
+        self.session.close()
+
+class StandInDriverFactory:
+    """browser_pool driver factory producing StandInBrowsers."""
+
+    def __init__(self):
+        self.created = 0
+
+    def create(self):
+        self.created += 1
+        return StandInBrowser()
+
+    def reset(self, driver):
+        driver.get('about:blank')
+        driver.delete_all_cookies()
+
+    def is_alive(self, driver):
+        return True
+
+    def all_cookies(self, driver):
+        return driver.all_cookies()
+
+    def quit(self, driver):
+        driver.quit()
+
+def start_stand_in(config=None, host='127.0.0.1', port=0):
+    """
+    Start a stand-in server on a background thread.
+
+    Returns:
+        The running StandInServer (call shutdown() to stop it)
+    """
+    server = StandInServer((host, port), config)
+    thread = threading.Thread(target=server.serve_forever, name='stand-in-scheduler', daemon=True)
+    thread.start()
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local stand-in College Scheduler API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument('--latency-jitter', type=float, default=0.0, help="extra random latency in seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of API calls answered with 503")
+    parser.add_argument('--seat-churn', type=float, default=0.1, help="chance a section's seats change per fetch")
+    parser.add_argument('--subjects', type=int, default=10)
+    parser.add_argument('--courses-per-subject', type=int, default=10)
+    parser.add_argument('--sections-per-course', type=int, default=6)
+    parser.add_argument('--duo-delay', type=float, default=1.0, help="seconds until a Duo prompt approves itself")
+    args = parser.parse_args()
+
+    server = StandInServer((args.host, args.port), StandInConfig(
+        latency=args.latency, latency_jitter=args.latency_jitter, error_rate=args.error_rate,
+        seat_churn=args.seat_churn, subjects=args.subjects,
+        courses_per_subject=args.courses_per_subject, sections_per_course=args.sections_per_course,
+        duo_delay=args.duo_delay))
+    print(f"Stand-in College Scheduler listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
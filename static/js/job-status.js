@@ -0,0 +1,25 @@
+/**
+ * Background job helpers for FSU Course Scraper
+ * Course fetches run as background jobs; these wait for them to finish
+ */
+
+// Poll /jobs/<id> until the job is done or failed, resolves with the job
+function waitForJob(jobId, intervalMs = 1000) {
+    return new Promise((resolve, reject) => {
+        const check = () => {
+            fetch(`/jobs/${jobId}`)
+                .then(response => response.json())
+                .then(data => {
+                    if (!data.success) {
+                        reject(new Error(data.error));
+                    } else if (data.job.status === 'done' || data.job.status === 'failed') {
+                        resolve(data.job);
+                    } else {
+                        setTimeout(check, intervalMs);
+                    }
+                })
+                .catch(reject);
+        };
+        check();
+    });
+}
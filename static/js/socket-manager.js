@@ -233,6 +233,17 @@ const SocketManager = {
                         data.message,
                         { duration: 0 }
                     );
+                } else if (data.type === 'course_full') {
+                    ToastNotifications.warning(
+                        'Section Full Again',
+                        data.message,
+                        { duration: 15000 }
+                    );
+                } else if (data.type === 'job') {
+                    ToastNotifications[data.status === 'done' ? 'success' : 'error'](
+                        data.status === 'done' ? 'Course Updated' : 'Course Update Failed',
+                        data.message
+                    );
                 } else {
                     ToastNotifications.info(
                         'Notification',
@@ -251,6 +262,10 @@ const SocketManager = {
             return `auth_${data.timestamp || Date.now()}`;
         } else if (data.type === 'course_availability') {
             return `course_${data.course_code}_${data.section}_${data.seats_available}`;
+        } else if (data.type === 'course_full') {
+            return `course_full_${data.course_code}_${data.section}_${data.total_seats}`;
+        } else if (data.type === 'job') {
+            return `job_${data.job_id}_${data.status}`;
         }
         return null;
     },
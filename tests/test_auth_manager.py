@@ -0,0 +1,38 @@
+from collections import deque
+from datetime import datetime, timedelta
+
+import pytest
+
+import auth_manager
+
+@pytest.fixture(autouse=True)
+def lifetimes(monkeypatch):
+    monkeypatch.setattr(auth_manager, 'SESSION_LIFETIMES', deque(maxlen=20))
+
+def end(minutes, rejected):
+    """Record a session that was rejected, or last seen working, after some minutes."""
+    logged_in_at = datetime.now() - timedelta(minutes=minutes)
+    cache_entry = {'logged_in_at': logged_in_at, 'expiry': datetime.now() + timedelta(hours=1)}
+    if not rejected:
+        cache_entry['last_used'] = cache_entry['expiry'] = datetime.now()
+    auth_manager.record_lifetime('student', cache_entry, rejected)
+
+def test_rejections_set_the_median_lifetime():
+    for minutes in (40, 60, 80, 100, 110):
+        end(minutes, rejected=True)
+
+    assert auth_manager.session_lifetime() == pytest.approx(timedelta(minutes=80), abs=timedelta(seconds=5))
+
+def test_sessions_that_outlive_the_estimate_raise_it():
+    for minutes in (40, 60, 80, 100, 110):
+        end(minutes, rejected=True)
+    estimate = auth_manager.session_lifetime()
+
+    for _ in range(10):
+        end(estimate.total_seconds() / 60, rejected=False)
+    assert auth_manager.session_lifetime() > estimate
+
+    # Once no recent session was rejected, new ones get the full lifetime again
+    for _ in range(20):
+        end(estimate.total_seconds() / 60, rejected=False)
+    assert auth_manager.session_lifetime() == auth_manager.COOKIE_EXPIRY
@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import auth_manager
+import crawler
+import http_client
+import init_db
+import rate_limiter
+import scraper
+from stand_in_scheduler import StandInConfig, start_stand_in
+
+SUBJECTS = 2
+COURSES_PER_SUBJECT = 3
+
+@pytest.fixture
+def stand_in(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(scraper, 'INSTRUCTOR_CACHE', {})
+    monkeypatch.setattr(scraper, 'INSTRUCTOR_CACHE_LOADED', False)
+    init_db.init_db()
+
+    server = start_stand_in(StandInConfig(subjects=SUBJECTS, courses_per_subject=COURSES_PER_SUBJECT,
+                                          sections_per_course=2))
+    monkeypatch.setattr(http_client, 'SCHEDULER_BASE', server.base_url)
+    monkeypatch.setattr(scraper, 'FSU_API_BASE', f'{server.base_url}/api')
+    monkeypatch.setattr(rate_limiter, 'BREAKER', rate_limiter.CircuitBreaker(reset_timeout=0.1))
+    monkeypatch.setattr(rate_limiter, 'backoff_delay', lambda attempt: 0.01)
+    monkeypatch.setattr(auth_manager, 'COOKIE_CACHE', {'crawler': {
+        'cookies': [{'name': 'session', 'value': 'crawl'}],
+        'expiry': datetime.now() + timedelta(hours=1)
+    }})
+    yield server
+    server.shutdown()
+
+def crawl():
+    return crawler.crawl_term(2025, 'Fall', 'crawler', 'password', requests_per_second=1000)
+
+def test_interrupted_crawl_resumes_where_it_stopped(stand_in, monkeypatch):
+    crawl_course = crawler.crawl_course
+    fetched = []
+
+    def interrupted(*args):
+        if len(fetched) >= 2:
+            raise KeyboardInterrupt
+        fetched.append(args[-1])
+        return crawl_course(*args)
+
+    monkeypatch.setattr(crawler, 'crawl_course', interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        crawler.crawl_term(2025, 'Fall', 'crawler', 'password', max_workers=1, requests_per_second=1000)
+    _, pending = crawler.get_progress(2025, 'Fall')
+    assert len(pending) == SUBJECTS * COURSES_PER_SUBJECT - 2
+
+    monkeypatch.setattr(crawler, 'crawl_course', crawl_course)
+    summary = crawl()
+
+    assert summary['courses'] == len(pending)
+    assert summary['subjects'] == 0
+    assert crawler.get_progress(2025, 'Fall')[1] == []
+    assert stand_in.stats['courses'] == SUBJECTS
+    assert stand_in.stats['regblocks'] == SUBJECTS * COURSES_PER_SUBJECT
+
+def test_crawl_waits_out_an_unavailable_upstream(stand_in, monkeypatch):
+    crawl_course = crawler.crawl_course
+    attempts = []
+
+    def unavailable_once(*args):
+        attempts.append(args[-1])
+        if attempts.count(args[-1]) == 1:
+            rate_limiter.BREAKER.record_failure(retry_after=0.05)
+            raise http_client.UpstreamUnavailable("Upstream returned 503")
+        return crawl_course(*args)
+
+    monkeypatch.setattr(crawler, 'crawl_course', unavailable_once)
+    summary = crawl()
+
+    assert summary['failed'] == summary['deferred'] == 0
+    assert summary['courses'] == SUBJECTS * COURSES_PER_SUBJECT
+    assert crawler.get_progress(2025, 'Fall')[1] == []
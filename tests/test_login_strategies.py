@@ -0,0 +1,105 @@
+import pytest
+
+import auth_manager
+import browser_pool
+import http_client
+import login_strategies
+from stand_in_scheduler import StandInConfig, StandInDriverFactory, start_stand_in
+
+BAD_PASSWORD = 'wrong-password'
+
+@pytest.fixture
+def stand_in(monkeypatch):
+    server = start_stand_in(StandInConfig(duo_delay=0.2, bad_password=BAD_PASSWORD))
+    factory = StandInDriverFactory()
+    monkeypatch.setattr(http_client, 'SCHEDULER_BASE', server.base_url)
+    monkeypatch.setattr(login_strategies, 'CAS_LOGIN_URL', f'{server.base_url}/cas/login')
+    monkeypatch.setattr(browser_pool, 'BROWSER_POOL', browser_pool.BrowserPool(factory, size=1))
+    yield server, factory
+    browser_pool.BROWSER_POOL.shutdown()
+    server.shutdown()
+
+@pytest.fixture
+def chain(monkeypatch):
+    chain = login_strategies.build_chain(auth_manager.perform_login, order=['http', 'browser'])
+    monkeypatch.setattr(auth_manager, 'LOGIN_CHAIN', chain)
+    return chain
+
+def results(chain, strategy):
+    return chain.stats()[strategy]['results']
+
+def test_http_login_falls_back_to_browser_for_duo(stand_in, chain):
+    server, factory = stand_in
+
+    cookies = chain.login('student', 'password')
+
+    assert any(cookie['name'] == 'session' for cookie in cookies)
+    assert not any(cookie['name'] == 'CASTGC' for cookie in cookies)
+    assert results(chain, 'http') == {'interactive': 1}
+    assert results(chain, 'browser') == {'success': 1}
+    assert factory.created == 1
+
+def test_renewal_uses_http_single_sign_on(stand_in, chain):
+    server, factory = stand_in
+    chain.login('student', 'password')
+
+    cookies = chain.login('student', 'password')
+
+    assert any(cookie['name'] == 'session' for cookie in cookies)
+    assert results(chain, 'http') == {'interactive': 1, 'success': 1}
+    assert results(chain, 'browser') == {'success': 1}
+    assert server.stats['sso_login'] == 1
+    assert factory.created == 1
+
+def test_wrong_password_stops_the_chain(stand_in, chain):
+    server, factory = stand_in
+
+    with pytest.raises(login_strategies.InvalidCredentials):
+        chain.login('student', BAD_PASSWORD)
+
+    assert results(chain, 'http') == {'rejected': 1}
+    assert results(chain, 'browser') == {}
+    assert server.stats['login_rejected'] == 1
+    assert factory.created == 0
+
+def test_wrong_password_forgets_the_cas_session(stand_in, chain, monkeypatch):
+    monkeypatch.setattr(auth_manager, 'REJECTED_PASSWORDS', {})
+    http_strategy = chain.strategies[0]
+
+    with pytest.raises(login_strategies.InvalidCredentials):
+        auth_manager.get_valid_cookies('student', BAD_PASSWORD)
+    assert 'student' not in http_strategy.sessions
+
+def test_wrong_password_is_not_posted_again(stand_in, chain, monkeypatch):
+    monkeypatch.setattr(auth_manager, 'REJECTED_PASSWORDS', {})
+    server, factory = stand_in
+    with pytest.raises(login_strategies.InvalidCredentials):
+        auth_manager.get_valid_cookies('student', BAD_PASSWORD)
+
+    with pytest.raises(login_strategies.InvalidCredentials):
+        auth_manager.get_valid_cookies('student', BAD_PASSWORD, force_refresh=True)
+    assert server.stats['login_rejected'] == 1
+
+    # A changed password is tried
+    try:
+        assert auth_manager.get_valid_cookies('student', 'password')
+    finally:
+        auth_manager.clear_cookie_cache('student', rejected=False)
+    assert 'student' not in auth_manager.REJECTED_PASSWORDS
+
+def test_rejected_cookies_are_renewed_by_single_sign_on(stand_in, chain):
+    server, factory = stand_in
+    try:
+        assert auth_manager.get_valid_cookies('student', 'password')
+
+        # The scheduler rejected the cookies, the CAS session is still good
+        auth_manager.clear_cookie_cache('student')
+        cookies = auth_manager.get_valid_cookies('student', 'password')
+    finally:
+        auth_manager.clear_cookie_cache('student', rejected=False)
+
+    assert any(cookie['name'] == 'session' for cookie in cookies)
+    assert results(chain, 'http') == {'interactive': 1, 'success': 1}
+    assert results(chain, 'browser') == {'success': 1}
+    assert server.stats['sso_login'] == 1
+    assert factory.created == 1
@@ -0,0 +1,47 @@
+import random
+
+from schedule_generator import has_time_conflict, section_mask, time_to_minutes
+
+def section(days, start, end, code='MAC1105', number='0001'):
+    return {'courseCode': code, 'section': number, 'days': days, 'startTime': start, 'endTime': end}
+
+def pairwise_conflict(first, second):
+    """The pairwise overlap check the bitmasks replaced."""
+    if not set(first['days']) & set(second['days']):
+        return False
+    return (max(time_to_minutes(first['startTime']), time_to_minutes(second['startTime'])) <
+            min(time_to_minutes(first['endTime']), time_to_minutes(second['endTime'])))
+
+def test_gap_under_five_minutes_is_not_a_conflict():
+    assert not has_time_conflict([section('WRF', '1051', '1206'), section('RMW', '1209', '1324')])
+    assert not has_time_conflict([section('MWF', '0900', '0950'), section('MWF', '0951', '1040')])
+
+def test_back_to_back_sections_do_not_conflict():
+    assert not has_time_conflict([section('TR', '0930', '1045'), section('TR', '1045', '1200')])
+
+def test_one_minute_overlap_is_a_conflict():
+    assert has_time_conflict([section('TR', '0930', '1046'), section('R', '1045', '1200')])
+
+def test_different_days_do_not_conflict():
+    assert not has_time_conflict([section('MWF', '0900', '1000'), section('TR', '0900', '1000')])
+
+def test_sections_without_times_never_conflict():
+    assert section_mask(section('MWF', None, None)) == 0
+    assert not has_time_conflict([section('MWF', '0900', '1000'), section('', '0900', '1000')])
+
+def test_unparsable_times_block_their_days():
+    assert has_time_conflict([section('M', 'noon', '1300'), section('M', '0800', '0850')])
+    assert not has_time_conflict([section('M', 'noon', '1300'), section('T', '0800', '0850')])
+
+def test_matches_pairwise_check_on_random_sections():
+    rng = random.Random(0)
+
+    def random_section():
+        start = rng.randrange(7 * 60, 21 * 60)
+        end = start + rng.randrange(30, 180)
+        days = ''.join(day for day in 'MTWRFSU' if rng.random() < 0.4) or 'M'
+        return section(days, f'{start // 60:02d}{start % 60:02d}', f'{end // 60:02d}{end % 60:02d}')
+
+    for _ in range(20000):
+        first, second = random_section(), random_section()
+        assert has_time_conflict([first, second]) == pairwise_conflict(first, second), (first, second)
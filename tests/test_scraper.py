@@ -0,0 +1,64 @@
+import sqlite3
+
+import pytest
+
+import init_db
+import scraper
+
+SECTIONS = [
+    {'course': '1105', 'subjectId': 'MAC', 'sectionNumber': '0001', 'seatsCapacity': 30, 'openSeats': 3,
+     'instructor': [{'name': 'Ada Lovelace'}], 'meetings': [{'days': 'MWF', 'startTime': '0900', 'endTime': '0950'}]},
+    {'course': '1105', 'subjectId': 'MAC', 'sectionNumber': '0002', 'seatsCapacity': 30, 'openSeats': 0,
+     'instructor': [], 'meetings': []},
+]
+
+@pytest.fixture(autouse=True)
+def database(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # The instructor cache holds IDs of whichever database was used first
+    monkeypatch.setattr(scraper, 'INSTRUCTOR_CACHE', {})
+    monkeypatch.setattr(scraper, 'INSTRUCTOR_CACHE_LOADED', False)
+    init_db.init_db()
+
+def statuses(results):
+    return [result['status'] for result in results]
+
+def test_unchanged_sections_do_not_take_the_write_lock(monkeypatch):
+    monkeypatch.setattr(scraper, 'DB_BUSY_TIMEOUT', 0.1)
+    assert statuses(scraper.ingest_sections(SECTIONS, 2025, 'Fall')) == ['inserted', 'inserted']
+
+    writer = scraper.get_db_connection()
+    writer.execute("BEGIN IMMEDIATE")
+    try:
+        assert statuses(scraper.ingest_sections(SECTIONS, 2025, 'Fall')) == ['unchanged', 'unchanged']
+        changed = [dict(SECTIONS[0], openSeats=2), SECTIONS[1]]
+        assert statuses(scraper.ingest_sections(changed, 2025, 'Fall')) == ['error', 'unchanged']
+    finally:
+        writer.rollback()
+        writer.close()
+
+    changed = [dict(SECTIONS[0], openSeats=2), SECTIONS[1]]
+    assert statuses(scraper.ingest_sections(changed, 2025, 'Fall')) == ['updated', 'unchanged']
+
+def test_malformed_section_fails_alone():
+    sections = [SECTIONS[0], dict(SECTIONS[1], seatsCapacity={'bad': 1}), 'garbage']
+    assert statuses(scraper.ingest_sections(sections, 2025, 'Fall')) == ['inserted', 'error', 'error']
+
+    conn = sqlite3.connect('fsu_courses.db')
+    assert conn.execute("SELECT section FROM courses").fetchall() == [('0001',)]
+
+def test_every_due_course_is_rescheduled(monkeypatch):
+    monkeypatch.setattr(scraper, 'POLL_SCHEDULER', scraper.AdaptivePollScheduler())
+    good, bad, broken = [(2025, 'Fall', 'MAC', course) for course in ('1105', '2311', '2312')]
+    plan = {key: [('student', 'MAC', '0001')] for key in (good, bad, broken)}
+    scraper.REGBLOCKS_CACHE.put(scraper.course_key(*good), {'sections': SECTIONS})
+    scraper.REGBLOCKS_CACHE.put(scraper.course_key(*bad), ['garbage'])
+    scraper.REGBLOCKS_CACHE.put(scraper.course_key(*broken), {'sections': 'garbage'})
+    try:
+        scraper.check_monitored_courses(fetch_plan=(plan, {'student': None}))
+    finally:
+        scraper.REGBLOCKS_CACHE.invalidate()
+
+    snapshot = scraper.POLL_SCHEDULER.snapshot()
+    assert all(snapshot[key]['due_in'] is not None for key in plan)
+    assert snapshot[good]['interval'] < snapshot[bad]['interval'] == snapshot[broken]['interval']
@@ -0,0 +1,40 @@
+import sqlite3
+
+import init_db
+import seat_history
+
+def history(conn):
+    return conn.execute("SELECT section, ts, open, capacity FROM seat_history ORDER BY section, ts").fetchall()
+
+def test_records_only_changes_and_keeps_same_second_changes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    init_db.init_courses()
+    conn = sqlite3.connect("fsu_courses.db")
+    cursor = conn.cursor()
+
+    assert seat_history.record_changes(cursor, [('MAC1105', '0001', 2025, 'Fall', 3, 30),
+                                                ('MAC1105', '0002', 2025, 'Fall', 0, 30)], when=100) == 2
+    assert seat_history.record_changes(cursor, [('MAC1105', '0001', 2025, 'Fall', 3, 30),
+                                                ('MAC1105', '0002', 2025, 'Fall', 1, 30)], when=100) == 1
+    assert seat_history.record_changes(cursor, [('MAC1105', '0002', 2025, 'Fall', 2, 30)], when=100) == 1
+
+    assert history(conn) == [('0001', 100, 3, 30), ('0002', 100, 0, 30),
+                             ('0002', 101, 1, 30), ('0002', 102, 2, 30)]
+
+def test_migrates_rowid_table(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    conn = sqlite3.connect("fsu_courses.db")
+    conn.execute("""
+        CREATE TABLE seat_history (id INTEGER PRIMARY KEY, courseCode TEXT NOT NULL, section TEXT NOT NULL,
+                                   year TEXT NOT NULL, term TEXT NOT NULL, ts INTEGER NOT NULL,
+                                   open INTEGER NOT NULL, capacity INTEGER NOT NULL)
+    """)
+    conn.executemany("INSERT INTO seat_history VALUES (?, 'MAC1105', '0001', '2025', 'Fall', ?, ?, 30)",
+                     [(1, 100, 1), (2, 100, 2), (3, 105, 3)])
+    conn.commit()
+
+    init_db.init_courses()
+
+    assert history(conn) == [('0001', 100, 1, 30), ('0001', 101, 2, 30), ('0001', 105, 3, 30)]
+    assert 'WITHOUT ROWID' in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE name = 'seat_history'").fetchone()[0]
@@ -0,0 +1,66 @@
+import threading
+
+import pytest
+
+from singleflight import SingleFlight
+
+class CallerError(Exception):
+    pass
+
+def run_with_waiter(flight, error, retry_alone=(), timeout=None):
+    """Fail a leading call with error while a second caller waits on it."""
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def leader():
+        calls.append('leader')
+        started.set()
+        release.wait()
+        raise error
+
+    def waiter():
+        calls.append('waiter')
+        return 'alone'
+
+    def lead():
+        with pytest.raises(type(error)):
+            flight.do('key', leader)
+
+    thread = threading.Thread(target=lead)
+    thread.start()
+    started.wait()
+    outcome = {}
+
+    def wait():
+        try:
+            outcome['result'] = flight.do('key', waiter, timeout=timeout, retry_alone=retry_alone)
+        except Exception as e:
+            outcome['error'] = e
+
+    waiting = threading.Thread(target=wait)
+    waiting.start()
+    waiting.join(0.2)
+    release.set()
+    waiting.join()
+    thread.join()
+    return outcome, calls
+
+def test_waiters_share_failures_that_do_not_depend_on_the_caller():
+    outcome, calls = run_with_waiter(SingleFlight(), ValueError('upstream down'), retry_alone=(CallerError,))
+
+    assert isinstance(outcome['error'], ValueError)
+    assert calls == ['leader']
+
+def test_waiters_retry_failures_that_depend_on_the_caller():
+    outcome, calls = run_with_waiter(SingleFlight(), CallerError('session rejected'), retry_alone=(CallerError,))
+
+    assert outcome['result'] == 'alone'
+    assert calls == ['leader', 'waiter']
+
+def test_waiters_that_time_out_do_not_run_the_call():
+    outcome, calls = run_with_waiter(SingleFlight(), CallerError('session rejected'),
+                                     retry_alone=(CallerError,), timeout=0.05)
+
+    assert isinstance(outcome['error'], TimeoutError)
+    assert calls == ['leader']